@@ -3,11 +3,15 @@ SmartClip Backend - Flask API
 AI-powered video moment detection and clipping with Mux integration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only, selectinload, undefer
 import os
+import json
 from dotenv import load_dotenv
 import logging
+import time
 from datetime import datetime
 
 # Load environment variables FIRST - before importing Config
@@ -15,14 +19,29 @@ load_dotenv()
 
 # Import services
 from services.mux_service import MuxService
-from services.openai_service import OpenAIService
+from services.openai_service import OpenAIService, parse_transcript_segments
 from services.video_processor import VideoProcessor
-from database import db, Video, Moment, Clip
+from services.cue_store import CueStore
+from services.pagination import encode_cursor, decode_cursor
+from services.http_transport import HttpTransport
+from services.asset_cache import AssetCache
+from services.analysis_cache import AnalysisCache
+from services.job_queue import JobQueue, WorkerPool
+from services.webhook_inbox import WebhookInbox, DRAIN_JOB_KIND
+from services.reconciler import VideoReconciler, ClipReconciler
+from services.metrics import registry as metrics, instrument_engine, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from services.json_provider import FastJSONProvider
+from services.compression import ResponseCompressor
+from services.versions import make_etag, video_version, moments_version, video_clips_version, clip_version
+from services.event_bus import EventBus, publish_status_changes, video_topic, video_status_event
+from database import db, upgrade_schema, Video, VideoTranscript, Moment, Clip
 from config import Config
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+if app.config['FAST_JSON_ENABLED']:
+    app.json = FastJSONProvider(app)
 
 # Enable CORS
 CORS(app, resources={r"/*": {"origins": "*"}})
@@ -35,12 +54,198 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize services
+mux_transport = HttpTransport(
+    pool_size=app.config['MUX_HTTP_POOL_SIZE'],
+    connect_timeout=app.config['MUX_CONNECT_TIMEOUT'],
+    read_timeout=app.config['MUX_READ_TIMEOUT'],
+    max_retries=app.config['MUX_MAX_RETRIES'],
+    backoff_base=app.config['MUX_BACKOFF_BASE'],
+    upstream='mux'
+)
 mux_service = MuxService(
     token_id=app.config['MUX_TOKEN_ID'],
-    token_secret=app.config['MUX_TOKEN_SECRET']
+    token_secret=app.config['MUX_TOKEN_SECRET'],
+    transport=mux_transport,
+    base_url=app.config['MUX_BASE_URL'],
+    stream_url=app.config['MUX_STREAM_URL'],
+    asset_cache=AssetCache(
+        settling_ttl=app.config['ASSET_CACHE_SETTLING_TTL'],
+        ready_ttl=app.config['ASSET_CACHE_READY_TTL'],
+        max_entries=app.config['ASSET_CACHE_MAX_ENTRIES']
+    )
+)
+openai_service = OpenAIService(
+    api_key=app.config['OPENAI_API_KEY'],
+    model=app.config['OPENAI_MODEL'],
+    chunk_threshold=app.config['OPENAI_CHUNK_THRESHOLD'],
+    window_seconds=app.config['OPENAI_WINDOW_SECONDS'],
+    window_overlap=app.config['OPENAI_WINDOW_OVERLAP'],
+    max_concurrency=app.config['OPENAI_MAX_CONCURRENCY'],
+    moments_limit=app.config['DEFAULT_MOMENTS_COUNT'],
+    llm_reduce=app.config['OPENAI_LLM_REDUCE'],
+    cache=AnalysisCache(max_entries=app.config['ANALYSIS_CACHE_MAX_ENTRIES'])
+    if app.config['ANALYSIS_CACHE_ENABLED'] else None,
+    base_url=app.config['OPENAI_BASE_URL']
+)
+# Push status transitions to open event streams once they are committed
+event_bus = EventBus(max_pending=app.config['SSE_MAX_PENDING'])
+publish_status_changes(db.session, event_bus)
+
+# Background jobs
+job_queue = JobQueue(
+    app,
+    max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+    visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'],
+    backoff_base=app.config['JOB_BACKOFF_BASE']
+)
+video_processor = VideoProcessor(
+    mux_service,
+    openai_service,
+    transcript_retry_delay=app.config['TRANSCRIPT_RETRY_DELAY'],
+    transcript_wait_timeout=app.config['TRANSCRIPT_WAIT_TIMEOUT'] * 60,
+    job_queue=job_queue,
+    event_bus=event_bus,
+    clip_concurrency=app.config['CLIP_BATCH_CONCURRENCY']
+)
+job_queue.register(
+    'analyze_video',
+    video_processor.run_analysis_job,
+    on_failure=video_processor.fail_analysis_job
+)
+job_queue.register('caption_moments', video_processor.run_caption_job)
+
+
+def apply_webhook_event(event_type, data):
+    """Apply one Mux webhook event from the inbox"""
+    # The web process already did this on receipt; worker processes have their own cache
+    mux_service.asset_cache.apply_webhook(event_type, data)
+    return video_processor.handle_webhook(event_type, data)
+
+
+# Polled reads refresh from Mux at most once per interval per video
+video_reconciler = VideoReconciler(
+    mux_service,
+    min_interval=app.config['VIDEO_REFRESH_INTERVAL']
+)
+
+# Clips in processing are polled in the background, so clip reads never call Mux
+clip_reconciler = ClipReconciler(
+    app,
+    mux_service,
+    batch_size=app.config['CLIP_RECONCILE_BATCH_SIZE'],
+    min_interval=app.config['CLIP_RECONCILE_MIN_INTERVAL'],
+    max_interval=app.config['CLIP_RECONCILE_MAX_INTERVAL'],
+    concurrency=app.config['CLIP_RECONCILE_CONCURRENCY']
+)
+
+# Webhooks are recorded and acknowledged, then applied by a drain job
+webhook_inbox = WebhookInbox(
+    apply_webhook_event,
+    job_queue=job_queue,
+    batch_size=app.config['WEBHOOK_BATCH_SIZE'],
+    retry_delay=app.config['WEBHOOK_RETRY_DELAY'],
+    retention=app.config['WEBHOOK_RETENTION_HOURS'] * 3600
+)
+job_queue.register(DRAIN_JOB_KIND, webhook_inbox.drain)
+worker_pool = WorkerPool(
+    job_queue,
+    concurrency=app.config['JOB_WORKER_CONCURRENCY'],
+    poll_interval=app.config['JOB_POLL_INTERVAL']
 )
-openai_service = OpenAIService(api_key=app.config['OPENAI_API_KEY'])
-video_processor = VideoProcessor(mux_service, openai_service)
+
+
+# Request latency by route template, plus gauges and service counters read at scrape time
+request_seconds = metrics.histogram(
+    'smartclip_http_request_seconds',
+    'API request latency by route',
+    ['method', 'route', 'status']
+)
+
+
+def count_videos_by_status():
+    with app.app_context():
+        rows = db.session.execute(db.select(Video.status, db.func.count()).group_by(Video.status)).all()
+    return [((status or 'unknown',), count) for status, count in rows]
+
+
+def count_webhook_events_by_status():
+    with app.app_context():
+        return [((status,), count) for status, count in webhook_inbox.stats().items()]
+
+
+def stat_samples(stats, names):
+    """(label values, value) pairs for the named entries of a stats() dict"""
+    return [((name,), stats[key]) for key, name in names.items()]
+
+
+metrics.gauge('smartclip_videos', 'Stored videos by status', ['status'], count_videos_by_status)
+metrics.gauge('smartclip_webhook_events', 'Webhook inbox events by status', ['status'],
+              count_webhook_events_by_status)
+metrics.callback_counter(
+    'smartclip_asset_cache_lookups_total', 'Mux asset cache lookups in this process', ['result'],
+    lambda: stat_samples(mux_service.asset_cache.stats(), {'hits': 'hit', 'misses': 'miss', 'coalesced': 'coalesced'})
+)
+metrics.gauge('smartclip_asset_cache_entries', 'Mux assets cached in this process', [],
+              lambda: [((), mux_service.asset_cache.stats()['entries'])])
+metrics.callback_counter(
+    'smartclip_video_refreshes_total', 'Video refreshes from Mux on reads, and those that changed the row',
+    ['outcome'], lambda: stat_samples(video_reconciler.stats(), {'refreshes': 'refreshed', 'writes': 'written'})
+)
+if openai_service.cache is not None:
+    metrics.callback_counter(
+        'smartclip_analysis_cache_lookups_total', 'Transcript analysis cache lookups in this process',
+        ['result'], lambda: stat_samples(openai_service.cache.stats(), {
+            'hits': 'hit', 'misses': 'miss', 'bypassed': 'bypassed', 'errors': 'error'
+        })
+    )
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None and app.config['METRICS_ENABLED']:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+
+# Large JSON (video lists, transcripts) is gzip/brotli encoded for clients that accept it
+response_compressor = ResponseCompressor(
+    min_size=app.config['COMPRESSION_MIN_SIZE'],
+    gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+    brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY']
+)
+
+
+@app.after_request
+def compress_response(response):
+    if app.config['COMPRESSION_ENABLED']:
+        response_compressor.compress(response, request.accept_encodings)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus metrics for this process
+
+    Route, upstream (Mux/OpenAI) and database latency histograms, OpenAI
+    token counters and a gauge of videos per status.
+    """
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({
+            'success': False,
+            'error': 'Metrics are disabled'
+        }), 404
+    return Response(metrics.render(), mimetype=METRICS_CONTENT_TYPE)
 
 
 @app.route('/health', methods=['GET'])
@@ -53,21 +258,70 @@ def health_check():
     })
 
 
+# Default list fields: everything but the transcript, which the list never shows
+VIDEO_LIST_FIELDS = [field for field in Video.DICT_FIELDS if field != 'transcript']
+
+
 @app.route('/api/videos', methods=['GET'])
 def list_videos():
     """
-    Get all videos ordered by creation date (newest first)
+    Get videos ordered by creation date (newest first), one page at a time
     Only returns videos that are ready or processing
+
+    Query params:
+        limit: Page size (default VIDEO_LIST_PAGE_SIZE, at most VIDEO_LIST_MAX_PAGE_SIZE)
+        cursor: nextCursor of the previous page
+        fields: Comma-separated to_dict keys (default: all but transcript)
     """
     try:
-        # Query videos, excluding failed uploads
-        videos = Video.query.filter(
+        try:
+            limit = int(request.args.get('limit', app.config['VIDEO_LIST_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+        if limit < 1:
+            return jsonify({'success': False, 'error': 'limit must be positive'}), 400
+        limit = min(limit, app.config['VIDEO_LIST_MAX_PAGE_SIZE'])
+
+        if 'fields' in request.args:
+            fields = [field for field in request.args['fields'].split(',') if field]
+            unknown = [field for field in fields if field not in Video.DICT_FIELDS]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f"Unknown fields: {', '.join(unknown)}"
+                }), 400
+        else:
+            fields = VIDEO_LIST_FIELDS
+
+        # Query videos, excluding failed uploads; only the columns the fields need
+        query = Video.query.options(
+            load_only(*Video.columns_for(fields), raiseload=True)
+        ).filter(
             Video.status.in_(['processing', 'transcribing', 'analyzing', 'ready'])
-        ).order_by(Video.created_at.desc()).all()
+        )
+        if 'transcript' in fields:
+            # Transcripts are a separate table; fetch the page's in one query
+            query = query.options(selectinload(Video.transcript_record))
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, last_id = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            query = query.filter(tuple_(Video.created_at, Video.id) < (created_at, last_id))
+
+        # Load one extra row to learn whether another page follows
+        videos = query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(videos) > limit:
+            videos = videos[:limit]
+            next_cursor = encode_cursor(videos[-1].created_at, videos[-1].id)
 
         return jsonify({
             'success': True,
-            'videos': [video.to_dict() for video in videos]
+            'videos': [video.to_dict(fields) for video in videos],
+            'nextCursor': next_cursor
         }), 200
 
     except Exception as e:
@@ -88,7 +342,6 @@ def upload_video():
         data = request.get_json(silent=True) or {}
         # Create direct upload
         upload_data = mux_service.create_direct_upload()
-        print(upload_data)
 
         # Create video record in database
         with app.app_context():
@@ -119,57 +372,66 @@ def upload_video():
         }), 500
 
 
+def conditional_response(etag, build):
+    """
+    Answer If-None-Match from a version ETag, otherwise build the response
+
+    build only runs when the client's copy is stale, so an unchanged poll
+    costs the version query and nothing else. Tags are weak: they identify
+    the version, not the bytes.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response
+
+
+def reconciled_video_version(video_id):
+    """
+    A video's version row, after catching up with Mux if it is due
+
+    Returns:
+        (version row, the video if it had to be loaded for that), or (None, None)
+    """
+    version = video_version(video_id)
+    if version is None or not video_reconciler.needs_refresh(version):
+        return version, None
+
+    # Catch up with Mux if a webhook was missed
+    video = db.session.get(Video, video_id)
+    if video_reconciler.reconcile(video):
+        version = video_version(video_id)
+    return version, video
+
+
 @app.route('/api/videos/<int:video_id>', methods=['GET'])
 def get_video(video_id):
     """
     Get video details including processing status
+
+    Supports If-None-Match; the ETag changes when the video or its
+    transcript is updated.
     """
     try:
-        video = Video.query.get(video_id)
-        print(video)
-        if not video:
+        version, video = reconciled_video_version(video_id)
+
+        if not version:
             return jsonify({
                 'success': False,
                 'error': 'Video not found'
             }), 404
 
-        # If video only has upload_id (no asset yet), check upload status
-        if video.upload_id and not video.asset_id:
-            try:
-                upload = mux_service.get_upload(video.upload_id)
-
-                # Check if asset was created from upload
-                if upload.get('asset_id'):
-                    video.asset_id = upload['asset_id']
-                    video.status = 'processing'
-                    db.session.commit()
-                    logger.info(f"Video {video.id} asset found: {upload['asset_id']}")
-            except Exception as e:
-                logger.error(f"Error checking upload status: {str(e)}")
-
-        # If video has asset_id, get latest status from Mux
-        if video.asset_id:
-            asset = mux_service.get_asset(video.asset_id)
-
-            # Only update status from Mux if we're not in analysis/transcription phase
-            # Once we start analyzing, we manage the status ourselves
-            # Don't overwrite 'processing' (waiting for analysis), analysis statuses, or error
-            if video.status not in ['processing', 'analyzing', 'transcribing', 'error', 'ready']:
-                video.status = asset.get('status', video.status)
-
-            if asset.get('duration'):
-                video.duration = asset['duration']
-
-            # Get playback ID if not set
-            if not video.playback_id and asset.get('playback_ids'):
-                video.playback_id = asset['playback_ids'][0]['id']
+        def build():
+            return jsonify({
+                'success': True,
+                'video': (video or db.session.get(Video, video_id)).to_dict()
+            })
 
-            db.session.commit()
-
-        return jsonify({
-            'success': True,
-            'video': video.to_dict()
-        })
+        etag = make_etag('video', version.updated_at, version.transcript_updated_at)
+        return conditional_response(etag, build)
 
     except Exception as e:
         logger.error(f"Error getting video {video_id}: {str(e)}")
@@ -185,7 +447,7 @@ def get_video_status(video_id):
     Get video processing status
     """
     try:
-        video = Video.query.get(video_id)
+        video = db.session.get(Video, video_id)
 
         if not video:
             return jsonify({
@@ -193,50 +455,8 @@ def get_video_status(video_id):
                 'error': 'Video not found'
             }), 404
 
-        # If video only has upload_id (no asset yet), check upload status
-        if video.upload_id and not video.asset_id:
-            try:
-                upload = mux_service.get_upload(video.upload_id)
-
-                # Check if asset was created from upload
-                if upload.get('asset_id'):
-                    video.asset_id = upload['asset_id']
-                    video.status = 'processing'
-                    db.session.commit()
-                    logger.info(f"Video {video.id} asset found: {upload['asset_id']}")
-                # Otherwise check upload status
-                elif upload.get('status') == 'waiting':
-                    video.status = 'waiting_for_upload'
-                elif upload.get('status') == 'asset_created':
-                    video.status = 'processing'
-                elif upload.get('status') in ['errored', 'timed_out', 'cancelled']:
-                    video.status = 'error'
-                    upload_status = upload.get('status')
-                    video.error_message = f"Upload {upload_status}: The video upload did not complete successfully"
-                    logger.error(f"Upload {video.upload_id} failed with status: {upload_status}")
-
-                db.session.commit()
-            except Exception as e:
-                logger.error(f"Error checking upload status: {str(e)}")
-
-        # If video has asset_id, get latest status from Mux
-        if video.asset_id:
-            asset = mux_service.get_asset(video.asset_id)
-
-            # Only update status from Mux if we're not in analysis/transcription phase
-            # Once we start analyzing, we manage the status ourselves
-            # Don't overwrite 'processing' (waiting for analysis), analysis statuses, or error
-            if video.status not in ['processing', 'analyzing', 'transcribing', 'error', 'ready']:
-                video.status = asset.get('status', video.status)
-
-            if asset.get('duration'):
-                video.duration = asset['duration']
-
-            # Get playback ID if not set
-            if not video.playback_id and asset.get('playback_ids'):
-                video.playback_id = asset['playback_ids'][0]['id']
-
-            db.session.commit()
+        # Catch up with Mux if a webhook was missed
+        video_reconciler.reconcile(video)
 
         return jsonify({
             'success': True,
@@ -254,17 +474,100 @@ def get_video_status(video_id):
         }), 500
 
 
+def video_clip_statuses(video_id):
+    """Status of each of a video's clips, keyed by clip ID"""
+    return dict(db.session.execute(
+        db.select(Clip.id, Clip.status).join(Moment, Clip.moment_id == Moment.id).where(Moment.video_id == video_id)
+    ).all())
+
+
+@app.route('/api/videos/<int:video_id>/events', methods=['GET'])
+def video_events(video_id):
+    """
+    Server-Sent Events stream of video status transitions and clip updates
+    Sends the current status first, then an event per committed change
+    """
+    video = db.session.get(Video, video_id)
+    
+    if not video:
+        return jsonify({
+            'success': False,
+            'error': 'Video not found'
+        }), 404
+    
+    # Subscribe before taking the snapshot so no transition falls in between
+    subscription = event_bus.subscribe(video_topic(video_id))
+    snapshot = video_status_event(video)
+    clip_statuses = video_clip_statuses(video_id)
+    heartbeat = app.config['SSE_HEARTBEAT_INTERVAL']
+    
+    # Don't hold a pooled connection for the lifetime of the stream
+    db.session.close()
+    
+    def stream():
+        last = snapshot
+        try:
+            yield f"retry: {app.config['SSE_RETRY_MS']}\nevent: status\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                evt = subscription.get(timeout=heartbeat)
+                if evt is not None:
+                    if evt.name == 'status':
+                        last = evt.data
+                    elif evt.name == 'clip':
+                        clip_statuses[int(evt.data['id'])] = evt.data['status']
+                    yield evt.to_sse()
+                    continue
+                
+                # Idle: keep the connection open and catch transitions made
+                # by other processes (a separate worker.py, another web
+                # worker, the clip reconciler or the webhook inbox there)
+                messages = []
+                row = db.session.execute(
+                    db.select(Video.status, Video.error_message).where(Video.id == video_id)
+                ).first()
+                if row and (row.status, row.error_message) != (last['status'], last['errorMessage']):
+                    last = {'videoId': str(video_id), 'status': row.status, 'errorMessage': row.error_message}
+                    messages.append(f"event: status\ndata: {json.dumps(last)}\n\n")
+                
+                current = video_clip_statuses(video_id)
+                changed = [clip_id for clip_id, status in current.items() if clip_statuses.get(clip_id) != status]
+                if changed:
+                    clips = db.session.execute(
+                        db.select(Clip).where(Clip.id.in_(changed)).order_by(Clip.id)
+                    ).scalars().all()
+                    messages.extend(f"event: clip\ndata: {json.dumps(clip.to_dict())}\n\n" for clip in clips)
+                clip_statuses.clear()
+                clip_statuses.update(current)
+                db.session.close()
+                
+                yield ''.join(messages) or ": keepalive\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 @app.route('/api/videos/<int:video_id>/analyze', methods=['POST'])
 def analyze_video(video_id):
     """
-    Analyze video to detect highlight moments
-    Steps:
+    Queue analysis of a video to detect highlight moments
+    The work runs in the background job pool:
     1. Get transcript from Mux
     2. Analyze transcript with OpenAI
     3. Store detected moments in database
+    Returns 202 with the job ID; poll /api/jobs/<id> or the video status
+    Requests while an analysis is in progress join it instead of starting another
+    Pass ?refresh=true to skip cached analysis results
     """
     try:
-        video = Video.query.get(video_id)
+        video = db.session.get(Video, video_id)
         
         if not video:
             return jsonify({
@@ -278,103 +581,155 @@ def analyze_video(video_id):
                 'error': 'Video asset not ready'
             }), 400
         
-        # Update status
-        video.status = 'analyzing'
-        db.session.commit()
+        # Start the analysis, or join the one already running
+        use_cache = request.args.get('refresh', 'false').lower() != 'true'
+        job_id, joined = video_processor.request_analysis(video.id, use_cache=use_cache)
         
-        # Check if transcript generation failed
-        asset = mux_service.get_asset(video.asset_id)
-
-        text_track_errored = False
-        if 'tracks' in asset:
-            for track in asset['tracks']:
-                if track.get('type') == 'text' and track.get('status') == 'errored':
-                    text_track_errored = True
-                    break
-
-        if text_track_errored:
-            video.status = 'error'
-            video.error_message = 'Transcript generation failed. The video may not have audio or the audio quality may be insufficient.'
-            db.session.commit()
+        if joined:
+            logger.info(f"Analysis of video {video_id} already in progress (job {job_id})")
+        else:
+            logger.info(f"Queued analysis job {job_id} for video {video_id}")
+        
+        return jsonify({
+            'success': True,
+            'jobId': str(job_id),
+            'status': 'analyzing',
+            'joined': joined
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error queueing analysis for video {video_id}: {str(e)}")
+        db.session.rollback()
+        
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-            return jsonify({
-                'success': False,
-                'error': 'Transcript generation failed. The video may not have audio or the audio quality may be insufficient.',
-                'status': 'error'
-            }), 400
 
-        # Get transcript from Mux
-        logger.info(f"Getting transcript for video {video_id}")
-        transcript = mux_service.get_transcript(video.asset_id)
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get background job status
+    """
+    job = job_queue.get(job_id)
+    
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
 
-        if not transcript:
-            # Transcript not ready yet - it may still be generating
-            # (subtitles were requested at upload time via generate_subtitles in new_asset_settings)
-            logger.info(f"Transcript not available yet for video {video_id}, waiting for generation to complete")
 
-            video.status = 'transcribing'
-            db.session.commit()
+@app.route('/api/videos/<int:video_id>/moments', methods=['GET'])
+def get_moments(video_id):
+    """
+    Get all detected moments for a video
 
+    Supports If-None-Match; the ETag changes when a moment is added,
+    edited or removed.
+    """
+    try:
+        exists = db.session.execute(db.select(Video.id).where(Video.id == video_id)).first()
+        
+        if not exists:
+            return jsonify({
+                'success': False,
+                'error': 'Video not found'
+            }), 404
+        
+        def build():
+            moments = Moment.query.filter_by(video_id=video_id).order_by(Moment.start_time, Moment.id).all()
             return jsonify({
                 'success': True,
-                'message': 'Transcript generation in progress. Please check back in a few moments.',
-                'status': 'transcribing'
+                'moments': [moment.to_dict() for moment in moments]
             })
         
-        # Store transcript
-        video.transcript = transcript
-        db.session.commit()
-        
-        # Analyze with OpenAI
-        logger.info(f"Analyzing transcript for video {video_id}")
-        moments_data = openai_service.analyze_transcript(transcript, video.duration)
-        
-        # Store moments in database
-        for moment_data in moments_data:
-            moment = Moment(
-                video_id=video.id,
-                start_time=moment_data['start_time'],
-                end_time=moment_data['end_time'],
-                title=moment_data['title'],
-                description=moment_data['description'],
-                reason=moment_data['reason'],
-                score=moment_data.get('score', 0.8)
-            )
-            db.session.add(moment)
-        
-        video.status = 'ready'
-        db.session.commit()
-        
-        logger.info(f"Analysis complete for video {video_id}. Found {len(moments_data)} moments.")
+        return conditional_response(make_etag('moments', *moments_version(video_id)), build)
         
+    except Exception as e:
+        logger.error(f"Error getting moments for video {video_id}: {str(e)}")
         return jsonify({
-            'success': True,
-            'moments': [m.to_dict() for m in video.moments],
-            'status': 'ready'
-        })
-        
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# Bundle video fields: the transcript has its own endpoint and the page doesn't show it
+VIDEO_BUNDLE_FIELDS = VIDEO_LIST_FIELDS
+
+
+def load_video_bundle(video_id):
+    """
+    Load a video with its moments and their clips
+
+    Three queries however many moments and clips there are: the video, then
+    one SELECT ... IN for the moments and one for their clips.
+    """
+    return db.session.execute(
+        db.select(Video).where(Video.id == video_id).options(
+            load_only(*Video.columns_for(VIDEO_BUNDLE_FIELDS)),
+            selectinload(Video.moments).selectinload(Moment.clips)
+        )
+    ).scalar_one_or_none()
+
+
+@app.route('/api/videos/<int:video_id>/bundle', methods=['GET'])
+def get_video_bundle(video_id):
+    """
+    Get a video, its moments and each moment's clips in one response
+
+    Everything the video page needs, so it makes one request instead of one
+    for the video, one for the moments and one per clip. Supports
+    If-None-Match; the ETag combines the video, moment and clip versions.
+    """
+    try:
+        version, _ = reconciled_video_version(video_id)
+
+        if not version:
+            return jsonify({
+                'success': False,
+                'error': 'Video not found'
+            }), 404
+
+        def build():
+            video = load_video_bundle(video_id)
+            moments = []
+            for moment in sorted(video.moments, key=lambda m: (m.start_time, m.id)):
+                data = moment.to_dict()
+                data['clips'] = [clip.to_dict() for clip in moment.clips]
+                moments.append(data)
+            return jsonify({
+                'success': True,
+                'video': video.to_dict(VIDEO_BUNDLE_FIELDS),
+                'moments': moments
+            })
+
+        etag = make_etag('bundle', version.updated_at, *moments_version(video_id),
+                         *video_clips_version(video_id))
+        return conditional_response(etag, build)
+
     except Exception as e:
-        logger.error(f"Error analyzing video {video_id}: {str(e)}")
-        
-        # Update video status on error
-        video = Video.query.get(video_id)
-        if video:
-            video.status = 'error'
-            db.session.commit()
-        
+        logger.error(f"Error getting bundle for video {video_id}: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
 
-@app.route('/api/videos/<int:video_id>/moments', methods=['GET'])
-def get_moments(video_id):
+@app.route('/api/videos/<int:video_id>/transcript', methods=['GET'])
+def get_transcript_cues(video_id):
     """
-    Get all detected moments for a video
+    Get timed transcript cues for a video
+    Optional ?start=&end= (seconds) return only the cues overlapping that range
     """
     try:
-        video = Video.query.get(video_id)
+        video = db.session.get(Video, video_id)
         
         if not video:
             return jsonify({
@@ -382,15 +737,30 @@ def get_moments(video_id):
                 'error': 'Video not found'
             }), 404
         
-        moments = Moment.query.filter_by(video_id=video_id).all()
+        record = db.session.get(VideoTranscript, video_id, options=[undefer(VideoTranscript.cues_data)])
+        if record is not None and record.cues_data is not None:
+            cues = CueStore.from_bytes(record.cues)
+        else:
+            # Transcripts stored before cues were kept
+            cues = CueStore.from_segments(
+                parse_transcript_segments(record.text if record is not None else ''),
+                video.duration
+            )
+        
+        start = request.args.get('start', 0, type=float)
+        end = request.args.get('end', float('inf'), type=float)
+        first, last = cues.range(start, end)
         
         return jsonify({
             'success': True,
-            'moments': [moment.to_dict() for moment in moments]
+            'cues': [
+                {'start': round(cue_start, 3), 'end': round(cue_end, 3), 'text': text}
+                for cue_start, cue_end, text in (cues.cue(i) for i in range(first, last))
+            ]
         })
         
     except Exception as e:
-        logger.error(f"Error getting moments for video {video_id}: {str(e)}")
+        logger.error(f"Error getting transcript for video {video_id}: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -403,7 +773,7 @@ def create_clip(moment_id):
     Generate a clip from a moment using Mux clipping API
     """
     try:
-        moment = Moment.query.get(moment_id)
+        moment = db.session.get(Moment, moment_id)
         
         if not moment:
             return jsonify({
@@ -419,11 +789,8 @@ def create_clip(moment_id):
                 'error': 'Video asset not available'
             }), 400
         
-        # Generate social media caption
-        caption = openai_service.generate_social_caption(
-            moment.title,
-            moment.description
-        )
+        # Precomputed after analysis; generated now only if that hasn't happened
+        caption = video_processor.caption_for(moment)
         
         # Create clip using Mux
         logger.info(f"Creating clip for moment {moment_id}")
@@ -444,6 +811,7 @@ def create_clip(moment_id):
         )
         db.session.add(clip)
         db.session.commit()
+        clip_reconciler.wake()
         
         logger.info(f"Clip created with ID {clip.id}")
         
@@ -460,35 +828,92 @@ def create_clip(moment_id):
         }), 500
 
 
+@app.route('/api/videos/<int:video_id>/clips', methods=['POST'])
+def create_clips(video_id):
+    """
+    Clip many moments of a video at once ("clip all highlights")
+
+    Body (optional): {"momentIds": [...]} - defaults to every moment.
+    Moments that already have a clip return it instead of a new one; IDs
+    that aren't moments of this video get a failed "Moment not found" result.
+    """
+    try:
+        video = db.session.get(Video, video_id)
+
+        if not video:
+            return jsonify({
+                'success': False,
+                'error': 'Video not found'
+            }), 404
+
+        if not video.asset_id:
+            return jsonify({
+                'success': False,
+                'error': 'Video asset not available'
+            }), 400
+
+        body = request.get_json(silent=True) or {}
+        moment_ids = body.get('momentIds')
+        if moment_ids is not None:
+            try:
+                if not isinstance(moment_ids, list):
+                    raise TypeError('momentIds is not a list')
+                moment_ids = [int(moment_id) for moment_id in moment_ids]
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'momentIds must be a list of IDs'
+                }), 400
+
+        results = video_processor.create_clips_for_video(video, moment_ids)
+
+        created = sum(1 for result in results if result['created'])
+        if created:
+            clip_reconciler.wake()
+        logger.info(f"Created {created} clips for video {video_id}")
+
+        return jsonify({
+            'success': True,
+            'results': results
+        }), 201 if created else 200
+
+    except Exception as e:
+        logger.error(f"Error creating clips for video {video_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/api/clips/<int:clip_id>', methods=['GET'])
 def get_clip(clip_id):
     """
     Get clip details and download URL
+
+    A plain database read: clip status is kept current by Mux webhooks and
+    the background clip reconciler. Supports If-None-Match.
     """
     try:
-        clip = Clip.query.get(clip_id)
+        version = clip_version(clip_id)
         
-        if not clip:
+        if not version:
             return jsonify({
                 'success': False,
                 'error': 'Clip not found'
             }), 404
         
-        # Get latest status from Mux
-        if clip.asset_id:
-            asset = mux_service.get_asset(clip.asset_id)
-            clip.status = asset.get('status', clip.status)
-            
-            # Get download URL if ready
-            if clip.status == 'ready':
-                clip.download_url = mux_service.get_download_url(clip.asset_id)
-            
-            db.session.commit()
+        def build():
+            clip = db.session.get(Clip, clip_id)
+            clip_data = clip.to_dict()
+            if clip.status == 'ready' and not clip.download_url and clip.playback_id:
+                # Derived from the playback ID; no Mux call needed
+                clip_data['downloadUrl'] = mux_service.get_playback_url(clip.playback_id)
+            return jsonify({
+                'success': True,
+                'clip': clip_data
+            })
         
-        return jsonify({
-            'success': True,
-            'clip': clip.to_dict()
-        })
+        return conditional_response(make_etag('clip', *version), build)
         
     except Exception as e:
         logger.error(f"Error getting clip {clip_id}: {str(e)}")
@@ -502,6 +927,9 @@ def get_clip(clip_id):
 def mux_webhook():
     """
     Handle Mux webhooks for asset status updates
+
+    The event is stored in the webhook inbox and acknowledged right away;
+    a background drain applies it (see apply_webhook_event).
     """
     try:
         data = request.get_json(silent=True) or {}
@@ -509,51 +937,12 @@ def mux_webhook():
         
         logger.info(f"Received Mux webhook: {event_type}")
 
-        if event_type == 'video.upload.asset_created':
-            # Upload completed and asset was created
-            upload_id = data['data']['id']
-            asset_id = data['data']['asset_id']
-
-            # Find video by upload_id and update with asset_id
-            video = Video.query.filter_by(upload_id=upload_id).first()
-            if video:
-                video.asset_id = asset_id
-                video.status = 'processing'
-                db.session.commit()
-                logger.info(f"Video {video.id} asset created: {asset_id}")
-
-        elif event_type == 'video.asset.ready':
-            asset_id = data['data']['id']
-
-            # Update video metadata but keep status as 'processing'
-            # Don't set to 'ready' yet - we still need to wait for transcript and analyze
-            video = Video.query.filter_by(asset_id=asset_id).first()
-            if video:
-                # Only update status if not already analyzing/transcribing
-                if video.status not in ['analyzing', 'transcribing', 'ready']:
-                    video.status = 'processing'
-
-                # Get playback ID
-                asset = mux_service.get_asset(asset_id)
-                if asset.get('playback_ids'):
-                    video.playback_id = asset['playback_ids'][0]['id']
-
-                video.duration = asset.get('duration')
-                db.session.commit()
-
-                logger.info(f"Video {video.id} asset is ready for processing")
-        
-        elif event_type == 'video.asset.track.ready':
-            # Transcript track is ready - just log it
-            # Don't change status here - let the /analyze endpoint handle it
-            asset_id = data['data']['id']
-            track_type = data['data'].get('track_type')
-
-            if track_type == 'text':
-                video = Video.query.filter_by(asset_id=asset_id).first()
-                if video:
-                    logger.info(f"Transcript track ready for video {video.id} - ready for analysis")
-        
+        # Keep cached assets in step with Mux so polls don't have to ask
+        mux_service.asset_cache.apply_webhook(event_type, data.get('data'))
+
+        # Redeliveries are acknowledged too, so Mux stops sending them
+        webhook_inbox.append(data)
+
         return jsonify({'success': True}), 200
         
     except Exception as e:
@@ -580,8 +969,18 @@ def internal_error(error):
 # Create tables
 with app.app_context():
     db.create_all()
+    if app.config['SCHEMA_UPGRADE_ON_STARTUP']:
+        upgrade_schema()
+    if app.config['METRICS_ENABLED']:
+        instrument_engine(db.engine, metrics)
     logger.info("Database tables created")
 
+# Start background job workers (set JOB_WORKERS_ENABLED=false to run them
+# in a separate process with worker.py instead)
+if app.config['JOB_WORKERS_ENABLED']:
+    worker_pool.start()
+    clip_reconciler.start()
+
 
 if __name__ == '__main__':
     app.run(
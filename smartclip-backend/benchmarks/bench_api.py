@@ -0,0 +1,368 @@
+"""
+Benchmark: SmartClip API end to end against the fake upstreams
+
+Serves the Flask app from a threaded local server backed by a scratch
+SQLite database, with Mux and OpenAI replaced by benchmarks/fake_upstreams.py,
+and drives these scenarios over HTTP:
+
+  list_videos       first page of GET /api/videos with 10k stored videos
+  list_videos_walk  cursor walk through every page of the same 10k videos
+  status_poll       GET /api/videos/<id>/status from many concurrent clients
+  analysis_2h       POST /analyze on a 2-hour video, run through the job queue
+  bulk_clips        POST /api/videos/<id>/clips for a video with 20 moments
+
+Each scenario reports p50/p95/p99 latency, requests per second, database
+queries per request and the process's peak RSS so far (the fake upstreams
+and the load generator share the process, so read RSS as a trend).
+
+Results can be saved as a baseline and later runs compared against it:
+query counts must not grow, latency percentiles may drift by --tolerance.
+
+Usage:
+    python benchmarks/bench_api.py [--videos 10000] [--concurrency 32]
+        [--scenario status_poll ...] [--save-baseline] [--check]
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_upstreams import FakeUpstreams, Profile  # noqa: E402
+
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines', 'api.json')
+SCENARIOS = ('list_videos', 'list_videos_walk', 'status_poll', 'analysis_2h', 'bulk_clips')
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class QueryCounter:
+    """Counts statements sent to the database through the app's engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+
+class Bench:
+    """The app under test, its HTTP server and the fake upstreams"""
+
+    def __init__(self, args):
+        self.args = args
+        self.upstreams = FakeUpstreams(
+            mux=Profile.parse(args.mux_latency),
+            stream=Profile.parse(args.stream_latency),
+            openai=Profile.parse(args.openai_latency),
+            seed=args.seed
+        ).start()
+
+        self.tmpdir = tempfile.TemporaryDirectory(prefix='smartclip-bench-')
+        os.environ.update(self.upstreams.config())
+        os.environ.update({
+            'DATABASE_URL': f"sqlite:///{os.path.join(self.tmpdir.name, 'bench.db')}",
+            'JOB_WORKERS_ENABLED': 'false',
+            'MUX_TOKEN_ID': 'bench',
+            'MUX_TOKEN_SECRET': 'bench',
+            'OPENAI_API_KEY': 'bench'
+        })
+
+        if not args.verbose:
+            logging.disable(logging.WARNING)
+
+        # Configuration is read at import time
+        import app as app_module
+        from werkzeug.serving import make_server
+
+        self.app_module = app_module
+        self.app = app_module.app
+        with self.app.app_context():
+            self.queries = QueryCounter(app_module.db.engine)
+
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._local = threading.local()
+
+    def close(self):
+        self.server.shutdown()
+        self.upstreams.stop()
+        self.tmpdir.cleanup()
+
+    def session(self):
+        # One keep-alive connection per load-generating thread
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def call(self, method, path, expect=(200,), **kwargs):
+        response = self.session().request(method, f"{self.base_url}{path}", **kwargs)
+        if response.status_code not in expect:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+    def measure(self, name, calls, concurrency=1):
+        """
+        Run calls (zero-argument callables) and summarize them
+
+        Returns:
+            Result dictionary for the scenario
+        """
+        latencies = []
+        lock = threading.Lock()
+
+        def timed(fn):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+        self.queries.reset()
+        started = time.perf_counter()
+        if concurrency == 1:
+            for fn in calls:
+                timed(fn)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for future in [pool.submit(timed, fn) for fn in calls]:
+                    future.result()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'scenario': name,
+            'requests': len(latencies),
+            'concurrency': concurrency,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'queries_per_request': round(self.queries.count / len(latencies), 2) if latencies else 0.0,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+    # Fixtures
+
+    def seed_videos(self, count):
+        """Bulk insert count videos with transcripts, newest last"""
+        from database import db, Video, VideoTranscript
+        transcript = '\n\n'.join(f"[00:{i // 60:02d}:{i % 60:02d}.000] line {i} of the talk" for i in range(120))
+        created = datetime.utcnow() - timedelta(seconds=count)
+        rows = [
+            {
+                'asset_id': f"seed_asset_{i}",
+                'playback_id': f"seed_playback_{i}",
+                'status': 'ready',
+                'duration': 600.0,
+                'created_at': created + timedelta(seconds=i),
+                'updated_at': created + timedelta(seconds=i)
+            }
+            for i in range(count)
+        ]
+        record = VideoTranscript()
+        record.text = transcript
+        with self.app.app_context():
+            db.session.execute(db.insert(Video), rows)
+            video_ids = db.session.execute(db.select(Video.id)).scalars().all()
+            db.session.execute(
+                db.insert(VideoTranscript),
+                [{'video_id': video_id, 'text_data': record.text_data} for video_id in video_ids]
+            )
+            db.session.commit()
+
+    def add_video(self, duration, moments=0):
+        """A ready video on a fake asset, with evenly spaced moments"""
+        from database import db, Video, Moment
+        asset = self.upstreams.add_asset(duration=duration)
+        with self.app.app_context():
+            video = Video(
+                asset_id=asset['id'],
+                playback_id=asset['playback_ids'][0]['id'],
+                status='ready',
+                duration=duration
+            )
+            db.session.add(video)
+            db.session.flush()
+            for i in range(moments):
+                start = i * duration / max(moments, 1)
+                db.session.add(Moment(
+                    video_id=video.id, start_time=start, end_time=start + 30,
+                    title=f"Moment {i}", description='Benchmark moment',
+                    caption=f"Caption {i}", hashtags='bench'
+                ))
+            db.session.commit()
+            return video.id
+
+    # Scenarios
+
+    def list_videos(self):
+        calls = [lambda: self.call('GET', '/api/videos?limit=50')] * self.args.requests
+        return self.measure('list_videos', calls, self.args.concurrency)
+
+    def list_videos_walk(self):
+        cursor = {'next': None}
+
+        def page():
+            path = '/api/videos?limit=50'
+            if cursor['next']:
+                path += f"&cursor={cursor['next']}"
+            cursor['next'] = self.call('GET', path).json().get('nextCursor')
+
+        pages = (self.args.videos + 49) // 50
+        return self.measure('list_videos_walk', [page] * pages)
+
+    def status_poll(self):
+        video_ids = [self.add_video(600) for _ in range(50)]
+        calls = [
+            (lambda video_id=video_ids[i % len(video_ids)]: self.call('GET', f"/api/videos/{video_id}/status"))
+            for i in range(self.args.requests * 2)
+        ]
+        return self.measure('status_poll', calls, self.args.poll_concurrency)
+
+    def analysis_2h(self):
+        video_id = self.add_video(7200)
+        pool = self.app_module.worker_pool
+
+        def analyze():
+            job_id = self.call('POST', f"/api/videos/{video_id}/analyze?refresh=true", expect=(202,)).json()['jobId']
+            while pool.run_once():
+                pass
+            status = self.call('GET', f"/api/jobs/{job_id}").json()['job']['status']
+            if status != 'succeeded':
+                raise RuntimeError(f"Analysis job {job_id} ended {status}")
+
+        return self.measure('analysis_2h', [analyze] * self.args.analysis_runs)
+
+    def bulk_clips(self):
+        from database import db, Clip, Moment
+        video_id = self.add_video(3600, moments=20)
+
+        def clip_all():
+            with self.app.app_context():
+                moment_ids = db.select(Moment.id).where(Moment.video_id == video_id)
+                db.session.execute(db.delete(Clip).where(Clip.moment_id.in_(moment_ids)))
+                db.session.commit()
+            self.call('POST', f"/api/videos/{video_id}/clips", expect=(201,))
+
+        return self.measure('bulk_clips', [clip_all] * self.args.clip_runs)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline, as human-readable lines"""
+    regressions = []
+    previous = {result['scenario']: result for result in baseline.get('results', [])}
+    for result in results:
+        before = previous.get(result['scenario'])
+        if not before:
+            continue
+        if result['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f"{result['scenario']}: queries/request {before['queries_per_request']} -> "
+                f"{result['queries_per_request']}"
+            )
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if before[key] and result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: {key} {before[key]} -> {result[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Run only these scenarios (repeatable)')
+    parser.add_argument('--videos', type=int, default=10000, help='Rows for the list scenarios')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--poll-concurrency', type=int, default=64)
+    parser.add_argument('--analysis-runs', type=int, default=3)
+    parser.add_argument('--clip-runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mux-latency', default='20:0.3', help='median_ms[:sigma]')
+    parser.add_argument('--stream-latency', default='10:0.3', help='median_ms[:sigma]')
+    parser.add_argument('--openai-latency', default='200:0.3', help='median_ms[:sigma]')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero on regressions against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed latency growth (fraction)')
+    parser.add_argument('--verbose', action='store_true', help='Keep app logging')
+    args = parser.parse_args()
+
+    bench = Bench(args)
+    results = []
+    try:
+        scenarios = args.scenario or SCENARIOS
+        if {'list_videos', 'list_videos_walk'} & set(scenarios):
+            bench.seed_videos(args.videos)
+        for name in scenarios:
+            result = getattr(bench, name)()
+            results.append(result)
+            print(
+                f"{name:<18} {result['requests']:>6} req  "
+                f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                f"p99 {result['p99_ms']:>8.2f} ms  {result['rps']:>8.1f} req/s  "
+                f"{result['queries_per_request']:>6.2f} queries/req  rss {result['peak_rss_mb']:.0f} MB"
+            )
+    finally:
+        bench.close()
+
+    params = {key: value for key, value in vars(args).items()
+              if key not in ('baseline', 'save_baseline', 'check', 'tolerance', 'verbose', 'scenario')}
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'params': params, 'results': results}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            print('Note: baseline was recorded with different parameters')
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print('No regressions against baseline')
+        if regressions and args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: JSON encoding and response compression of API payloads
+
+Builds the payloads of two endpoints from in-memory models (no database):
+  list_videos   a page of GET /api/videos (default fields, no transcript)
+  video         GET /api/videos/<id> for a video with a multi-hour transcript
+
+and compares, per payload:
+  encode   time to build the response body with Flask's stdlib provider
+           vs FastJSONProvider (orjson), median of --repeat runs
+  wire     body size as sent (identity, gzip, brotli) and the time the
+           ResponseCompressor spends encoding it
+
+Usage:
+    python benchmarks/bench_responses.py [--page-size 50] [--hours 2] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from database import Video  # noqa: E402
+from services.compression import ResponseCompressor  # noqa: E402
+from services.cue_store import CueStore  # noqa: E402
+from services.json_provider import FastJSONProvider, orjson  # noqa: E402
+
+LIST_FIELDS = [field for field in Video.DICT_FIELDS if field != 'transcript']
+
+
+def make_transcript(hours: float, cue_seconds: float = 3.0) -> str:
+    """Formatted transcript with a cue every cue_seconds"""
+    cues = []
+    start = 0.0
+    index = 1
+    while start < hours * 3600:
+        cues.append((start, start + cue_seconds - 0.2,
+                     f"so this is cue number {index} of the talk and it keeps going with more words"))
+        start += cue_seconds
+        index += 1
+    return CueStore.from_cues(cues).to_transcript()
+
+
+def make_video(video_id: int, created_at: datetime) -> Video:
+    return Video(
+        id=video_id,
+        upload_id=f'upload_{video_id}',
+        asset_id=f'asset{video_id:08d}abcdefghijklmnop',
+        playback_id=f'play{video_id:08d}abcdefghijklmnop',
+        status='ready',
+        duration=600.0 + video_id % 300,
+        created_at=created_at
+    )
+
+
+def make_payloads(page_size: int, hours: float):
+    now = datetime(2024, 5, 1, 12, 0)
+    page = [make_video(i, now - timedelta(minutes=i)).to_dict(LIST_FIELDS) for i in range(1, page_size + 1)]
+
+    video = make_video(1, now)
+    video.transcript = make_transcript(hours)
+
+    return {
+        'list_videos': {'success': True, 'videos': page, 'nextCursor': 'MjAyNC0wNS0wMVQxMTowMDowMHw1MA'},
+        'video': {'success': True, 'video': video.to_dict()},
+    }
+
+
+def time_median(fn, repeat: int) -> float:
+    """Median wall time of fn in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=50, help='Videos in the list page')
+    parser.add_argument('--hours', type=float, default=2.0, help='Transcript length')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--gzip-level', type=int, default=6)
+    parser.add_argument('--brotli-quality', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    compressor = ResponseCompressor(min_size=0, gzip_level=args.gzip_level, brotli_quality=args.brotli_quality)
+    payloads = make_payloads(args.page_size, args.hours)
+
+    print(f"orjson: {'yes' if orjson is not None else 'no (fast provider falls back to stdlib)'}; "
+          f"encodings: {', '.join(compressor.encodings)}")
+    print()
+    print(f"{'payload':<12} {'stdlib ms':>10} {'fast ms':>9} {'speedup':>8}")
+    bodies = {}
+    with app.app_context():
+        for name, payload in payloads.items():
+            slow_ms = time_median(lambda: stdlib.response(payload).get_data(), args.repeat)
+            fast_ms = time_median(lambda: fast.response(payload).get_data(), args.repeat)
+            bodies[name] = fast.response(payload).get_data()
+            print(f"{name:<12} {slow_ms:>10.2f} {fast_ms:>9.2f} {slow_ms / fast_ms:>7.1f}x")
+
+    print()
+    print(f"{'payload':<12} {'encoding':<9} {'bytes':>11} {'ratio':>7} {'encode ms':>10}")
+    for name, body in bodies.items():
+        print(f"{name:<12} {'identity':<9} {len(body):>11,} {1:>7.1%} {0:>10.2f}")
+        for encoding in compressor.encodings:
+            encoded = compressor.encode(body, encoding)
+            encode_ms = time_median(lambda: compressor.encode(body, encoding), max(1, args.repeat // 4))
+            print(f"{name:<12} {encoding:<9} {len(encoded):>11,} {len(encoded) / len(body):>7.1%} "
+                  f"{encode_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: WebVTT ingestion, legacy string parser vs streaming parser
+
+Generates a multi-hour subtitle file and compares throughput and peak
+Python memory of:
+  legacy          - decode the whole body, split on newlines, str.replace per
+                    line (MuxService._parse_vtt before the streaming parser)
+  legacy+reparse  - legacy, then parse_transcript_segments() to get the cue
+                    times back as numbers, as analysis had to
+  streaming       - decode 64 KiB chunks, parse_vtt() into a CueStore
+
+The default fixture looks like Mux generated captions (plain two-line
+cues); --markup adds a voice tag and an entity to every cue.
+
+Usage:
+    python benchmarks/bench_vtt_parser.py [--hours 3] [--repeat 5] [--markup]
+"""
+
+import argparse
+import codecs
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.cue_store import CueStore, format_timestamp  # noqa: E402
+from services.openai_service import parse_transcript_segments  # noqa: E402
+from services.vtt_parser import parse_vtt  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_vtt(hours: float, cue_seconds: float = 3.0, markup: bool = False) -> bytes:
+    """Subtitle file with a two-line cue every cue_seconds"""
+    parts = ['WEBVTT\n\nNOTE benchmark fixture\n\n']
+    start = 0.0
+    index = 1
+    while start < hours * 3600:
+        end = start + cue_seconds - 0.2
+        if markup:
+            text = (
+                f"<v Speaker {index % 3}>so this is cue number {index} of the talk and</v>\n"
+                f"it keeps going with a second line &amp; more words"
+            )
+        else:
+            text = f"so this is cue number {index} of the talk and\nit keeps going with a second line"
+        parts.append(
+            f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)} align:start position:0%\n"
+            f"{text}\n\n"
+        )
+        start += cue_seconds
+        index += 1
+    return ''.join(parts).encode('utf-8')
+
+
+def legacy_parse_vtt(vtt_content):
+    """The original MuxService._parse_vtt, kept verbatim for comparison"""
+    lines = vtt_content.split('\n')
+    transcript_parts = []
+    current_time = None
+    current_text = []
+
+    for line in lines:
+        line = line.strip()
+
+        if line.startswith('WEBVTT') or line.startswith('NOTE') or not line:
+            continue
+
+        if '-->' in line:
+            if current_time and current_text:
+                transcript_parts.append({
+                    'timestamp': current_time,
+                    'text': ' '.join(current_text)
+                })
+                current_text = []
+
+            parts = line.split('-->')
+            current_time = parts[0].strip()
+
+        elif line and not line.isdigit():
+            clean_text = line.replace('<v ', '').replace('>', '').replace('</v>', '')
+            current_text.append(clean_text)
+
+    if current_time and current_text:
+        transcript_parts.append({
+            'timestamp': current_time,
+            'text': ' '.join(current_text)
+        })
+
+    return '\n\n'.join([
+        f"[{part['timestamp']}] {part['text']}"
+        for part in transcript_parts
+    ])
+
+
+def run_legacy(body: bytes):
+    # requests' response.text decodes the whole body at once
+    return legacy_parse_vtt(body.decode('utf-8'))
+
+
+def run_legacy_reparse(body: bytes):
+    return parse_transcript_segments(run_legacy(body))
+
+
+def run_streaming(body: bytes):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = (
+        decoder.decode(body[i:i + CHUNK_SIZE])
+        for i in range(0, len(body), CHUNK_SIZE)
+    )
+    return CueStore.from_cues(
+        (cue.start, cue.end, cue.text) for cue in parse_vtt(chunks) if cue.text
+    )
+
+
+def measure(fn, body: bytes, repeat: int):
+    """Best wall time over repeat runs, then peak traced memory of one run"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=float, default=3.0, help='Length of the generated subtitles')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per parser (best is reported)')
+    parser.add_argument('--markup', action='store_true', help='Add voice tags and entities to every cue')
+    args = parser.parse_args()
+
+    body = make_vtt(args.hours, markup=args.markup)
+    size_mb = len(body) / 1e6
+    print(f"{args.hours:g}h of subtitles: {size_mb:.1f} MB")
+    print(f"{'parser':<15} {'best':>9} {'MB/s':>8} {'peak MiB':>9}  cues")
+
+    runs = (('legacy', run_legacy), ('legacy+reparse', run_legacy_reparse), ('streaming', run_streaming))
+    for name, fn in runs:
+        seconds, peak, result = measure(fn, body, args.repeat)
+        cues = result.count('\n\n') + 1 if isinstance(result, str) else len(result)
+        print(f"{name:<15} {seconds * 1000:7.1f}ms {size_mb / seconds:8.1f} {peak / 2**20:9.1f}  {cues}")
+
+
+if __name__ == '__main__':
+    main()
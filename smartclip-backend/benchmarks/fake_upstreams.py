@@ -0,0 +1,516 @@
+"""
+Local stand-ins for the Mux and OpenAI APIs, for load tests and benchmarks
+
+One threaded HTTP server implements everything MuxService and OpenAIService
+call, so hot paths can be measured offline and reproducibly:
+
+  Mux API     POST /video/v1/uploads, GET /video/v1/uploads/{id}
+              POST /video/v1/assets (clips), GET/DELETE /video/v1/assets/{id}
+              POST /video/v1/assets/{id}/tracks/{id}/generate-subtitles
+  Mux stream  GET /{playback_id}/text/{track_id}.vtt
+  OpenAI      POST /v1/chat/completions (moments, ranking, captions, refine)
+
+Uploads become assets, and assets, clips and generated subtitles become
+ready, after configurable delays. Each upstream has its own latency
+distribution (lognormal around a median), error rate and 429 rate, drawn
+from a seeded RNG so runs are repeatable.
+
+Point the app at it with:
+
+    MUX_BASE_URL=http://127.0.0.1:9100
+    MUX_STREAM_URL=http://127.0.0.1:9100/stream
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+
+Usage:
+    python benchmarks/fake_upstreams.py [--port 9100] [--mux-latency 40:0.3]
+        [--openai-latency 1500:0.4] [--error-rate 0.01] [--rate-limit-rate 0.02]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+_TIMESTAMP = re.compile(r'^\[((?:\d+:)?\d+:\d+(?:\.\d+)?)\]', re.MULTILINE)
+_WINDOW = re.compile(r'excerpt covering (\d+)s to (\d+)s')
+_DURATION = re.compile(r'VIDEO DURATION: ([\d.]+) seconds')
+_PICK = re.compile(r'Pick the (\d+)')
+
+
+@dataclass
+class Profile:
+    """Latency distribution and failure rates of one upstream"""
+    latency_ms: float = 0.0     # median
+    sigma: float = 0.0          # lognormal shape; 0 is a fixed latency
+    error_rate: float = 0.0     # fraction of requests answered with a 500
+    rate_limit_rate: float = 0.0  # fraction answered with a 429
+    retry_after: float = 1.0    # seconds, sent with every 429
+
+    @classmethod
+    def parse(cls, spec: str, **rates) -> 'Profile':
+        """Build from a "median_ms[:sigma]" string"""
+        median, _, sigma = spec.partition(':')
+        return cls(latency_ms=float(median), sigma=float(sigma or 0), **rates)
+
+
+def _seconds_to_timestamp(seconds: float) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def _timestamp_to_seconds(timestamp: str) -> float:
+    seconds = 0.0
+    for part in timestamp.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def make_vtt(duration: float, cue_seconds: float = 3.0) -> bytes:
+    """Deterministic subtitle file covering duration seconds"""
+    parts = ['WEBVTT\n\n']
+    for index in itertools.count(1):
+        start = (index - 1) * cue_seconds
+        if start >= duration:
+            break
+        end = min(start + cue_seconds - 0.2, duration)
+        parts.append(
+            f"{index}\n{_seconds_to_timestamp(start)} --> {_seconds_to_timestamp(end)}\n"
+            f"cue {index} of the talk, where the speaker keeps making their point\n\n"
+        )
+    return ''.join(parts).encode('utf-8')
+
+
+class FakeUpstreams(ThreadingHTTPServer):
+    """
+    Fake Mux API, Mux stream host and OpenAI chat completions in one server
+
+    Also usable in-process: start() serves from a background thread and
+    add_asset() seeds ready assets (with transcripts) for benchmarks.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 mux: Optional[Profile] = None, stream: Optional[Profile] = None,
+                 openai: Optional[Profile] = None, seed: int = 0,
+                 upload_delay: float = 0.0, ready_delay: float = 0.0,
+                 transcript_delay: float = 0.0, asset_duration: float = 600.0):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            mux, stream, openai: Per-upstream behaviour (defaults: instant, no failures)
+            seed: RNG seed for latencies and injected failures
+            upload_delay: Seconds after an upload is created until its asset exists
+            ready_delay: Seconds after an asset or clip is created until it is ready
+            transcript_delay: Seconds after subtitles are requested until they are ready
+            asset_duration: Duration of assets created from uploads
+        """
+        super().__init__((host, port), _Handler)
+        self.profiles = {
+            'mux': mux or Profile(),
+            'stream': stream or Profile(),
+            'openai': openai or Profile()
+        }
+        self.upload_delay = upload_delay
+        self.ready_delay = ready_delay
+        self.transcript_delay = transcript_delay
+        self.asset_duration = asset_duration
+
+        self.uploads: Dict[str, Dict] = {}
+        self.assets: Dict[str, Dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.tokens = {'prompt': 0, 'completion': 0}
+
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._vtt: Dict[float, bytes] = {}
+        self._lock = threading.RLock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeUpstreams':
+        """Serve from a daemon thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def config(self) -> Dict[str, str]:
+        """App settings that route MuxService and OpenAIService here"""
+        return {
+            'MUX_BASE_URL': self.url,
+            'MUX_STREAM_URL': f"{self.url}/stream",
+            'OPENAI_BASE_URL': f"{self.url}/v1"
+        }
+
+    # State
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def add_asset(self, duration: Optional[float] = None, ready: bool = True,
+                  transcript: bool = True, source: Optional[str] = None) -> Dict:
+        """
+        Create an asset directly
+
+        Args:
+            duration: Asset duration in seconds
+            ready: Ready now; otherwise after ready_delay
+            transcript: Include a generated subtitle track
+            source: Parent asset ID for clips
+
+        Returns:
+            The stored asset
+        """
+        with self._lock:
+            asset_id = self._new_id('asset')
+            now = time.monotonic()
+            ready_at = now if ready else now + self.ready_delay
+            tracks = [
+                {'id': self._new_id('video_track'), 'type': 'video'},
+                {'id': self._new_id('audio_track'), 'type': 'audio'}
+            ]
+            if transcript:
+                # Generated subtitles follow the asset by transcript_delay
+                tracks.append(self._text_track(ready_at if ready else ready_at + self.transcript_delay))
+            asset = {
+                'id': asset_id,
+                'duration': duration if duration is not None else self.asset_duration,
+                'playback_ids': [{'id': self._new_id('playback'), 'policy': 'public'}],
+                'tracks': tracks,
+                'created_at': str(int(time.time())),
+                '_ready_at': ready_at
+            }
+            if source:
+                asset['source_asset_id'] = source
+            self.assets[asset_id] = asset
+            return self._asset_view(asset)
+
+    def _text_track(self, ready_at: float) -> Dict:
+        return {
+            'id': self._new_id('text_track'),
+            'type': 'text',
+            'text_type': 'subtitles',
+            'text_source': 'generated_vod',
+            'language_code': 'en',
+            'name': 'English CC',
+            '_ready_at': ready_at
+        }
+
+    def _asset_view(self, asset: Dict) -> Dict:
+        """Public view of an asset with statuses as of now"""
+        now = time.monotonic()
+        view = {key: value for key, value in asset.items() if not key.startswith('_')}
+        view['status'] = 'ready' if now >= asset['_ready_at'] else 'preparing'
+        view['tracks'] = []
+        for track in asset['tracks']:
+            track_view = {key: value for key, value in track.items() if not key.startswith('_')}
+            if track['type'] == 'text':
+                track_view['status'] = 'ready' if now >= track['_ready_at'] else 'preparing'
+            view['tracks'].append(track_view)
+        return view
+
+    def _upload_view(self, upload: Dict) -> Dict:
+        # Simulates the client finishing its PUT upload_delay after creation
+        with self._lock:
+            if not upload.get('asset_id') and time.monotonic() >= upload['_asset_at']:
+                upload['asset_id'] = self.add_asset(ready=False, transcript=True)['id']
+        view = {key: value for key, value in upload.items() if not key.startswith('_')}
+        view['status'] = 'asset_created' if upload.get('asset_id') else 'waiting'
+        return view
+
+    def vtt_for(self, duration: float) -> bytes:
+        with self._lock:
+            if duration not in self._vtt:
+                self._vtt[duration] = make_vtt(duration)
+            return self._vtt[duration]
+
+    def draw(self, upstream: str) -> Tuple[float, Optional[int]]:
+        """Latency in seconds and an injected status (or None) for one request"""
+        profile = self.profiles[upstream]
+        with self._lock:
+            self.requests[upstream] = self.requests.get(upstream, 0) + 1
+            latency = profile.latency_ms / 1000
+            if profile.sigma:
+                latency *= math.exp(self._random.gauss(0, profile.sigma))
+            roll = self._random.random()
+        if roll < profile.rate_limit_rate:
+            return latency, 429
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            return latency, 500
+        return latency, None
+
+    # Mux
+
+    def mux_request(self, method: str, parts: List[str], body: Dict) -> Tuple[int, Dict]:
+        if parts[:2] != ['video', 'v1'] or len(parts) < 3:
+            return 404, {'error': {'type': 'not_found'}}
+        collection, rest = parts[2], parts[3:]
+
+        if collection == 'uploads':
+            if method == 'POST' and not rest:
+                with self._lock:
+                    upload_id = self._new_id('upload')
+                    self.uploads[upload_id] = {
+                        'id': upload_id,
+                        'url': f"{self.url}/upload/{upload_id}",
+                        'cors_origin': body.get('cors_origin'),
+                        'timeout': 3600,
+                        '_asset_at': time.monotonic() + self.upload_delay
+                    }
+                return 201, {'data': self._upload_view(self.uploads[upload_id])}
+            if method == 'GET' and len(rest) == 1 and rest[0] in self.uploads:
+                return 200, {'data': self._upload_view(self.uploads[rest[0]])}
+
+        if collection == 'assets':
+            if method == 'POST' and not rest:
+                source = (body.get('input') or [{}])[0].get('url', '')
+                source_id = source.rsplit('/', 1)[-1] if source.startswith('mux://assets/') else None
+                clip = (body.get('input') or [{}])[0]
+                duration = None
+                if clip.get('end_time') is not None:
+                    duration = clip['end_time'] - (clip.get('start_time') or 0)
+                asset = self.add_asset(duration=duration, ready=False, transcript=False, source=source_id)
+                return 201, {'data': asset}
+            if not rest or rest[0] not in self.assets:
+                return 404, {'error': {'type': 'not_found', 'messages': ['Asset not found']}}
+            asset = self.assets[rest[0]]
+            if method == 'GET' and len(rest) == 1:
+                return 200, {'data': self._asset_view(asset)}
+            if method == 'DELETE' and len(rest) == 1:
+                with self._lock:
+                    self.assets.pop(rest[0], None)
+                return 204, {}
+            if method == 'POST' and len(rest) == 4 and rest[1] == 'tracks' and rest[3] == 'generate-subtitles':
+                with self._lock:
+                    track = self._text_track(time.monotonic() + self.transcript_delay)
+                    asset['tracks'].append(track)
+                return 201, {'data': {key: value for key, value in track.items() if not key.startswith('_')}}
+
+        return 404, {'error': {'type': 'not_found'}}
+
+    def stream_request(self, parts: List[str]) -> Tuple[int, bytes]:
+        # /{playback_id}/text/{track_id}.vtt
+        if len(parts) != 3 or parts[1] != 'text' or not parts[2].endswith('.vtt'):
+            return 404, b''
+        for asset in list(self.assets.values()):
+            if any(playback['id'] == parts[0] for playback in asset['playback_ids']):
+                return 200, self.vtt_for(asset['duration'])
+        return 404, b''
+
+    # OpenAI
+
+    def chat_completion(self, body: Dict) -> Dict:
+        messages = body.get('messages') or []
+        prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+        content = json.dumps(self._completion_content(prompt))
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        with self._lock:
+            self.tokens['prompt'] += prompt_tokens
+            self.tokens['completion'] += completion_tokens
+
+        return {
+            'id': self._new_id('chatcmpl'),
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    def _completion_content(self, prompt: str):
+        """Answer in the shape each OpenAIService prompt asks for"""
+        if 'CANDIDATES:' in prompt:
+            candidates = json.loads(prompt.split('CANDIDATES:', 1)[1].split('\n\nReturn', 1)[0])
+            limit = int(_PICK.search(prompt).group(1)) if _PICK.search(prompt) else 5
+            ranked = sorted(candidates, key=lambda c: c.get('score', 0), reverse=True)
+            return [candidate['index'] for candidate in ranked[:limit]]
+        if 'CLIPS:' in prompt:
+            clips = json.loads(prompt.split('CLIPS:', 1)[1].split('\n\nFor every clip', 1)[0])
+            return [
+                {'index': clip['index'], 'caption': f"Watch: {clip['title']}", 'hashtags': ['clip', 'highlight']}
+                for clip in clips
+            ]
+        if 'CURRENT MOMENT:' in prompt:
+            return json.loads(prompt.split('CURRENT MOMENT:', 1)[1].split('\n\nUSER FEEDBACK:', 1)[0])
+        if 'TITLE:' in prompt:
+            title = prompt.split('TITLE:', 1)[1].split('\n', 1)[0].strip()
+            return {'caption': f"Watch: {title}", 'hashtags': ['clip', 'highlight']}
+        if 'TRANSCRIPT:' in prompt:
+            return self._moments(prompt)
+        return {}
+
+    def _moments(self, prompt: str) -> List[Dict]:
+        """Up to five 30-second moments spread evenly over the transcript"""
+        starts = [_timestamp_to_seconds(ts) for ts in _TIMESTAMP.findall(prompt.split('TRANSCRIPT:', 1)[1])]
+        if not starts:
+            return []
+        low, high = starts[0], starts[-1]
+        window = _WINDOW.search(prompt)
+        if window:
+            low, high = max(low, float(window.group(1))), min(high, float(window.group(2)))
+        duration = _DURATION.search(prompt)
+        if duration:
+            high = min(high, float(duration.group(1)))
+
+        moments = []
+        count = 5
+        span = max(high - low - 30, 0)
+        for i in range(count):
+            start = round(low + span * (i + 0.5) / count, 1)
+            end = round(min(start + 30, high), 1)
+            if end - start < 5:
+                continue
+            moments.append({
+                'start_time': start,
+                'end_time': end,
+                'title': f"Moment at {int(start)} seconds",
+                'description': 'A highlight picked by the fake analysis.',
+                'reason': 'Deterministic benchmark fixture.',
+                'score': round(0.9 - i * 0.05, 2)
+            })
+        return moments
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send(self, status: int, payload: bytes, content_type: str = 'application/json',
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        server: FakeUpstreams = self.server
+        body = self._read_json()
+        path = self.path.split('?', 1)[0]
+        parts = [part for part in path.split('/') if part]
+
+        if parts[:1] == ['v1']:
+            upstream = 'openai'
+        elif parts[:1] == ['stream']:
+            upstream, parts = 'stream', parts[1:]
+        else:
+            upstream = 'mux'
+
+        latency, injected = server.draw(upstream)
+        if latency:
+            time.sleep(latency)
+        if injected == 429:
+            profile = server.profiles[upstream]
+            error = {'error': {'type': 'rate_limit_exceeded', 'message': 'Too many requests'}}
+            return self._send(429, json.dumps(error).encode(),
+                              headers={'Retry-After': f"{profile.retry_after:g}"})
+        if injected:
+            error = {'error': {'type': 'server_error', 'message': 'Injected failure'}}
+            return self._send(500, json.dumps(error).encode())
+
+        if upstream == 'openai':
+            if self.command == 'POST' and parts == ['v1', 'chat', 'completions']:
+                return self._send(200, json.dumps(server.chat_completion(body)).encode())
+            return self._send(404, b'{}')
+        if upstream == 'stream':
+            status, vtt = server.stream_request(parts)
+            return self._send(status, vtt, content_type='text/vtt')
+        if parts[:1] == ['upload']:
+            # The client's PUT of the file itself; the asset appears after upload_delay
+            return self._send(200, b'')
+
+        status, payload = server.mux_request(self.command, parts, body)
+        return self._send(status, json.dumps(payload).encode() if status != 204 else b'')
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mux-latency', default='40:0.3', help='median_ms[:sigma]')
+    parser.add_argument('--stream-latency', default='20:0.3', help='median_ms[:sigma]')
+    parser.add_argument('--openai-latency', default='1500:0.4', help='median_ms[:sigma]')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--upload-delay', type=float, default=2.0)
+    parser.add_argument('--ready-delay', type=float, default=5.0)
+    parser.add_argument('--transcript-delay', type=float, default=10.0)
+    parser.add_argument('--asset-duration', type=float, default=600.0)
+    args = parser.parse_args()
+
+    rates = {
+        'error_rate': args.error_rate,
+        'rate_limit_rate': args.rate_limit_rate,
+        'retry_after': args.retry_after
+    }
+    server = FakeUpstreams(
+        args.host, args.port,
+        mux=Profile.parse(args.mux_latency, **rates),
+        stream=Profile.parse(args.stream_latency, **rates),
+        openai=Profile.parse(args.openai_latency, **rates),
+        seed=args.seed,
+        upload_delay=args.upload_delay,
+        ready_delay=args.ready_delay,
+        transcript_delay=args.transcript_delay,
+        asset_duration=args.asset_duration
+    )
+    print(f"Fake upstreams listening on {server.url}")
+    for name, value in server.config().items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
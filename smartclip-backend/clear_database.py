@@ -5,7 +5,7 @@ WARNING: This will delete all data!
 
 import os
 from dotenv import load_dotenv
-from database import db, Video, Moment, Clip
+from database import db, Video, VideoTranscript, Moment, Clip
 from flask import Flask
 from config import Config
 
@@ -75,9 +75,10 @@ def clear_all_records():
                 db.session.commit()
                 print(f"  ✅ Deleted {moment_count} moments")
 
-            # Delete videos
+            # Delete videos and their transcripts
             if video_count > 0:
                 print(f"  Deleting {video_count} videos...")
+                VideoTranscript.query.delete()
                 Video.query.delete()
                 db.session.commit()
                 print(f"  ✅ Deleted {video_count} videos")
@@ -24,15 +24,77 @@ class Config:
         'pool_recycle': 3600,
         'pool_pre_ping': True
     }
+    # Bring existing databases up to date on startup (additive only; run
+    # migrate.py as a deploy step instead when several processes start at once)
+    SCHEMA_UPGRADE_ON_STARTUP = os.getenv('SCHEMA_UPGRADE_ON_STARTUP', 'False').lower() == 'true'
     
     # Mux API
     MUX_TOKEN_ID = os.getenv('MUX_TOKEN_ID')
     MUX_TOKEN_SECRET = os.getenv('MUX_TOKEN_SECRET')
     MUX_WEBHOOK_SECRET = os.getenv('MUX_WEBHOOK_SECRET')
+    MUX_BASE_URL = os.getenv('MUX_BASE_URL', 'https://api.mux.com')
+    MUX_STREAM_URL = os.getenv('MUX_STREAM_URL', 'https://stream.mux.com')
+    
+    # Mux HTTP transport (keep-alive pool is per process, size it to worker threads)
+    MUX_HTTP_POOL_SIZE = int(os.getenv('MUX_HTTP_POOL_SIZE', '10'))
+    MUX_CONNECT_TIMEOUT = float(os.getenv('MUX_CONNECT_TIMEOUT', '3.05'))
+    MUX_READ_TIMEOUT = float(os.getenv('MUX_READ_TIMEOUT', '30'))
+    MUX_MAX_RETRIES = int(os.getenv('MUX_MAX_RETRIES', '3'))
+    MUX_BACKOFF_BASE = float(os.getenv('MUX_BACKOFF_BASE', '0.5'))
+    
+    # Mux asset cache (entries are refreshed by webhooks; TTLs bound staleness)
+    ASSET_CACHE_SETTLING_TTL = float(os.getenv('ASSET_CACHE_SETTLING_TTL', '2'))
+    ASSET_CACHE_READY_TTL = float(os.getenv('ASSET_CACHE_READY_TTL', '60'))
+    ASSET_CACHE_MAX_ENTRIES = int(os.getenv('ASSET_CACHE_MAX_ENTRIES', '1024'))
     
     # OpenAI API
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4-turbo-preview')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # e.g. a local fake server for load tests
+    
+    # Long transcripts are analyzed in overlapping windows, in parallel
+    OPENAI_CHUNK_THRESHOLD = float(os.getenv('OPENAI_CHUNK_THRESHOLD', '1200'))  # seconds
+    OPENAI_WINDOW_SECONDS = float(os.getenv('OPENAI_WINDOW_SECONDS', '600'))
+    OPENAI_WINDOW_OVERLAP = float(os.getenv('OPENAI_WINDOW_OVERLAP', '60'))
+    OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '4'))
+    OPENAI_LLM_REDUCE = os.getenv('OPENAI_LLM_REDUCE', 'False').lower() == 'true'
+    
+    # Identical transcripts reuse stored analysis results
+    ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'True').lower() == 'true'
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '1000'))
+    
+    # Background jobs
+    JOB_WORKERS_ENABLED = os.getenv('JOB_WORKERS_ENABLED', 'true').lower() == 'true'
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '2'))  # per process
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+    JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+    JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', '5'))
+    TRANSCRIPT_RETRY_DELAY = float(os.getenv('TRANSCRIPT_RETRY_DELAY', '15'))
+    TRANSCRIPT_WAIT_TIMEOUT = float(os.getenv('TRANSCRIPT_WAIT_TIMEOUT', '60'))  # minutes
+    
+    # Video reads refresh from Mux at most this often (webhooks keep them current)
+    VIDEO_REFRESH_INTERVAL = float(os.getenv('VIDEO_REFRESH_INTERVAL', '5'))
+    
+    # Background clip status polling (fallback for missed webhooks)
+    CLIP_RECONCILE_BATCH_SIZE = int(os.getenv('CLIP_RECONCILE_BATCH_SIZE', '20'))
+    CLIP_RECONCILE_MIN_INTERVAL = float(os.getenv('CLIP_RECONCILE_MIN_INTERVAL', '5'))
+    CLIP_RECONCILE_MAX_INTERVAL = float(os.getenv('CLIP_RECONCILE_MAX_INTERVAL', '60'))
+    CLIP_RECONCILE_CONCURRENCY = int(os.getenv('CLIP_RECONCILE_CONCURRENCY', '4'))  # Mux asset requests in flight
+    
+    # Mux webhook inbox
+    WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+    WEBHOOK_RETRY_DELAY = float(os.getenv('WEBHOOK_RETRY_DELAY', '30'))
+    WEBHOOK_RETENTION_HOURS = float(os.getenv('WEBHOOK_RETENTION_HOURS', '72'))  # redelivery dedupe window
+    
+    # Server-Sent Events
+    SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '15'))
+    SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))
+    SSE_MAX_PENDING = int(os.getenv('SSE_MAX_PENDING', '100'))
+    
+    # Video list pagination
+    VIDEO_LIST_PAGE_SIZE = int(os.getenv('VIDEO_LIST_PAGE_SIZE', '50'))
+    VIDEO_LIST_MAX_PAGE_SIZE = int(os.getenv('VIDEO_LIST_MAX_PAGE_SIZE', '200'))
     
     # Application settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024 * 1024  # 16GB max file size
@@ -42,6 +104,7 @@ class Config:
     MIN_CLIP_DURATION = 10  # seconds
     MAX_CLIP_DURATION = 180  # seconds (3 minutes)
     DEFAULT_MOMENTS_COUNT = 5
+    CLIP_BATCH_CONCURRENCY = int(os.getenv('CLIP_BATCH_CONCURRENCY', '4'))  # Mux clip requests in flight per bulk call
     
     # CORS
     CORS_HEADERS = 'Content-Type'
@@ -49,6 +112,16 @@ class Config:
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     
+    # Prometheus metrics at /metrics (per process)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # Response encoding
+    FAST_JSON_ENABLED = os.getenv('FAST_JSON_ENABLED', 'True').lower() == 'true'  # orjson when installed
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))  # brotli when installed
+    
     @staticmethod
     def validate():
         """Validate required configuration"""
@@ -0,0 +1,156 @@
+"""
+Shared pytest configuration
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from services.cue_store import CueStore
+
+# Tests drive jobs explicitly instead of racing background worker threads
+os.environ.setdefault('JOB_WORKERS_ENABLED', 'false')
+
+
+@pytest.fixture
+def client():
+    """Create test client"""
+    # Imported here so the environment above is set before the app is built
+    from app import app, db
+
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def statements(client):
+    """SQL statements sent to the database"""
+    from app import db
+
+    sent = []
+
+    def record(conn, cursor, statement, *args):
+        sent.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield sent
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class FakeMux:
+    """
+    MuxService stand-in
+
+    Serves `asset` (or a per-ID entry of `assets`), `upload` and `cues`, and
+    records the calls made. Tests change only the attributes they rely on.
+    """
+
+    def __init__(self):
+        self.asset = {'status': 'preparing', 'tracks': [{'type': 'text', 'status': 'ready'}]}
+        self.assets = {}
+        self.upload = {'status': 'waiting'}
+        self.cues = CueStore.from_cues([(1.0, 4.0, 'Hello')])
+        self.hold = None  # threading.Event get_asset waits on
+        self.latency = 0.0  # seconds each create_clip takes
+        self.fail_at = None  # clip start time create_clip rejects
+        self.asset_calls = []
+        self.upload_calls = 0
+        self.in_flight = 0  # get_asset/create_clip calls running now
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _request(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def get_asset(self, asset_id):
+        with self._lock:
+            self.asset_calls.append(asset_id)
+        with self._request():
+            if self.hold:
+                self.hold.wait(5)
+        return {'id': asset_id, **self.assets.get(asset_id, self.asset)}
+
+    def get_upload(self, upload_id):
+        self.upload_calls += 1
+        return self.upload
+
+    def get_transcript_cues(self, asset_id):
+        return self.cues
+
+    def get_playback_url(self, playback_id):
+        return f'https://stream.example/{playback_id}.m3u8'
+
+    def create_clip(self, asset_id, start_time, end_time):
+        with self._request():
+            time.sleep(self.latency)
+            if start_time == self.fail_at:
+                raise RuntimeError('Mux said no')
+            return {'id': f'clip_{start_time:g}', 'playback_ids': [{'id': f'play_{start_time:g}'}]}
+
+
+class FakeOpenAI:
+    """
+    OpenAIService stand-in
+
+    Finds `moments` in every transcript and captions everything except the
+    titles in `uncaptioned`, recording the calls made.
+    """
+
+    def __init__(self):
+        self.moments = [{
+            'start_time': 10.0,
+            'end_time': 30.0,
+            'title': 'Test Moment',
+            'description': 'Description',
+            'reason': 'Reason',
+            'score': 0.9
+        }]
+        self.uncaptioned = set()
+        self.hold = None  # threading.Event analyze_transcript waits on
+        self.analyze_calls = 0
+        self.caption_batches = []
+        self.caption_calls = 0
+
+    def analyze_transcript(self, transcript, video_duration=None, use_cache=True, cues=None):
+        self.analyze_calls += 1
+        if self.hold:
+            self.hold.wait(5)
+        return [dict(moment) for moment in self.moments]
+
+    def generate_social_captions(self, moments):
+        self.caption_batches.append([m['title'] for m in moments])
+        return [
+            None if m['title'] in self.uncaptioned else {'caption': f"About {m['title']}", 'hashtags': ['a', 'b']}
+            for m in moments
+        ]
+
+    def generate_social_caption(self, title, description):
+        self.caption_calls += 1
+        return {'caption': f'Single {title}', 'hashtags': ['c']}
+
+
+@pytest.fixture
+def fake_mux():
+    return FakeMux()
+
+
+@pytest.fixture
+def fake_openai():
+    return FakeOpenAI()
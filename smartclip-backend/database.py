@@ -3,14 +3,151 @@ Database models for SmartClip
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from contextlib import contextmanager
 from datetime import datetime
+import json
+import logging
+import zlib
 
 db = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+# Videos columns that moved to video_transcripts
+LEGACY_TRANSCRIPT_COLUMNS = ('transcript', 'cues')
+
+# Postgres advisory lock key held while the schema is upgraded
+SCHEMA_LOCK_KEY = 7310392
+
+
+@contextmanager
+def schema_lock():
+    """
+    Hold a lock so only one process upgrades the schema at a time
+
+    Postgres uses an advisory lock. SQLite databases are local files, so a
+    lock file next to the database serves every process on the host
+    (where fcntl exists; not on Windows). In-memory databases and other
+    dialects are not locked.
+    """
+    url = db.engine.url
+    if url.get_backend_name() == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql(f'SELECT pg_advisory_lock({SCHEMA_LOCK_KEY})')
+            try:
+                yield
+            finally:
+                conn.exec_driver_sql(f'SELECT pg_advisory_unlock({SCHEMA_LOCK_KEY})')
+    elif url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        try:
+            import fcntl
+        except ImportError:
+            logger.warning("No file locking on this platform; upgrading the schema unlocked")
+            yield
+            return
+        with open(f'{url.database}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def upgrade_schema(drop_legacy_columns=False):
+    """
+    Add columns and indexes that are missing from existing tables
+
+    create_all only creates missing tables; this brings databases created
+    by older versions up to date. New columns must be nullable. Runs under
+    schema_lock() and is safe to repeat. Nothing is dropped unless asked.
+
+    Args:
+        drop_legacy_columns: Drop the old videos transcript columns once
+            their contents are copied to video_transcripts
+    """
+    with schema_lock():
+        _upgrade_schema(drop_legacy_columns)
+
+
+def _upgrade_schema(drop_legacy_columns):
+    # Inspected on the connection that alters, so it sees the schema as it is now
+    with db.engine.begin() as conn:
+        inspector = db.inspect(conn)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                    )
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+
+        legacy = [column['name'] for column in inspector.get_columns('videos')
+                  if column['name'] in LEGACY_TRANSCRIPT_COLUMNS] if inspector.has_table('videos') else []
+    if legacy:
+        migrate_transcripts(legacy, drop=drop_legacy_columns)
+
+
+def migrate_transcripts(legacy_columns, drop=False):
+    """
+    Copy transcripts stored on videos rows into video_transcripts
+
+    Copies and compresses each transcript not copied yet. With drop, the
+    old columns are then dropped (or, where the database can't drop
+    columns, cleared); otherwise they are left as they are.
+    """
+    columns = ', '.join(legacy_columns)
+    with db.engine.begin() as conn:
+        rows = conn.exec_driver_sql(
+            f'SELECT id, {columns} FROM videos WHERE ('
+            + ' OR '.join(f'{column} IS NOT NULL' for column in legacy_columns)
+            + ') AND id NOT IN (SELECT video_id FROM video_transcripts)'
+        ).all()
+        records = []
+        for row in rows:
+            values = dict(zip(legacy_columns, row[1:]))
+            record = VideoTranscript(video_id=row[0])
+            record.text = values.get('transcript')
+            record.cues = values.get('cues')
+            records.append({
+                'video_id': record.video_id,
+                'text_data': record.text_data,
+                'cues_data': record.cues_data
+            })
+        if records:
+            conn.execute(db.insert(VideoTranscript), records)
+            logger.info(f"Copied {len(records)} transcripts to video_transcripts")
+
+    if not drop:
+        return
+    for column in legacy_columns:
+        try:
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(f'ALTER TABLE videos DROP COLUMN {column}')
+        except Exception as e:
+            logger.warning(f"Could not drop videos.{column} ({str(e)}); clearing it instead")
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(f'UPDATE videos SET {column} = NULL')
+
 
 class Video(db.Model):
     """Video model - represents uploaded videos"""
     __tablename__ = 'videos'
+    __table_args__ = (
+        # Newest-first keyset pagination of the video list; status is included
+        # so the list's status filter is checked without reading the row.
+        # There is deliberately no status-only index: SQLite would pick it for
+        # the list's status IN (...) and sort every match instead of paging.
+        db.Index('ix_videos_created_at_id_status', 'created_at', 'id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     upload_id = db.Column(db.String(255), unique=True, nullable=True)
@@ -24,8 +161,10 @@ class Video(db.Model):
     # Status values: uploading, processing, transcribing, analyzing, ready, error
     error_message = db.Column(db.String(500), nullable=True)
 
-    # Transcript
-    transcript = db.Column(db.Text, nullable=True)
+    # Transcript and cues live in video_transcripts, loaded on first access
+    transcript_record = db.relationship(
+        'VideoTranscript', uselist=False, lazy='select', cascade='all, delete-orphan'
+    )
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -34,20 +173,71 @@ class Video(db.Model):
     # Relationships
     moments = db.relationship('Moment', backref='video', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        """Convert to dictionary"""
-        return {
-            'id': str(self.id),
-            'muxAssetId': self.asset_id,
-            'muxPlaybackId': self.playback_id,
-            'title': self.source_url or f'Video {self.id}',  # Use source_url as title fallback
-            'duration': self.duration or 0,
-            'status': self.status,
-            'errorMessage': self.error_message,
-            'transcript': self.transcript,
-            'uploadUrl': self.source_url,
-            'createdAt': self.created_at.isoformat() if self.created_at else None
+    # to_dict keys and the columns each one reads
+    DICT_FIELDS = {
+        'id': ('id',),
+        'muxAssetId': ('asset_id',),
+        'muxPlaybackId': ('playback_id',),
+        'title': ('source_url', 'id'),
+        'duration': ('duration',),
+        'status': ('status',),
+        'errorMessage': ('error_message',),
+        'transcript': (),  # read through transcript_record
+        'uploadUrl': ('source_url',),
+        'createdAt': ('created_at',)
+    }
+    
+    @classmethod
+    def columns_for(cls, fields):
+        """Model attributes to load for a set of to_dict keys"""
+        names = {'id'}
+        for field in fields:
+            names.update(cls.DICT_FIELDS[field])
+        return [getattr(cls, name) for name in sorted(names)]
+    
+    def to_dict(self, fields=None):
+        """
+        Convert to dictionary
+        
+        Args:
+            fields: Only include these keys (and only read their columns)
+        """
+        data = {
+            'id': lambda: str(self.id),
+            'muxAssetId': lambda: self.asset_id,
+            'muxPlaybackId': lambda: self.playback_id,
+            'title': lambda: self.source_url or f'Video {self.id}',  # Use source_url as title fallback
+            'duration': lambda: self.duration or 0,
+            'status': lambda: self.status,
+            'errorMessage': lambda: self.error_message,
+            'transcript': lambda: self.transcript,
+            'uploadUrl': lambda: self.source_url,
+            'createdAt': lambda: self.created_at.isoformat() if self.created_at else None
         }
+        return {key: value() for key, value in data.items() if fields is None or key in fields}
+    
+    def _transcript_record(self) -> 'VideoTranscript':
+        if self.transcript_record is None:
+            self.transcript_record = VideoTranscript()
+        return self.transcript_record
+    
+    @property
+    def transcript(self):
+        """Formatted transcript text, or None"""
+        return self.transcript_record.text if self.transcript_record is not None else None
+    
+    @transcript.setter
+    def transcript(self, value):
+        self._transcript_record().text = value
+    
+    @property
+    def cues(self):
+        """Serialized CueStore, or None"""
+        return self.transcript_record.cues if self.transcript_record is not None else None
+    
+    @cues.setter
+    def cues(self, value):
+        self._transcript_record().cues = value
     
     def __repr__(self):
         status_display = {
@@ -64,9 +254,52 @@ class Video(db.Model):
         return f'<Video {self.id} - {status_text}>'
 
 
+class VideoTranscript(db.Model):
+    """
+    Transcript of a video, kept out of the videos table
+
+    Both values are stored zlib-compressed; cues are deferred further since
+    only the transcript endpoint reads them.
+    """
+    __tablename__ = 'video_transcripts'
+    
+    COMPRESSION_LEVEL = 6
+    
+    video_id = db.Column(db.Integer, db.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True)
+    text_data = db.Column(db.LargeBinary, nullable=True)  # zlib(UTF-8 transcript)
+    cues_data = db.orm.deferred(db.Column(db.LargeBinary, nullable=True))  # zlib(CueStore.to_bytes())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def text(self):
+        return zlib.decompress(self.text_data).decode('utf-8') if self.text_data is not None else None
+    
+    @text.setter
+    def text(self, value):
+        self.text_data = (
+            zlib.compress(value.encode('utf-8'), self.COMPRESSION_LEVEL) if value is not None else None
+        )
+    
+    @property
+    def cues(self):
+        return zlib.decompress(self.cues_data) if self.cues_data is not None else None
+    
+    @cues.setter
+    def cues(self, value):
+        self.cues_data = zlib.compress(value, self.COMPRESSION_LEVEL) if value is not None else None
+    
+    def __repr__(self):
+        return f'<VideoTranscript {self.video_id}>'
+
+
 class Moment(db.Model):
     """Moment model - represents detected highlight moments"""
     __tablename__ = 'moments'
+    __table_args__ = (
+        # A video's moments in timeline order: moment lists, the bundle's
+        # selectin load and the moments version aggregate
+        db.Index('ix_moments_video_id_start_time', 'video_id', 'start_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False)
@@ -80,11 +313,16 @@ class Moment(db.Model):
     description = db.Column(db.Text, nullable=True)
     reason = db.Column(db.Text, nullable=True)  # Why this was detected as a moment
     
+    # Social media copy, generated for all moments of a video after analysis
+    caption = db.Column(db.Text, nullable=True)
+    hashtags = db.Column(db.Text, nullable=True)  # Comma-separated
+    
     # Metadata
     score = db.Column(db.Float, default=0.8)  # Confidence score (0-1)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     clips = db.relationship('Clip', backref='moment', lazy=True, cascade='all, delete-orphan')
@@ -101,6 +339,8 @@ class Moment(db.Model):
             'confidenceScore': self.score,
             'keywords': [],  # TODO: Extract from description/reason
             'engagementPotential': self._calculate_engagement_potential(),
+            'caption': self.caption,
+            'hashtags': self.hashtags.split(',') if self.hashtags else [],
             'createdAt': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -120,6 +360,12 @@ class Moment(db.Model):
 class Clip(db.Model):
     """Clip model - represents generated video clips"""
     __tablename__ = 'clips'
+    __table_args__ = (
+        # A moment's clips (selectin loads, the clips version join)
+        db.Index('ix_clips_moment_id', 'moment_id'),
+        # The clip reconciler walks processing clips in id order
+        db.Index('ix_clips_status_id', 'status', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     moment_id = db.Column(db.Integer, db.ForeignKey('moments.id'), nullable=False)
@@ -131,7 +377,7 @@ class Clip(db.Model):
     
     # Status
     status = db.Column(db.String(50), default='processing')
-    # Status values: processing, ready, error
+    # Status values: processing, ready, errored
     
     # Social media content
     caption = db.Column(db.Text, nullable=True)
@@ -155,3 +401,98 @@ class Clip(db.Model):
     
     def __repr__(self):
         return f'<Clip {self.id} - {self.status}>'
+
+
+class Job(db.Model):
+    """Job model - background work picked up by the worker pool"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    
+    # Status
+    status = db.Column(db.String(50), default='queued', nullable=False)
+    # Status values: queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    dedupe_key = db.Column(db.String(255), nullable=True, index=True)  # At most one queued/running job per key
+    
+    # Scheduling
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Not picked up before this
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Visibility timeout for running jobs
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': str(self.id),
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'maxAttempts': self.max_attempts,
+            'lastError': self.last_error,
+            'result': json.loads(self.result) if self.result else None,
+            'runAt': self.run_at.isoformat() if self.run_at else None,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} - {self.status}>'
+
+
+class AnalysisCacheEntry(db.Model):
+    """Analysis cache model - memoized transcript analysis results"""
+    __tablename__ = 'analysis_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of transcript + analysis settings
+    model = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.String(50), nullable=False)
+    result = db.Column(db.Text, nullable=False)  # JSON list of moments
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # LRU eviction order
+    
+    def __repr__(self):
+        return f'<AnalysisCacheEntry {self.key[:12]} - {self.hits} hits>'
+
+
+class WebhookEvent(db.Model):
+    """Webhook event model - Mux events received but not necessarily applied yet"""
+    __tablename__ = 'webhook_events'
+    __table_args__ = (
+        db.Index('ix_webhook_events_status_received_at', 'status', 'received_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)  # Arrival order
+    event_id = db.Column(db.String(255), unique=True, nullable=True)  # Mux event ID; redeliveries collide
+    event_type = db.Column(db.String(100), nullable=False)
+    object_id = db.Column(db.String(255), nullable=True)  # Upload, asset or track the event is about
+    payload = db.Column(db.Text, nullable=True)  # JSON of the event's data object
+    
+    # Status
+    status = db.Column(db.String(50), default='pending', nullable=False)
+    # Status values: pending, processing, applied, superseded, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # Drain lease; for pending events, retry not before
+    
+    # Timestamps
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<WebhookEvent {self.id} {self.event_type} - {self.status}>'
@@ -0,0 +1,45 @@
+"""
+Script to bring an existing database up to date with the models
+
+Creates missing tables, columns and indexes and copies transcripts from
+the old videos columns to video_transcripts. Safe to run repeatedly and
+from several processes at once. Run it on deploy, before starting the web
+and worker processes.
+
+Usage:
+    python migrate.py [--drop-legacy-columns]
+"""
+
+import argparse
+import logging
+
+from dotenv import load_dotenv
+from flask import Flask
+
+# Load environment variables FIRST - Config reads DATABASE_URL on import
+load_dotenv()
+
+from config import Config  # noqa: E402
+from database import db, upgrade_schema  # noqa: E402
+
+# Setup Flask app for database access
+app = Flask(__name__)
+app.config.from_object(Config)
+db.init_app(app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drop-legacy-columns', action='store_true',
+                        help='Drop videos.transcript/videos.cues once copied (cannot be undone)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        db.create_all()
+        upgrade_schema(drop_legacy_columns=args.drop_legacy_columns)
+    print("✅ Database schema is up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Analysis Cache
+Persistent, content-addressed cache of transcript analysis results
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from database import db, AnalysisCacheEntry
+
+logger = logging.getLogger(__name__)
+
+EMPTY_RESULT = json.dumps([])
+
+
+class AnalysisCache:
+    """
+    LRU cache of analyze_transcript results in the analysis_cache table
+
+    Keys are computed by OpenAIService.analysis_cache_key; the cache only
+    stores and evicts.
+
+    Reads and writes run in their own short transactions on the engine, so a
+    caller's pending session work is never committed or rolled back by the
+    cache. Cache errors are logged and treated as misses.
+
+    Empty results are never cached: "no moments" is as likely to be a bad
+    response as a real answer, and a cached one would stick until evicted.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Least recently used entries beyond this are evicted
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Return a copy of the cached result, or None on a miss"""
+        try:
+            with db.engine.begin() as conn:
+                result = conn.execute(
+                    select(AnalysisCacheEntry.result)
+                    .where(AnalysisCacheEntry.key == key, AnalysisCacheEntry.result != EMPTY_RESULT)
+                ).scalar()
+                if result is not None:
+                    conn.execute(
+                        update(AnalysisCacheEntry)
+                        .where(AnalysisCacheEntry.key == key)
+                        .values(hits=AnalysisCacheEntry.hits + 1, last_used_at=datetime.utcnow())
+                    )
+        except Exception as e:
+            logger.error(f"Analysis cache read failed: {str(e)}")
+            self._count('errors')
+            return None
+
+        if result is None:
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        return json.loads(result)
+
+    def put(self, key: str, result: List[Dict], model: str, prompt_version: str):
+        """Store a result and evict least recently used entries over the limit"""
+        if not result:
+            return
+
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.key == key))
+                conn.execute(insert(AnalysisCacheEntry).values(
+                    key=key,
+                    model=model,
+                    prompt_version=prompt_version,
+                    result=json.dumps(result),
+                    hits=0,
+                    created_at=now,
+                    last_used_at=now
+                ))
+
+                count = conn.execute(select(func.count()).select_from(AnalysisCacheEntry)).scalar()
+                if count > self.max_entries:
+                    oldest = select(AnalysisCacheEntry.key).order_by(
+                        AnalysisCacheEntry.last_used_at
+                    ).limit(count - self.max_entries).scalar_subquery()
+                    conn.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.key.in_(oldest)))
+        except Exception as e:
+            logger.error(f"Analysis cache write failed: {str(e)}")
+            self._count('errors')
+
+    def record_bypass(self):
+        """Count a lookup skipped at the caller's request"""
+        self._count('bypassed')
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'errors': self.errors,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
@@ -0,0 +1,149 @@
+"""
+Asset Cache
+Read-through cache for Mux asset lookups
+"""
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class AssetCache:
+    """
+    TTL cache of Mux asset objects keyed by asset_id
+
+    Assets that are still changing (preparing, or ready with tracks still
+    being generated) expire quickly; settled assets are kept longer. Webhook
+    events refresh or invalidate entries, so the TTL only bounds staleness
+    when a webhook is missed. Concurrent misses for the same asset share a
+    single upstream request.
+    """
+
+    def __init__(self, settling_ttl: float = 2.0, ready_ttl: float = 60.0,
+                 errored_ttl: float = 300.0, max_entries: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache
+
+        Args:
+            settling_ttl: Seconds to keep assets whose status or tracks are still changing
+            ready_ttl: Seconds to keep ready assets whose tracks are all settled
+            errored_ttl: Seconds to keep errored assets
+            max_entries: Least recently used entries beyond this are evicted
+            clock: Monotonic time source, overridable for tests
+        """
+        self.settling_ttl = settling_ttl
+        self.ready_ttl = ready_ttl
+        self.errored_ttl = errored_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, asset_id: str, loader: Callable[[], Dict]) -> Dict:
+        """
+        Return the cached asset, loading it on a miss
+
+        Args:
+            asset_id: Mux asset ID
+            loader: Fetches the asset from Mux
+
+        Returns:
+            Asset dict (shared between callers, treat as read-only)
+        """
+        asset = self.peek(asset_id)
+        if asset is not None:
+            return asset
+
+        asset, shared = self._flight.do(asset_id, lambda: self._load(asset_id, loader))
+        with self._lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        return asset
+
+    def peek(self, asset_id: str) -> Optional[Dict]:
+        """Return the cached asset if present and fresh, without loading"""
+        with self._lock:
+            entry = self._entries.get(asset_id)
+            if entry is None:
+                return None
+            asset, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[asset_id]
+                return None
+            self._entries.move_to_end(asset_id)
+            self.hits += 1
+            return asset
+
+    def put(self, asset_id: str, asset: Dict):
+        """Store a fresh copy of an asset, e.g. from a webhook payload"""
+        expires_at = self._clock() + self._ttl_for(asset)
+        with self._lock:
+            self._entries[asset_id] = (asset, expires_at)
+            self._entries.move_to_end(asset_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, asset_id: str):
+        """Drop an asset so the next read goes to Mux"""
+        with self._lock:
+            self._entries.pop(asset_id, None)
+
+    def apply_webhook(self, event_type: str, data: Dict):
+        """
+        Keep the cache in step with a Mux webhook event
+
+        Asset events carry the full asset object and refresh the entry.
+        Track events only carry the track, so the parent asset is dropped.
+        """
+        if not event_type or not event_type.startswith('video.asset.') or not data:
+            return
+
+        if event_type.startswith('video.asset.track.') or event_type.startswith('video.asset.static_rendition.'):
+            asset_id = data.get('asset_id')
+            if asset_id:
+                self.invalidate(asset_id)
+        elif event_type == 'video.asset.deleted':
+            self.invalidate(data.get('id'))
+        elif data.get('id'):
+            self.put(data['id'], data)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced
+            }
+
+    def _load(self, asset_id: str, loader: Callable[[], Dict]) -> Dict:
+        asset = loader()
+        self.put(asset_id, asset)
+        return asset
+
+    def _ttl_for(self, asset: Dict) -> float:
+        status = asset.get('status')
+        if status == 'errored':
+            return self.errored_ttl
+        if status != 'ready':
+            return self.settling_ttl
+        for track in asset.get('tracks', []):
+            if track.get('status') not in (None, 'ready', 'errored'):
+                return self.settling_ttl
+        return self.ready_ttl
@@ -0,0 +1,112 @@
+"""
+Response Compression
+gzip/brotli encoding of API responses, negotiated from Accept-Encoding
+"""
+
+import gzip
+import logging
+from typing import Iterable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json',
+    'text/plain',
+    'text/html',
+    'text/vtt',
+})
+
+
+class ResponseCompressor:
+    """
+    Compresses finished responses that are big enough to be worth it
+
+    Only complete, buffered 2xx responses of a compressible type are
+    touched (not 204, which has no body, or 206, whose Content-Range counts
+    unencoded bytes); streams (e.g. Server-Sent Events), file passthroughs and
+    responses that already have a Content-Encoding are left alone. Brotli
+    is preferred when the client accepts it and the module is installed.
+    """
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5,
+                 mimetypes: Iterable[str] = COMPRESSIBLE_MIMETYPES):
+        """
+        Initialize the compressor
+
+        Args:
+            min_size: Smallest body (bytes) to compress
+            gzip_level: gzip compression level (1-9)
+            brotli_quality: brotli quality (0-11); mid values suit per-request compression
+            mimetypes: Response mimetypes to compress
+        """
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+
+    @property
+    def encodings(self) -> List[str]:
+        """Supported encodings, most preferred first"""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def negotiate(self, accept_encodings) -> Optional[str]:
+        """
+        Pick the encoding for a request
+
+        Args:
+            accept_encodings: request.accept_encodings
+
+        Returns:
+            'br', 'gzip', or None for identity
+        """
+        for encoding in self.encodings:
+            # Our preference wins among acceptable encodings; q=0 excludes
+            if accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+    def encode(self, data: bytes, encoding: str) -> bytes:
+        """Compress a body with the given encoding"""
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, response, accept_encodings):
+        """
+        Compress a response in place if it qualifies
+
+        Args:
+            response: Finished Flask response
+            accept_encodings: request.accept_encodings
+
+        Returns:
+            The same response
+        """
+        if (
+            not 200 <= response.status_code < 300
+            or response.status_code in (204, 206)
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.mimetypes
+        ):
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        # Whether this response is compressed depends on the request header
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(self.encode(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
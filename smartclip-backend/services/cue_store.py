@@ -0,0 +1,167 @@
+"""
+Cue Store
+Compact, searchable representation of a timed transcript
+"""
+
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Serialized layout: header, then starts (float32), ends (float32),
+# text offsets (uint32, count + 1 entries) and the UTF-8 text blob.
+# Arrays are stored little-endian.
+_MAGIC = b'CUE1'
+_HEADER = struct.Struct('<4sII')  # magic, cue count, blob length in bytes
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as HH:MM:SS.mmm"""
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+class CueStore:
+    """
+    Timed transcript cues held as parallel arrays
+
+    Start and end times are float32 seconds (millisecond precision up to
+    about 4.5 hours), cue texts are slices of one string addressed by
+    offsets. Cues are kept sorted by start time, so time lookups and range
+    queries are binary searches instead of scans over transcript text.
+    """
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: str):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_cues(cls, cues: Iterable[Tuple[float, float, str]]) -> 'CueStore':
+        """Build from (start, end, text) tuples, e.g. a stream of parsed cues"""
+        starts, ends, offsets = array('f'), array('f'), array('I', [0])
+        parts = []
+        length = 0
+        in_order = True
+        for start, end, text in cues:
+            if starts and start < starts[-1]:
+                in_order = False
+            starts.append(start)
+            ends.append(max(start, end))
+            parts.append(text)
+            length += len(text)
+            offsets.append(length)
+        store = cls(starts, ends, offsets, ''.join(parts))
+        if not in_order:
+            store = cls.from_cues(sorted(store, key=lambda cue: cue[0]))
+        return store
+
+    @classmethod
+    def from_segments(cls, segments: List[Tuple[float, str]],
+                      duration: Optional[float] = None) -> 'CueStore':
+        """
+        Build from (start, text) segments, e.g. a parsed formatted transcript
+
+        Each cue ends where the next one starts; the last one ends at
+        duration when known.
+        """
+        cues = []
+        for i, (start, text) in enumerate(segments):
+            if i + 1 < len(segments):
+                end = segments[i + 1][0]
+            else:
+                end = duration if duration else start
+            cues.append((start, end, text))
+        return cls.from_cues(cues)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CueStore':
+        """Load a store serialized with to_bytes"""
+        magic, count, blob_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized cue store")
+
+        position = _HEADER.size
+        arrays = []
+        for typecode, length in (('f', count), ('f', count), ('I', count + 1)):
+            values = array(typecode)
+            size = values.itemsize * length
+            values.frombytes(data[position:position + size])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            arrays.append(values)
+            position += size
+
+        text = data[position:position + blob_length].decode('utf-8')
+        return cls(arrays[0], arrays[1], arrays[2], text)
+
+    def to_bytes(self) -> bytes:
+        """Serialize for storage in a binary column"""
+        blob = self.text.encode('utf-8')
+        parts = [_HEADER.pack(_MAGIC, len(self), len(blob))]
+        for values in (self.starts, self.ends, self.offsets):
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            parts.append(values.tobytes())
+        parts.append(blob)
+        return b''.join(parts)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Tuple[float, float, str]]:
+        for i in range(len(self)):
+            yield self.cue(i)
+
+    @property
+    def end_time(self) -> float:
+        """End of the last cue, 0 when empty"""
+        return max(self.ends) if len(self) else 0.0
+
+    def cue_text(self, index: int) -> str:
+        """Text of one cue"""
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def cue(self, index: int) -> Tuple[float, float, str]:
+        """(start, end, text) of one cue"""
+        return self.starts[index], self.ends[index], self.cue_text(index)
+
+    def index_at(self, seconds: float) -> Optional[int]:
+        """Index of the cue being spoken at a time, None between cues"""
+        index = bisect_right(self.starts, seconds) - 1
+        if index >= 0 and seconds < self.ends[index]:
+            return index
+        return None
+
+    def range(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Index bounds [first, last) of cues overlapping start..end
+
+        Assumes cues don't overlap each other, as in generated subtitles.
+        """
+        first = bisect_right(self.starts, start) - 1
+        if first < 0 or self.ends[first] <= start:
+            first += 1
+        last = bisect_left(self.starts, end)
+        return first, max(first, last)
+
+    def segments(self, start: int = 0, stop: Optional[int] = None) -> List[Tuple[float, str]]:
+        """(start, text) pairs for a slice of cues"""
+        stop = len(self) if stop is None else stop
+        return [(self.starts[i], self.cue_text(i)) for i in range(start, stop)]
+
+    def text_between(self, start: float, end: float) -> str:
+        """Spoken text of the cues overlapping start..end"""
+        first, last = self.range(start, end)
+        return ' '.join(self.cue_text(i) for i in range(first, last))
+
+    def to_transcript(self, start: int = 0, stop: Optional[int] = None) -> str:
+        """Format as "[HH:MM:SS.mmm] text" blocks, the Video.transcript format"""
+        return '\n\n'.join(
+            f"[{format_timestamp(cue_start)}] {text}"
+            for cue_start, text in self.segments(start, stop)
+        )
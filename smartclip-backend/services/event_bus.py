@@ -0,0 +1,161 @@
+"""
+Event Bus
+In-process pub/sub fan-out for pushing status changes to open streams
+"""
+
+import itertools
+import json
+import logging
+import queue
+import threading
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, inspect
+
+from database import Video, Moment, Clip
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    """A published event"""
+
+    __slots__ = ('id', 'name', 'data')
+
+    def __init__(self, id: int, name: str, data: Dict):
+        self.id = id
+        self.name = name
+        self.data = data
+
+    def to_sse(self) -> str:
+        """Format as a Server-Sent Events message"""
+        return f"id: {self.id}\nevent: {self.name}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded mailbox for one topic"""
+
+    def __init__(self, topic: str, max_pending: int):
+        self.topic = topic
+        self._queue: 'queue.Queue[Event]' = queue.Queue(maxsize=max_pending)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Wait for the next event; returns None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _deliver(self, evt: Event):
+        # A slow consumer loses its oldest events rather than blocking publishers
+        while True:
+            try:
+                self._queue.put_nowait(evt)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class EventBus:
+    """
+    Topic-based fan-out
+
+    Publishing is one dictionary lookup plus a put per subscriber, so the
+    cost of a status transition does not depend on how the viewers learn
+    about it. Events only reach subscribers in the same process.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        """
+        Initialize the bus
+
+        Args:
+            max_pending: Events buffered per subscriber before the oldest are dropped
+        """
+        self.max_pending = max_pending
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Start receiving events for a topic"""
+        subscription = Subscription(topic, self.max_pending)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop receiving events"""
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic: str, name: str, data: Dict) -> Event:
+        """Deliver an event to every subscriber of a topic"""
+        evt = Event(next(self._ids), name, data)
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            subscription._deliver(evt)
+        return evt
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        """Number of open subscriptions, for one topic or overall"""
+        with self._lock:
+            if topic is not None:
+                return len(self._topics.get(topic, ()))
+            return sum(len(s) for s in self._topics.values())
+
+
+def video_topic(video_id) -> str:
+    """Topic name for events about a video and its clips"""
+    return f"video:{video_id}"
+
+
+def video_status_event(video) -> Dict:
+    """Payload of a video status event"""
+    return {
+        'videoId': str(video.id),
+        'status': video.status,
+        'errorMessage': video.error_message
+    }
+
+
+def publish_status_changes(session, bus: EventBus):
+    """
+    Publish video and clip status transitions when they are committed
+
+    Changes are collected on flush and only published after the
+    transaction commits, so subscribers never see rolled-back states.
+    """
+
+    @event.listens_for(session, 'after_flush')
+    def collect(sess, flush_context):
+        pending = sess.info.setdefault('status_events', [])
+        for obj in list(sess.new) + list(sess.dirty):
+            if not isinstance(obj, (Video, Clip)):
+                continue
+            if obj not in sess.new and not inspect(obj).attrs.status.history.has_changes():
+                continue
+            if isinstance(obj, Video):
+                pending.append((video_topic(obj.id), 'status', video_status_event(obj)))
+            else:
+                with sess.no_autoflush:
+                    moment = sess.get(Moment, obj.moment_id)
+                if moment is not None:
+                    pending.append((video_topic(moment.video_id), 'clip', obj.to_dict()))
+
+    @event.listens_for(session, 'after_commit')
+    def publish(sess):
+        for topic, name, data in sess.info.pop('status_events', []):
+            bus.publish(topic, name, data)
+
+    @event.listens_for(session, 'after_rollback')
+    def discard(sess):
+        sess.info.pop('status_events', None)
@@ -0,0 +1,184 @@
+"""
+HTTP Transport
+Pooled, retrying HTTP client shared by upstream API services
+"""
+
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_upstream
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointStats:
+    """Latency and outcome counters for a single endpoint"""
+
+    __slots__ = ('calls', 'errors', 'retries', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'total_seconds': round(self.total_seconds, 6),
+            'avg_seconds': round(self.total_seconds / self.calls, 6) if self.calls else 0.0,
+            'max_seconds': round(self.max_seconds, 6)
+        }
+
+
+class HttpTransport:
+    """
+    Keep-alive connection pool with timeouts and retries
+
+    One transport is shared by every request a service makes, so TCP and TLS
+    connections are reused across calls instead of being set up per request.
+    Retries use full-jitter exponential backoff and honour Retry-After.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 sleep=time.sleep, upstream: str = 'http'):
+        """
+        Initialize the connection pool
+
+        Args:
+            pool_size: Max keep-alive connections per host (one per worker thread)
+            connect_timeout: Seconds to wait for a TCP connection
+            read_timeout: Seconds to wait between bytes of the response
+            max_retries: Retries after the first attempt (0 disables retrying)
+            backoff_base: Base delay in seconds for exponential backoff
+            backoff_max: Upper bound for a single backoff delay
+            sleep: Sleep function, overridable for tests
+            upstream: Upstream name used to label exported metrics
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self.upstream = upstream
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats: Dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def request(self, method: str, url: str, endpoint: Optional[str] = None,
+                **kwargs) -> requests.Response:
+        """
+        Send a request, retrying on 429/5xx and connection failures
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            endpoint: Label used for latency counters (defaults to the URL)
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            The final response; callers decide whether to raise_for_status()
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout)
+        label = endpoint or url
+
+        started = time.perf_counter()
+        attempt = 0
+        failed = True
+        try:
+            while True:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if not self._should_retry(method, attempt, status=None):
+                        raise
+                    delay = self._backoff(attempt)
+                    logger.warning(f"{method} {label} failed ({e}), retrying in {delay:.2f}s")
+                else:
+                    if (response.status_code not in self.RETRY_STATUSES
+                            or not self._should_retry(method, attempt, response.status_code)):
+                        failed = response.status_code >= 400
+                        return response
+                    delay = self._retry_after(response)
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    logger.warning(
+                        f"{method} {label} returned {response.status_code}, "
+                        f"retrying in {delay:.2f}s"
+                    )
+                    response.close()
+
+                attempt += 1
+                self._sleep(delay)
+        finally:
+            self._record(label, time.perf_counter() - started, attempt, failed)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Snapshot of per-endpoint latency counters (exported as smartclip_upstream_*)"""
+        with self._stats_lock:
+            return {endpoint: s.to_dict() for endpoint, s in self._stats.items()}
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+    def _record(self, endpoint: str, elapsed: float, retries: int, failed: bool):
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.calls += 1
+            stats.retries += retries
+            stats.errors += int(failed)
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+        record_upstream(self.upstream, endpoint, elapsed, failed, retries)
+
+    def _should_retry(self, method: str, attempt: int, status: Optional[int]) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        # A 429 means the request was rejected before it was processed, so it is
+        # safe to resend anything. Other failures may have had side effects.
+        return status == 429 or method in self.IDEMPOTENT_METHODS
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return min(max(delay, 0.0), self.backoff_max)
@@ -0,0 +1,378 @@
+"""
+Job Queue
+Persistent background jobs backed by the jobs table, and the worker pool that runs them
+"""
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, update
+
+from database import db, Job
+
+logger = logging.getLogger(__name__)
+
+
+class RetryJob(Exception):
+    """
+    Raised by a handler to reschedule its job
+
+    Counts as an attempt. If delay is omitted the queue's exponential
+    backoff is used.
+
+    With max_wait the job is waiting on something outside it (a transcript
+    Mux is still generating), not failing: the retry doesn't count as an
+    attempt, and the job fails once it is max_wait seconds old instead.
+    """
+
+    def __init__(self, message: str = '', delay: Optional[float] = None,
+                 max_wait: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+        self.max_wait = max_wait
+
+
+class JobQueue:
+    """
+    Durable job queue on top of the application database
+
+    Jobs are claimed with a conditional UPDATE, so several worker threads or
+    processes can poll the same table without double-claiming. A claimed job
+    is leased for visibility_timeout seconds; if its worker dies the lease
+    lapses and another worker picks the job up again.
+    """
+
+    def __init__(self, app, max_attempts: int = 5, visibility_timeout: float = 600,
+                 backoff_base: float = 5, backoff_max: float = 600):
+        """
+        Initialize the queue
+
+        Args:
+            app: Flask app, used to push an app context around each job
+            max_attempts: Default attempts before a job is marked failed
+            visibility_timeout: Seconds a claimed job stays leased to its worker
+            backoff_base: Base delay in seconds between retries
+            backoff_max: Upper bound for a single retry delay
+        """
+        self.app = app
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._handlers: Dict[str, Callable[[Dict], Optional[Dict]]] = {}
+        self._failure_handlers: Dict[str, Callable[[Dict, str], None]] = {}
+
+    def register(self, kind: str, handler: Callable[[Dict], Optional[Dict]],
+                 on_failure: Optional[Callable[[Dict, str], None]] = None):
+        """
+        Register the handler for a job kind
+
+        Args:
+            kind: Job kind name
+            handler: Called with the job payload; its return value is stored as the result
+            on_failure: Called with (payload, error) once the job has run out of attempts
+        """
+        self._handlers[kind] = handler
+        if on_failure:
+            self._failure_handlers[kind] = on_failure
+
+    def enqueue(self, kind: str, payload: Optional[Dict] = None, delay: float = 0,
+                max_attempts: Optional[int] = None, dedupe_key: Optional[str] = None) -> Job:
+        """
+        Add a job to the queue (commits the current session)
+
+        Args:
+            kind: Registered job kind
+            payload: JSON-serializable job arguments
+            delay: Seconds before the job becomes eligible to run
+            max_attempts: Override the queue default
+            dedupe_key: Lets callers find this job with find_active()
+
+        Returns:
+            The persisted Job
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            status='queued',
+            max_attempts=max_attempts or self.max_attempts,
+            dedupe_key=dedupe_key,
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        logger.info(f"Enqueued job {job.id} ({kind})")
+        return job
+
+    def find_active(self, kind: str, dedupe_key: str,
+                    statuses: Tuple[str, ...] = ('queued', 'running')) -> Optional[Job]:
+        """The newest queued or running (or given statuses) job of a kind with the given dedupe key"""
+        return db.session.execute(
+            db.select(Job)
+            .where(
+                Job.kind == kind,
+                Job.dedupe_key == dedupe_key,
+                Job.status.in_(statuses)
+            )
+            .order_by(Job.id.desc())
+            .limit(1)
+        ).scalar()
+
+    def wake(self, job_id: int) -> bool:
+        """
+        Make a queued job eligible to run now (commits the current session)
+
+        For jobs sleeping until a retry whose precondition has since been
+        met, e.g. a transcript that became ready.
+
+        Returns:
+            True if the job was waiting and has been moved up
+        """
+        now = datetime.utcnow()
+        woken = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'queued', Job.run_at > now)
+            .values(run_at=now)
+        ).rowcount == 1
+        db.session.commit()
+
+        if woken:
+            logger.info(f"Woke job {job_id}")
+        return woken
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+        """
+        Lease up to limit eligible jobs to a worker
+
+        Eligible jobs are queued jobs whose run_at has passed, and running
+        jobs whose lease expired before they finished.
+        """
+        now = datetime.utcnow()
+        self._fail_exhausted(now)
+
+        eligible = or_(
+            and_(Job.status == 'queued', Job.run_at <= now),
+            and_(Job.status == 'running', Job.locked_until < now)
+        )
+        candidates = db.session.execute(
+            db.select(Job.id)
+            .where(eligible, Job.attempts < Job.max_attempts)
+            .order_by(Job.run_at, Job.id)
+            .limit(limit)
+        ).scalars().all()
+
+        claimed = []
+        for job_id in candidates:
+            result = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, eligible, Job.attempts < Job.max_attempts)
+                .values(
+                    status='running',
+                    attempts=Job.attempts + 1,
+                    locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=self.visibility_timeout),
+                    updated_at=now
+                )
+            )
+            if result.rowcount == 1:
+                claimed.append(job_id)
+        db.session.commit()
+
+        if not claimed:
+            return []
+        return db.session.execute(
+            db.select(Job).where(Job.id.in_(claimed)).order_by(Job.run_at, Job.id)
+        ).scalars().all()
+
+    def run(self, job: Job, worker_id: str):
+        """Execute a claimed job and record its outcome"""
+        handler = self._handlers.get(job.kind)
+        payload = json.loads(job.payload) if job.payload else {}
+
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job.kind}")
+            result = handler(payload)
+        except RetryJob as e:
+            db.session.rollback()
+            self._retry(job, worker_id, payload, str(e) or 'Retry requested', e.delay, e.max_wait)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {str(e)}")
+            db.session.rollback()
+            self._retry(job, worker_id, payload, str(e))
+        else:
+            self._finish(job, worker_id, status='succeeded', result=result)
+            logger.info(f"Job {job.id} ({job.kind}) succeeded")
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """Look up a job by ID"""
+        return db.session.get(Job, job_id)
+
+    def backoff(self, attempts: int) -> float:
+        """Jittered exponential delay before the next attempt"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(attempts - 1, 0)))
+        return random.uniform(delay / 2, delay)
+
+    def _retry(self, job: Job, worker_id: str, payload: Dict, error: str,
+               delay: Optional[float] = None, max_wait: Optional[float] = None):
+        now = datetime.utcnow()
+        waiting = max_wait is not None
+        if waiting and job.created_at and now - job.created_at >= timedelta(seconds=max_wait):
+            error = f"{error} after waiting {max_wait:g}s"
+            self._finish(job, worker_id, status='failed', error=error)
+            logger.error(f"Job {job.id} ({job.kind}) gave up waiting after {max_wait:g}s")
+            self._notify_failure(job.kind, payload, error)
+            return
+        if not waiting and job.attempts >= job.max_attempts:
+            self._finish(job, worker_id, status='failed', error=error)
+            logger.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts")
+            self._notify_failure(job.kind, payload, error)
+            return
+
+        if delay is None:
+            delay = self.backoff(job.attempts)
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.locked_by == worker_id)
+            .values(
+                status='queued',
+                # A wait hands back the attempt claim() took
+                attempts=Job.attempts - 1 if waiting else Job.attempts,
+                locked_by=None,
+                locked_until=None,
+                last_error=error,
+                run_at=now + timedelta(seconds=delay)
+            )
+        )
+        db.session.commit()
+        logger.info(f"Job {job.id} ({job.kind}) rescheduled in {delay:.1f}s")
+
+    def _finish(self, job: Job, worker_id: str, status: str, result: Optional[Dict] = None,
+                error: Optional[str] = None):
+        # Only the worker holding the lease may settle the job
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.locked_by == worker_id)
+            .values(
+                status=status,
+                locked_by=None,
+                locked_until=None,
+                last_error=error,
+                result=json.dumps(result) if result is not None else None
+            )
+        )
+        db.session.commit()
+
+    def _fail_exhausted(self, now: datetime):
+        """Fail leased jobs whose worker died on their last attempt"""
+        exhausted = db.session.execute(
+            db.select(Job).where(
+                Job.status == 'running',
+                Job.locked_until < now,
+                Job.attempts >= Job.max_attempts
+            )
+        ).scalars().all()
+
+        for job in exhausted:
+            result = db.session.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == 'running', Job.locked_until < now)
+                .values(status='failed', locked_by=None, locked_until=None,
+                        last_error='Visibility timeout expired on final attempt')
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                payload = json.loads(job.payload) if job.payload else {}
+                self._notify_failure(job.kind, payload, 'Visibility timeout expired on final attempt')
+
+    def _notify_failure(self, kind: str, payload: Dict, error: str):
+        on_failure = self._failure_handlers.get(kind)
+        if not on_failure:
+            return
+        try:
+            on_failure(payload, error)
+        except Exception as e:
+            logger.error(f"Failure handler for {kind} raised: {str(e)}")
+            db.session.rollback()
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of threads polling a JobQueue
+
+    The pool size is the per-process concurrency cap: at most that many jobs
+    run at once in this worker, however many are queued.
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = 2, poll_interval: float = 1.0):
+        """
+        Initialize the pool
+
+        Args:
+            queue: JobQueue to pull work from
+            concurrency: Number of jobs this process runs at the same time
+            poll_interval: Seconds an idle thread waits before polling again
+        """
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._id_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        """Start the worker threads"""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._loop,
+                args=(f"{self._id_prefix}:{i}",),
+                name=f"job-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.concurrency} job workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Signal the threads to exit and wait for them"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self, worker_id: Optional[str] = None) -> int:
+        """
+        Claim and run at most one job in the calling thread
+
+        Returns:
+            Number of jobs run (0 or 1)
+        """
+        worker_id = worker_id or f"{self._id_prefix}:inline"
+        with self.queue.app.app_context():
+            jobs = self.queue.claim(worker_id, limit=1)
+            for job in jobs:
+                self.queue.run(job, worker_id)
+            return len(jobs)
+
+    def _loop(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once(worker_id)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} error: {str(e)}")
+                ran = 0
+            if not ran:
+                self._stop.wait(self.poll_interval)
@@ -0,0 +1,75 @@
+"""
+JSON Provider
+Flask JSON encoding backed by orjson when it is installed
+"""
+
+import logging
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Drop-in replacement for Flask's JSON provider
+
+    Encodes with orjson (C, UTF-8 bytes straight into the response) and
+    falls back to the stdlib encoder when orjson is missing, when a call
+    passes stdlib-only options, or when orjson rejects a value (e.g.
+    integers beyond 64 bits). Output matches the default provider's
+    semantics: sorted keys, non-string keys stringified, dates as HTTP dates
+    and other types through the same default().
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = orjson is not None
+        if not self.fast:
+            logger.info("orjson not installed; using the stdlib JSON encoder")
+
+    def _options(self, indent: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.fast and not kwargs:
+            try:
+                return self._encode(obj).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.fast and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # Let the stdlib raise its usual error (and accept what it accepts, e.g. NaN)
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.fast:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._encode(obj, indent) + b'\n'
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,266 @@
+"""
+Metrics
+In-process counters, histograms and gauges exposed in the Prometheus text format
+"""
+
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a 1 ms DB query to a multi-minute analysis completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+QUERY_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE'})
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base for a named metric family with a fixed set of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Bucketed observations (e.g. latencies) per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackGauge(Metric):
+    """Gauge whose values are computed when scraped"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def samples(self):
+        try:
+            values = sorted(self.collect())
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {str(e)}")
+            return
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter kept by another object (e.g. a service's stats()), read when scraped"""
+
+    kind = 'counter'
+
+
+class Registry:
+    """Set of metrics rendered together by /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str],
+              collect: Callable[[], Iterable[Tuple[LabelValues, float]]]) -> CallbackGauge:
+        return self._add(CallbackGauge(name, help, labels, collect))
+
+    def callback_counter(self, name: str, help: str, labels: Sequence[str],
+                         collect: Callable[[], Iterable[Tuple[LabelValues, float]]]) -> CallbackCounter:
+        return self._add(CallbackCounter(name, help, labels, collect))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the metrics the services record into
+registry = Registry()
+
+UPSTREAM_SECONDS = registry.histogram(
+    'smartclip_upstream_request_seconds',
+    'Upstream API call latency, including retries',
+    ['upstream', 'endpoint', 'outcome']
+)
+UPSTREAM_RETRIES = registry.counter(
+    'smartclip_upstream_retries_total',
+    'Upstream API requests resent after a 429, 5xx or connection failure',
+    ['upstream', 'endpoint']
+)
+OPENAI_TOKENS = registry.counter(
+    'smartclip_openai_tokens_total',
+    'OpenAI tokens used',
+    ['method', 'type']
+)
+
+
+def record_upstream(upstream: str, endpoint: str, elapsed: float, failed: bool, retries: int = 0):
+    """Record one upstream call"""
+    UPSTREAM_SECONDS.observe(elapsed, upstream=upstream, endpoint=endpoint,
+                             outcome='error' if failed else 'ok')
+    if retries:
+        UPSTREAM_RETRIES.inc(retries, upstream=upstream, endpoint=endpoint)
+
+
+def instrument_engine(engine, metrics: Registry = registry) -> Histogram:
+    """
+    Time every statement sent through a SQLAlchemy engine
+
+    Args:
+        engine: SQLAlchemy Engine
+        metrics: Registry to record into
+
+    Returns:
+        The query latency histogram (its _count is the query count)
+    """
+    from sqlalchemy import event
+
+    queries = metrics.histogram(
+        'smartclip_db_query_seconds',
+        'Database statement latency by operation',
+        ['operation']
+    )
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        verb = statement.lstrip()[:6].upper()
+        operation = verb if verb in QUERY_OPERATIONS else 'OTHER'
+        queries.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, 'handle_error')
+    def failed(context):
+        # Keep the start-time stack balanced when a statement raises
+        stack = context.connection.info.get('query_started') if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    return queries
@@ -3,32 +3,63 @@ Mux Video API Service
 Handles all interactions with Mux Video API
 """
 
+import re
 import requests
 from requests.auth import HTTPBasicAuth
 import logging
 
+from .http_transport import HttpTransport
+from .cue_store import CueStore
+from .vtt_parser import parse_vtt
+
 logger = logging.getLogger(__name__)
 
+# Path segments that follow these collection names are resource IDs
+_ID_SEGMENT = re.compile(r'/(uploads|assets|tracks)/[^/]+')
+
+
+def _endpoint_template(endpoint):
+    """Collapse resource IDs so latency counters group by endpoint shape"""
+    return _ID_SEGMENT.sub(r'/\1/{id}', endpoint)
+
 
 class MuxService:
     """Service for interacting with Mux Video API"""
     
     BASE_URL = 'https://api.mux.com'
+    STREAM_URL = 'https://stream.mux.com'
+    VTT_CHUNK_SIZE = 64 * 1024
     
-    def __init__(self, token_id, token_secret):
-        """Initialize with Mux credentials"""
+    def __init__(self, token_id, token_secret, transport=None, base_url=None, stream_url=None,
+                 asset_cache=None):
+        """
+        Initialize with Mux credentials
+
+        Args:
+            token_id: Mux access token ID
+            token_secret: Mux access token secret
+            transport: Shared HttpTransport (a default pool is created if omitted)
+            base_url: Override for the Mux API host, e.g. a local fake server
+            stream_url: Override for the Mux stream host serving VTT files
+            asset_cache: Optional AssetCache placed in front of get_asset
+        """
         self.token_id = token_id
         self.token_secret = token_secret
         self.auth = HTTPBasicAuth(token_id, token_secret)
+        self.transport = transport or HttpTransport()
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.stream_url = (stream_url or self.STREAM_URL).rstrip('/')
+        self.asset_cache = asset_cache
     
     def _make_request(self, method, endpoint, **kwargs):
         """Make authenticated request to Mux API"""
-        url = f"{self.BASE_URL}{endpoint}"
+        url = f"{self.base_url}{endpoint}"
         
         try:
-            response = requests.request(
-                method=method,
-                url=url,
+            response = self.transport.request(
+                method,
+                url,
+                endpoint=f"{method} {_endpoint_template(endpoint)}",
                 auth=self.auth,
                 **kwargs
             )
@@ -79,8 +110,20 @@ class MuxService:
         )
         return response['data']
 
-    def get_asset(self, asset_id):
-        """Get asset details"""
+    def get_asset(self, asset_id, use_cache=True):
+        """
+        Get asset details
+
+        Served from the asset cache when one is configured; pass
+        use_cache=False to force a fresh read from Mux.
+        """
+        if self.asset_cache is not None:
+            if not use_cache:
+                self.asset_cache.invalidate(asset_id)
+            return self.asset_cache.get(asset_id, lambda: self._fetch_asset(asset_id))
+        return self._fetch_asset(asset_id)
+
+    def _fetch_asset(self, asset_id):
         response = self._make_request(
             'GET',
             f'/video/v1/assets/{asset_id}'
@@ -128,6 +171,8 @@ class MuxService:
                 f'/video/v1/assets/{asset_id}/tracks/{audio_track_id}/generate-subtitles',
                 json=payload
             )
+            if self.asset_cache is not None:
+                self.asset_cache.invalidate(asset_id)
 
             logger.info(f"Transcript generation started for asset {asset_id}")
             return response.get('data')
@@ -141,6 +186,14 @@ class MuxService:
         Get transcript for an asset
         Returns formatted transcript text
         """
+        cues = self.get_transcript_cues(asset_id)
+        return cues.to_transcript() if cues is not None else None
+    
+    def get_transcript_cues(self, asset_id):
+        """
+        Get transcript for an asset
+        Returns a CueStore, or None if the transcript isn't available
+        """
         try:
             # Get asset to find text tracks and playback ID
             asset = self.get_asset(asset_id)
@@ -174,18 +227,21 @@ class MuxService:
 
             # For generated subtitles, the VTT file is accessible via the playback URL
             # Pattern: https://stream.mux.com/{playback_id}/text/{track_id}.vtt
-            vtt_url = f"https://stream.mux.com/{playback_id}/text/{track_id}.vtt"
+            vtt_url = f"{self.stream_url}/{playback_id}/text/{track_id}.vtt"
 
             logger.info(f"Fetching VTT from: {vtt_url}")
 
-            # Download VTT content
-            vtt_response = requests.get(vtt_url)
-            vtt_response.raise_for_status()
-
-            # Parse VTT to extract text
-            transcript = self._parse_vtt(vtt_response.text)
-
-            return transcript
+            # Stream the VTT and parse cues as they arrive
+            with self.transport.request(
+                'GET',
+                vtt_url,
+                endpoint='GET /{playback_id}/text/{track_id}.vtt',
+                stream=True
+            ) as vtt_response:
+                vtt_response.raise_for_status()
+                vtt_response.encoding = 'utf-8'
+                chunks = vtt_response.iter_content(chunk_size=self.VTT_CHUNK_SIZE, decode_unicode=True)
+                return self._parse_vtt_cues(chunks)
 
         except Exception as e:
             logger.error(f"Error getting transcript for asset {asset_id}: {str(e)}")
@@ -195,52 +251,22 @@ class MuxService:
         """
         Parse VTT file and extract transcript text with timestamps
         """
-        lines = vtt_content.split('\n')
-        transcript_parts = []
-        current_time = None
-        current_text = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Skip header and empty lines
-            if line.startswith('WEBVTT') or line.startswith('NOTE') or not line:
-                continue
-            
-            # Timestamp line (e.g., "00:00:01.000 --> 00:00:05.000")
-            if '-->' in line:
-                # Save previous segment if exists
-                if current_time and current_text:
-                    transcript_parts.append({
-                        'timestamp': current_time,
-                        'text': ' '.join(current_text)
-                    })
-                    current_text = []
-                
-                # Parse new timestamp
-                parts = line.split('-->')
-                current_time = parts[0].strip()
-            
-            # Text line
-            elif line and not line.isdigit():
-                # Remove VTT tags
-                clean_text = line.replace('<v ', '').replace('>', '').replace('</v>', '')
-                current_text.append(clean_text)
-        
-        # Add last segment
-        if current_time and current_text:
-            transcript_parts.append({
-                'timestamp': current_time,
-                'text': ' '.join(current_text)
-            })
-        
-        # Format as readable transcript
-        formatted_transcript = '\n\n'.join([
-            f"[{part['timestamp']}] {part['text']}"
-            for part in transcript_parts
-        ])
+        return self._parse_vtt_cues(vtt_content).to_transcript()
+    
+    def _parse_vtt_cues(self, vtt_content):
+        """
+        Parse VTT into a CueStore of (start, end, text) cues
         
-        return formatted_transcript
+        Args:
+            vtt_content: Whole VTT text, or an iterable of decoded chunks
+        """
+        if isinstance(vtt_content, str):
+            vtt_content = [vtt_content]
+        return CueStore.from_cues(
+            (cue.start, cue.end, cue.text)
+            for cue in parse_vtt(vtt_content)
+            if cue.text
+        )
     
     def create_clip(self, asset_id, start_time, end_time):
         """
@@ -294,7 +320,7 @@ class MuxService:
 
             # Return the playback URL for the clip
             # The frontend can use this for both playback and download
-            return f"https://stream.mux.com/{playback_id}.m3u8"
+            return self.get_playback_url(playback_id)
 
         except Exception as e:
             logger.error(f"Error getting download URL: {str(e)}")
@@ -307,6 +333,8 @@ class MuxService:
                 'DELETE',
                 f'/video/v1/assets/{asset_id}'
             )
+            if self.asset_cache is not None:
+                self.asset_cache.invalidate(asset_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting asset {asset_id}: {str(e)}")
@@ -314,4 +342,4 @@ class MuxService:
     
     def get_playback_url(self, playback_id):
         """Get HLS playback URL"""
-        return f"https://stream.mux.com/{playback_id}.m3u8"
+        return f"{self.stream_url}/{playback_id}.m3u8"
@@ -4,33 +4,289 @@ Handles AI analysis of video transcripts using ChatGPT API
 """
 
 import openai
+import hashlib
 import json
 import logging
-from typing import List, Dict
+import re
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+
+from .cue_store import CueStore, format_timestamp
+from .metrics import OPENAI_TOKENS, record_upstream
 
 logger = logging.getLogger(__name__)
 
+# "[HH:MM:SS.mmm] text" entries as produced by MuxService._parse_vtt
+_SEGMENT = re.compile(r'^\[((?:\d+:)?\d+:\d+(?:\.\d+)?)\]\s*(.*)$')
+
+
+def _timestamp_to_seconds(timestamp: str) -> float:
+    seconds = 0.0
+    for part in timestamp.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _strip_code_fence(content: str) -> str:
+    """Remove markdown code blocks if present"""
+    content = content.strip()
+    if content.startswith('```'):
+        content = content.split('```')[1]
+        if content.startswith('json'):
+            content = content[4:]
+    return content.strip()
+
+
+def default_caption(title: str, description: str) -> Dict:
+    """Caption used when none could be generated"""
+    return {
+        'caption': f"{title}. {description}",
+        'hashtags': ['video', 'content', 'highlights']
+    }
+
+
+def parse_transcript_segments(transcript: str) -> List[Tuple[float, str]]:
+    """Split a formatted transcript into (start seconds, text) cues"""
+    segments = []
+    for block in transcript.split('\n\n'):
+        match = _SEGMENT.match(block.strip())
+        if match:
+            segments.append((_timestamp_to_seconds(match.group(1)), match.group(2)))
+    return segments
+
+
+def split_windows(segments: List[Tuple[float, str]], window_seconds: float,
+                  overlap_seconds: float) -> List[Tuple[float, float, str]]:
+    """
+    Group cues into overlapping windows on cue boundaries
+    
+    Returns:
+        List of (window start, window end, formatted window transcript)
+    """
+    starts = [start for start, _ in segments]
+    windows = []
+    first = 0
+    while first < len(segments):
+        window_start = starts[first]
+        window_end = window_start + window_seconds
+        
+        # Last cue starting inside the window
+        last = max(first, bisect_left(starts, window_end, first) - 1)
+        
+        end_time = starts[last + 1] if last + 1 < len(segments) else window_end
+        text = '\n\n'.join(
+            f"[{format_timestamp(start)}] {text}" for start, text in segments[first:last + 1]
+        )
+        windows.append((window_start, min(end_time, window_end), text))
+        
+        if last + 1 >= len(segments):
+            break
+        
+        # Next window starts at the first cue inside the overlap, always moving forward
+        first = max(first + 1, bisect_left(starts, window_end - overlap_seconds, first + 1, last + 1))
+    
+    return windows
+
+
+def merge_moments(candidates: List[Dict], limit: Optional[int] = 5,
+                  max_overlap: float = 0.5) -> List[Dict]:
+    """
+    Rank candidates by score, dropping ones that mostly overlap a better moment
+    
+    Overlapping windows can report the same moment twice; two moments are
+    duplicates when their intersection covers more than max_overlap of the
+    shorter one.
+    """
+    ranked = sorted(candidates, key=lambda m: m.get('score', 0.8), reverse=True)
+    kept = []
+    for moment in ranked:
+        duplicate = False
+        for other in kept:
+            intersection = min(moment['end_time'], other['end_time']) - max(moment['start_time'], other['start_time'])
+            shorter = min(moment['end_time'] - moment['start_time'], other['end_time'] - other['start_time'])
+            if intersection > 0 and intersection > max_overlap * shorter:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(moment)
+            if limit is not None and len(kept) >= limit:
+                break
+    return kept
+
 
 class OpenAIService:
     """Service for analyzing video content with OpenAI"""
     
-    def __init__(self, api_key, model='gpt-4-turbo-preview'):
-        """Initialize with OpenAI API key"""
+    # Bump when the analysis prompt changes so cached results are not reused
+    PROMPT_VERSION = '1'
+    ANALYSIS_TEMPERATURE = 0.7
+    
+    def __init__(self, api_key, model='gpt-4-turbo-preview', chunk_threshold: float = 1200,
+                 window_seconds: float = 600, window_overlap: float = 60,
+                 max_concurrency: int = 4, moments_limit: int = 5, llm_reduce: bool = False,
+                 cache=None, base_url: Optional[str] = None):
+        """
+        Initialize with OpenAI API key
+        
+        Args:
+            api_key: OpenAI API key
+            model: Chat completion model
+            chunk_threshold: Transcripts longer than this many seconds are analyzed in windows
+            window_seconds: Length of each analysis window
+            window_overlap: Seconds shared by consecutive windows so moments on a boundary aren't cut
+            max_concurrency: Windows analyzed in parallel
+            moments_limit: Moments kept after merging window results
+            llm_reduce: Rank merged candidates with a final completion instead of by score
+            cache: Optional AnalysisCache for analyze_transcript results
+            base_url: Override for the OpenAI API host, e.g. a local fake server
+        """
         self.api_key = api_key
         self.model = model
+        self.chunk_threshold = chunk_threshold
+        self.window_seconds = window_seconds
+        self.window_overlap = window_overlap
+        self.max_concurrency = max_concurrency
+        self.moments_limit = moments_limit
+        self.llm_reduce = llm_reduce
+        self.cache = cache
         openai.api_key = api_key
+        if base_url:
+            # The module-level client joins paths onto it verbatim
+            openai.base_url = base_url.rstrip('/') + '/'
+    
+    def _complete(self, method: str, **kwargs):
+        """Chat completion, timed and with token usage recorded under method"""
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = openai.chat.completions.create(**kwargs)
+            failed = False
+        finally:
+            record_upstream('openai', method, time.perf_counter() - started, failed)
+        
+        usage = getattr(response, 'usage', None)
+        for kind in ('prompt', 'completion'):
+            tokens = getattr(usage, f'{kind}_tokens', None)
+            if isinstance(tokens, int):
+                OPENAI_TOKENS.inc(tokens, method=method, type=kind)
+        return response
     
-    def analyze_transcript(self, transcript: str, video_duration: float = None) -> List[Dict]:
+    def analyze_transcript(self, transcript: str, video_duration: float = None,
+                           chunked: Optional[bool] = None, use_cache: bool = True,
+                           cues: Optional[CueStore] = None) -> List[Dict]:
         """
         Analyze transcript to identify highlight moments
         
         Args:
             transcript: Full video transcript with timestamps
             video_duration: Total video duration in seconds
+            chunked: Force windowed (True) or single-prompt (False) analysis;
+                by default long transcripts are analyzed in windows
+            use_cache: Set False to skip the cache lookup (the fresh result is still stored)
+            cues: The transcript's CueStore, saves re-parsing the formatted text
         
         Returns:
             List of detected moments with timing and descriptions
         """
+        if cues is None:
+            cues = CueStore.from_segments(parse_transcript_segments(transcript), video_duration)
+        segments = cues.segments()
+        span = video_duration or cues.end_time
+        
+        if chunked is None:
+            chunked = span > self.chunk_threshold
+        chunked = chunked and bool(segments)
+        
+        key = None
+        if self.cache is not None:
+            prompt_version = self._prompt_version(chunked)
+            key = self.analysis_cache_key(transcript, prompt_version, video_duration)
+            if use_cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    logger.info(f"Analysis cache hit ({len(cached)} moments)")
+                    return cached
+            else:
+                self.cache.record_bypass()
+        
+        complete = True
+        if chunked:
+            moments, complete = self._analyze_windows(segments, video_duration)
+        else:
+            moments = self._request_moments(transcript, video_duration)
+        
+        # A result missing failed windows (or their ranking) is used once, never cached
+        if key is not None and complete:
+            self.cache.put(key, moments, self.model, prompt_version)
+        elif key is not None:
+            logger.warning("Analysis was incomplete, not caching it")
+        
+        return moments
+    
+    def analysis_cache_key(self, transcript: str, prompt_version: str,
+                           video_duration: float = None) -> str:
+        """Hash of everything that determines an analysis result"""
+        digest = hashlib.sha256()
+        for part in (self.model, prompt_version, repr(video_duration), repr(self.ANALYSIS_TEMPERATURE)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(transcript.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _prompt_version(self, chunked: bool) -> str:
+        """Prompt version plus the settings that shape a windowed result"""
+        if not chunked:
+            return self.PROMPT_VERSION
+        reduce_mode = 'llm' if self.llm_reduce else 'score'
+        return (
+            f"{self.PROMPT_VERSION}/windows:{self.window_seconds:g}:{self.window_overlap:g}:"
+            f"{self.moments_limit}:{reduce_mode}"
+        )
+    
+    def _analyze_windows(self, segments: List[Tuple[float, str]],
+                         video_duration: float = None) -> Tuple[List[Dict], bool]:
+        """
+        Map: analyze windows in parallel. Reduce: merge and rank candidates.
+        
+        Returns:
+            The moments, and False if some windows failed or the ranking
+            pass fell back to scores
+        """
+        windows = split_windows(segments, self.window_seconds, self.window_overlap)
+        logger.info(f"Analyzing transcript in {len(windows)} windows (concurrency {self.max_concurrency})")
+        
+        def analyze_window(window):
+            start, end, text = window
+            try:
+                return self._request_moments(text, video_duration, window=(start, end))
+            except Exception as e:
+                logger.error(f"Window {start:.0f}-{end:.0f}s failed: {str(e)}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = list(executor.map(analyze_window, windows))
+        
+        if all(result is None for result in results):
+            raise ValueError("All transcript windows failed to analyze")
+        
+        complete = all(result is not None for result in results)
+        candidates = [moment for result in results if result for moment in result]
+        merged = merge_moments(candidates, limit=None)
+        
+        if self.llm_reduce and len(merged) > self.moments_limit:
+            try:
+                return self._rank_candidates(merged, video_duration), complete
+            except Exception as e:
+                logger.error(f"Final ranking pass failed, ranking by score: {str(e)}")
+                complete = False
+        
+        return merged[:self.moments_limit], complete
+    
+    def _request_moments(self, transcript: str, video_duration: float = None,
+                         window: Optional[Tuple[float, float]] = None) -> List[Dict]:
+        """Ask the model for moments in a transcript (or one window of it)"""
         
         system_prompt = """You are an expert video editor and content strategist. 
 Your task is to analyze video transcripts and identify the most engaging moments that would make great social media clips.
@@ -55,8 +311,15 @@ For each moment, provide:
 Return 3-5 of the BEST moments only. Quality over quantity.
 Format your response as valid JSON array."""
 
-        user_prompt = f"""Analyze this video transcript and identify the top 3-5 highlight moments:
+        excerpt_note = ''
+        if window:
+            excerpt_note = (
+                f"\nThis is an excerpt covering {window[0]:.0f}s to {window[1]:.0f}s of a longer video. "
+                f"Only return moments that start and end inside this range.\n"
+            )
 
+        user_prompt = f"""Analyze this video transcript and identify the top 3-5 highlight moments:
+{excerpt_note}
 TRANSCRIPT:
 {transcript}
 
@@ -76,26 +339,20 @@ Return a JSON array of moments. Example format:
 
 Respond with ONLY the JSON array, no additional text."""
 
+        content = ''
         try:
-            response = openai.chat.completions.create(
+            response = self._complete(
+                'analyze',
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.7,
+                temperature=self.ANALYSIS_TEMPERATURE,
                 max_tokens=2000
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if content.startswith('```'):
-                content = content.split('```')[1]
-                if content.startswith('json'):
-                    content = content[4:]
-            
-            content = content.strip()
+            content = _strip_code_fence(response.choices[0].message.content)
             
             # Parse JSON response
             moments = json.loads(content)
@@ -117,6 +374,50 @@ Respond with ONLY the JSON array, no additional text."""
             logger.error(f"Error analyzing transcript: {str(e)}")
             raise
     
+    def _rank_candidates(self, candidates: List[Dict], video_duration: float = None) -> List[Dict]:
+        """Reduce: have the model pick the strongest moments from merged window results"""
+        summary = [
+            {
+                'index': i,
+                'start_time': m['start_time'],
+                'end_time': m['end_time'],
+                'title': m['title'],
+                'description': m['description'],
+                'score': m.get('score', 0.8)
+            }
+            for i, m in enumerate(candidates)
+        ]
+        
+        prompt = f"""These candidate highlight moments were found in different parts of one video.
+Pick the {self.moments_limit} that would make the best social media clips, best first.
+
+CANDIDATES:
+{json.dumps(summary, indent=2)}
+
+Return a JSON array of the chosen "index" values, e.g. [3, 0, 7].
+Respond with ONLY the JSON array, no additional text."""
+
+        response = self._complete(
+            'rank',
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are an expert video editor choosing clips for social media."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            max_tokens=200
+        )
+        
+        chosen = json.loads(_strip_code_fence(response.choices[0].message.content))
+        ranked = []
+        for index in chosen:
+            if isinstance(index, int) and 0 <= index < len(candidates) and candidates[index] not in ranked:
+                ranked.append(candidates[index])
+        
+        if not ranked:
+            raise ValueError("Ranking returned no valid candidates")
+        return ranked[:self.moments_limit]
+    
     def _validate_moment(self, moment: Dict, video_duration: float = None) -> bool:
         """Validate a moment has all required fields and valid values"""
         required_fields = ['start_time', 'end_time', 'title', 'description', 'reason']
@@ -188,7 +489,8 @@ Return as JSON:
 Respond with ONLY the JSON, no additional text."""
 
         try:
-            response = openai.chat.completions.create(
+            response = self._complete(
+                'caption',
                 model=self.model,
                 messages=[
                     {
@@ -201,15 +503,7 @@ Respond with ONLY the JSON, no additional text."""
                 max_tokens=500
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if content.startswith('```'):
-                content = content.split('```')[1]
-                if content.startswith('json'):
-                    content = content[4:]
-            
-            content = content.strip()
+            content = _strip_code_fence(response.choices[0].message.content)
             
             result = json.loads(content)
             
@@ -222,10 +516,82 @@ Respond with ONLY the JSON, no additional text."""
         except Exception as e:
             logger.error(f"Error generating social caption: {str(e)}")
             # Return default caption if generation fails
-            return {
-                'caption': f"{title}. {description}",
-                'hashtags': ['video', 'content', 'highlights']
-            }
+            return default_caption(title, description)
+    
+    def generate_social_captions(self, moments: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Generate captions and hashtags for several clips in one completion
+        
+        Args:
+            moments: Moment data with title and description
+        
+        Returns:
+            One dictionary with caption and hashtags per moment, in order;
+            None where the response had no usable entry
+        
+        Raises:
+            Exception: If the completion fails or isn't valid JSON
+        """
+        if not moments:
+            return []
+        
+        clips = [
+            {'index': i, 'title': m.get('title'), 'description': m.get('description')}
+            for i, m in enumerate(moments)
+        ]
+        
+        prompt = f"""Create an engaging social media caption for each of these video clips:
+
+CLIPS:
+{json.dumps(clips, indent=2)}
+
+For every clip generate:
+1. A compelling caption (2-3 sentences) that hooks viewers and encourages engagement
+2. 5-8 relevant hashtags
+
+Make them exciting and shareable! Focus on the value or entertainment for viewers.
+Keep each caption specific to its own clip.
+
+Return as a JSON array with one object per clip:
+[
+  {{"index": 0, "caption": "Your engaging caption here...", "hashtags": ["hashtag1", "hashtag2"]}}
+]
+
+Respond with ONLY the JSON, no additional text."""
+
+        response = self._complete(
+            'captions',
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a social media expert who creates viral content."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.8,
+            max_tokens=300 * len(moments)
+        )
+        
+        entries = json.loads(_strip_code_fence(response.choices[0].message.content))
+        
+        captions = [None] * len(moments)
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get('index')
+            hashtags = entry.get('hashtags')
+            if (isinstance(index, int) and 0 <= index < len(moments)
+                    and isinstance(entry.get('caption'), str) and isinstance(hashtags, list)):
+                captions[index] = {
+                    'caption': entry['caption'],
+                    'hashtags': [str(tag).lstrip('#') for tag in hashtags]
+                }
+        
+        missing = captions.count(None)
+        if missing:
+            logger.warning(f"Caption batch returned no usable entry for {missing} of {len(moments)} clips")
+        return captions
     
     def refine_moment(self, moment: Dict, feedback: str) -> Dict:
         """
@@ -256,7 +622,8 @@ Return the updated moment as JSON with the same structure.
 Respond with ONLY the JSON, no additional text."""
 
         try:
-            response = openai.chat.completions.create(
+            response = self._complete(
+                'refine',
                 model=self.model,
                 messages=[
                     {
@@ -269,15 +636,7 @@ Respond with ONLY the JSON, no additional text."""
                 max_tokens=500
             )
             
-            content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            if content.startswith('```'):
-                content = content.split('```')[1]
-                if content.startswith('json'):
-                    content = content[4:]
-            
-            content = content.strip()
+            content = _strip_code_fence(response.choices[0].message.content)
             
             refined_moment = json.loads(content)
             
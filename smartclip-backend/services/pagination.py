@@ -0,0 +1,39 @@
+"""
+Pagination
+Opaque keyset cursors for newest-first list endpoints
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Cursor pointing just past a row in (created_at, id) descending order
+
+    Args:
+        created_at: Creation time of the last row on the page
+        id: Primary key of the last row on the page
+
+    Returns:
+        URL-safe token for the next page
+    """
+    payload = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor made by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(id)
+    except (TypeError, ValueError, UnicodeEncodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
@@ -0,0 +1,358 @@
+"""
+Reconciler
+Brings stored video and clip state in line with Mux
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from database import db, Video, Clip
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Statuses the pipeline owns; Mux's asset status must not overwrite them
+PIPELINE_STATUSES = ('processing', 'analyzing', 'transcribing', 'error', 'ready')
+
+UPLOAD_FAILED_STATUSES = ('errored', 'timed_out', 'cancelled')
+
+
+class VideoReconciler:
+    """
+    Refreshes a video from its Mux upload and asset on read
+
+    Shared by the video and status endpoints. Webhooks normally keep videos
+    current, so this is the fallback for missed events:
+
+    - Videos with nothing left to learn from Mux are not refreshed at all
+    - Concurrent readers of one video share a single refresh
+    - A video is refreshed at most once per min_interval per process
+    - The database is only written when a field actually changed
+    """
+
+    def __init__(self, mux_service, min_interval: float = 5.0, max_entries: int = 4096,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the reconciler
+
+        Args:
+            mux_service: MuxService instance
+            min_interval: Seconds between refreshes of the same video
+            max_entries: Refresh times remembered (oldest are forgotten first)
+            clock: Monotonic time source, overridable for tests
+        """
+        self.mux_service = mux_service
+        self.min_interval = min_interval
+        self.max_entries = max_entries
+        self._clock = clock
+
+        self._refreshed: 'OrderedDict[int, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+        self.refreshes = 0
+        self.writes = 0
+
+    def reconcile(self, video: Video) -> bool:
+        """
+        Refresh a video from Mux if it is due
+
+        Args:
+            video: Video loaded in the caller's session; updated in place
+
+        Returns:
+            True if any field changed
+        """
+        if not self.needs_refresh(video) or not self._due(video.id):
+            return False
+
+        changed, shared = self._flight.do(video.id, lambda: self._refresh(video))
+        if shared and changed:
+            # The leader committed in its own session
+            db.session.refresh(video)
+        return changed
+
+    @staticmethod
+    def needs_refresh(video: Video) -> bool:
+        """Whether Mux can still tell us something about this video"""
+        if video.upload_id and not video.asset_id:
+            return True
+        if not video.asset_id:
+            return False
+        return (
+            video.status not in PIPELINE_STATUSES
+            or video.duration is None
+            or video.playback_id is None
+        )
+
+    def _due(self, video_id: int) -> bool:
+        with self._lock:
+            last = self._refreshed.get(video_id)
+            return last is None or self._clock() - last >= self.min_interval
+
+    def _mark(self, video_id: int):
+        with self._lock:
+            self._refreshed[video_id] = self._clock()
+            self._refreshed.move_to_end(video_id)
+            while len(self._refreshed) > self.max_entries:
+                self._refreshed.popitem(last=False)
+
+    def _refresh(self, video: Video) -> bool:
+        self.refreshes += 1
+        try:
+            changes = self._upstream_changes(video)
+        finally:
+            self._mark(video.id)
+
+        changes = {field: value for field, value in changes.items() if getattr(video, field) != value}
+        if not changes:
+            return False
+
+        for field, value in changes.items():
+            setattr(video, field, value)
+        db.session.commit()
+        self.writes += 1
+
+        logger.info(f"Video {video.id} reconciled with Mux: {', '.join(sorted(changes))}")
+        return True
+
+    def _upstream_changes(self, video: Video) -> Dict:
+        changes = {}
+        status = video.status
+        asset_id = video.asset_id
+
+        # No asset yet: ask the upload whether one was created
+        if video.upload_id and not asset_id:
+            try:
+                upload = self.mux_service.get_upload(video.upload_id)
+            except Exception as e:
+                logger.error(f"Error checking upload status: {str(e)}")
+                return changes
+
+            upload_status = upload.get('status')
+            if upload.get('asset_id'):
+                asset_id = changes['asset_id'] = upload['asset_id']
+                status = changes['status'] = 'processing'
+            elif upload_status == 'waiting':
+                changes['status'] = 'waiting_for_upload'
+            elif upload_status == 'asset_created':
+                changes['status'] = 'processing'
+            elif upload_status in UPLOAD_FAILED_STATUSES:
+                changes['status'] = 'error'
+                changes['error_message'] = (
+                    f"Upload {upload_status}: The video upload did not complete successfully"
+                )
+                logger.error(f"Upload {video.upload_id} failed with status: {upload_status}")
+
+        if asset_id:
+            asset = self.mux_service.get_asset(asset_id)
+
+            # Once analysis starts the pipeline manages the status itself
+            if status not in PIPELINE_STATUSES and asset.get('status'):
+                changes['status'] = asset['status']
+            if asset.get('duration'):
+                changes['duration'] = asset['duration']
+            if not video.playback_id and asset.get('playback_ids'):
+                changes['playback_id'] = asset['playback_ids'][0]['id']
+
+        return changes
+
+    def stats(self) -> Dict:
+        """Refresh and write counters"""
+        return {'refreshes': self.refreshes, 'writes': self.writes}
+
+
+class ClipReconciler:
+    """
+    Background poller for clips still being processed by Mux
+
+    Clip readiness normally arrives by webhook; this catches missed ones so
+    clip reads never have to ask Mux. Processing clips are checked in
+    batches at an adaptive cadence: every min_interval while clips are
+    changing, backing off towards max_interval while they are not, and idle
+    at max_interval when nothing is processing. wake() goes back to the
+    fast cadence, e.g. right after clips are requested.
+
+    wake() only reaches the reconciler in its own process. Clips requested
+    in another process (e.g. a web process while this one runs worker.py)
+    are noticed from the database: while waiting, the reconciler checks
+    every min_interval for a processing clip newer than any it has seen.
+    """
+
+    def __init__(self, app, mux_service, batch_size: int = 20,
+                 min_interval: float = 5.0, max_interval: float = 60.0, concurrency: int = 4):
+        """
+        Initialize the reconciler
+
+        Args:
+            app: Flask app, used to push an app context around each pass
+            mux_service: MuxService instance
+            batch_size: Clips checked per pass
+            min_interval: Seconds between passes while clips are changing
+            max_interval: Upper bound for the backed-off interval
+            concurrency: Mux asset requests in flight per pass
+        """
+        self.app = app
+        self.mux_service = mux_service
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.concurrency = concurrency
+        self.interval = min_interval
+
+        self._after_id = 0  # Rotates through processing clips batch by batch
+        self._newest_id = 0  # Newest processing clip seen while waiting
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the polling thread"""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='clip-reconciler', daemon=True)
+        self._thread.start()
+        logger.info("Started clip reconciler")
+
+    def stop(self, timeout: float = None):
+        """Signal the thread to exit and wait for it"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self):
+        """Check processing clips now and at the fast cadence"""
+        self.interval = self.min_interval
+        self._wake.set()
+
+    def run_once(self) -> Dict:
+        """
+        Check one batch of processing clips against Mux
+
+        Returns:
+            Counts of clips checked and updated, and whether any remain
+        """
+        with self.app.app_context():
+            clips = self._next_batch()
+            updated = 0
+            for clip, asset in zip(clips, self._fetch_assets(clips)):
+                if asset is not None and self.apply_asset(clip, asset):
+                    updated += 1
+
+            if updated:
+                db.session.commit()
+                logger.info(f"Clip reconciler updated {updated}/{len(clips)} clips")
+
+            remaining = db.session.execute(
+                db.select(Clip.id).where(Clip.status == 'processing', Clip.asset_id.isnot(None)).limit(1)
+            ).first() is not None
+
+        return {'checked': len(clips), 'updated': updated, 'remaining': remaining}
+
+    def apply_asset(self, clip: Clip, asset: Dict) -> bool:
+        """
+        Copy a clip asset's state onto the clip (without committing)
+
+        Returns:
+            True if any field changed
+        """
+        changes = {}
+        if not clip.playback_id and asset.get('playback_ids'):
+            changes['playback_id'] = asset['playback_ids'][0]['id']
+        status = asset.get('status')
+        if status == 'ready':
+            changes['status'] = 'ready'
+            playback_id = changes.get('playback_id', clip.playback_id)
+            if playback_id:
+                changes['download_url'] = self.mux_service.get_playback_url(playback_id)
+        elif status == 'errored':
+            changes['status'] = 'errored'
+
+        changes = {field: value for field, value in changes.items() if getattr(clip, field) != value}
+        for field, value in changes.items():
+            setattr(clip, field, value)
+        return bool(changes)
+
+    def newest_processing_id(self) -> int:
+        """ID of the newest processing clip, or 0 if none (needs an app context)"""
+        return db.session.execute(
+            db.select(db.func.max(Clip.id)).where(Clip.status == 'processing')
+        ).scalar() or 0
+
+    def _fetch_assets(self, clips: List[Clip]) -> List[Optional[Dict]]:
+        """Each clip's Mux asset (None where the request failed), concurrency at a time"""
+        targets = [(clip.id, clip.asset_id) for clip in clips]
+
+        def fetch(target):
+            clip_id, asset_id = target
+            try:
+                return self.mux_service.get_asset(asset_id)
+            except Exception as e:
+                logger.error(f"Error checking clip {clip_id}: {str(e)}")
+                return None
+
+        if len(targets) <= 1 or self.concurrency <= 1:
+            return [fetch(target) for target in targets]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(targets))) as executor:
+            return list(executor.map(fetch, targets))
+
+    def _next_batch(self) -> List[Clip]:
+        processing = db.select(Clip).where(Clip.status == 'processing', Clip.asset_id.isnot(None))
+        clips = db.session.execute(
+            processing.where(Clip.id > self._after_id).order_by(Clip.id).limit(self.batch_size)
+        ).scalars().all()
+        if not clips and self._after_id:
+            # Wrapped around
+            self._after_id = 0
+            clips = db.session.execute(
+                processing.order_by(Clip.id).limit(self.batch_size)
+            ).scalars().all()
+        self._after_id = clips[-1].id if len(clips) == self.batch_size else 0
+        return clips
+
+    def _next_interval(self, result: Dict) -> float:
+        if not result['remaining']:
+            return self.max_interval
+        if result['updated']:
+            return self.min_interval
+        return min(self.interval * 2, self.max_interval)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.interval = self._next_interval(self.run_once())
+            except Exception as e:
+                logger.error(f"Clip reconciler error: {str(e)}")
+                self.interval = self.max_interval
+            self._wait(self.interval)
+
+    def _wait(self, interval: float):
+        """Sleep until the next pass, ending early on wake() or new clips in the database"""
+        deadline = time.monotonic() + interval
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self._wake.wait(min(remaining, self.min_interval)):
+                self._wake.clear()
+                return
+            if self._has_new_clips():
+                self.interval = self.min_interval
+                return
+
+    def _has_new_clips(self) -> bool:
+        try:
+            with self.app.app_context():
+                newest = self.newest_processing_id()
+        except Exception as e:
+            logger.error(f"Clip reconciler error: {str(e)}")
+            return False
+        seen, self._newest_id = self._newest_id, max(self._newest_id, newest)
+        return newest > seen
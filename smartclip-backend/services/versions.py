@@ -0,0 +1,87 @@
+"""
+Versions
+Change markers for conditional GETs, read without loading the rows they cover
+"""
+
+import hashlib
+from typing import Optional, Sequence
+
+from database import db, Video, VideoTranscript, Moment, Clip
+
+# Video columns VideoReconciler.needs_refresh reads, so a version row can
+# tell whether the video may still change from Mux
+RECONCILE_COLUMNS = ('upload_id', 'asset_id', 'status', 'duration', 'playback_id')
+
+
+def make_etag(kind: str, *parts) -> str:
+    """
+    Opaque ETag value for a versioned resource
+
+    Args:
+        kind: Resource/representation name, so different endpoints never share tags
+        parts: Version markers (timestamps, counts, ids)
+
+    Returns:
+        Hex digest to pass to Response.set_etag
+    """
+    digest = hashlib.sha1(kind.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\0')
+        digest.update(repr(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def video_version(video_id: int) -> Optional[Sequence]:
+    """
+    A video's change markers, without its transcript
+
+    Returns:
+        Row of (updated_at, transcript_updated_at, *RECONCILE_COLUMNS),
+        or None if the video doesn't exist
+    """
+    return db.session.execute(
+        db.select(
+            Video.updated_at,
+            VideoTranscript.updated_at.label('transcript_updated_at'),
+            *(getattr(Video, name) for name in RECONCILE_COLUMNS)
+        ).outerjoin(VideoTranscript, VideoTranscript.video_id == Video.id).where(Video.id == video_id)
+    ).first()
+
+
+def moments_version(video_id: int) -> tuple:
+    """
+    Change marker for a video's moments
+
+    The count and highest id catch inserts and deletes (including a
+    re-analysis replacing every moment); the latest timestamp catches edits.
+    """
+    return tuple(db.session.execute(
+        db.select(
+            db.func.count(Moment.id),
+            db.func.max(Moment.id),
+            db.func.max(db.func.coalesce(Moment.updated_at, Moment.created_at))
+        ).where(Moment.video_id == video_id)
+    ).one())
+
+
+def video_clips_version(video_id: int) -> tuple:
+    """Change marker for the clips of all of a video's moments"""
+    return tuple(db.session.execute(
+        db.select(
+            db.func.count(Clip.id),
+            db.func.max(Clip.id),
+            db.func.max(db.func.coalesce(Clip.updated_at, Clip.created_at))
+        ).join(Moment, Clip.moment_id == Moment.id).where(Moment.video_id == video_id)
+    ).one())
+
+
+def clip_version(clip_id: int) -> Optional[Sequence]:
+    """
+    A clip's change marker
+
+    Returns:
+        Row of (updated_at, created_at), or None if the clip doesn't exist
+    """
+    return db.session.execute(
+        db.select(Clip.updated_at, Clip.created_at).where(Clip.id == clip_id)
+    ).first()
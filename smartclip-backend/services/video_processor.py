@@ -4,32 +4,284 @@ Orchestrates video processing workflows
 """
 
 import logging
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.orm import selectinload
+
+from database import db, Video, Moment, Clip
+from .event_bus import video_status_event, video_topic
+from .job_queue import RetryJob
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_ERROR_MESSAGE = (
+    'Transcript generation failed. The video may not have audio '
+    'or the audio quality may be insufficient.'
+)
+
+# Error of an analysis job that gave up waiting for Mux to finish the transcript
+TRANSCRIPT_WAIT_ERROR = 'Transcript not ready'
+TRANSCRIPT_TIMEOUT_MESSAGE = 'Timed out waiting for the transcript. Mux may still finish it.'
+
+# A new analysis request joins the running one while the video is in these states
+ANALYSIS_ACTIVE_STATUSES = ('analyzing', 'transcribing')
+
+# Webhooks no longer move a video on once it has reached one of these;
+# re-analysis is the user's call. The exception is an analysis that timed
+# out waiting for its transcript: the transcript arriving resumes it.
+PIPELINE_FINAL_STATUSES = ('ready', 'error')
+
+
+def waiting_for_transcript(video: Video) -> bool:
+    """Whether the video errored only because its transcript took too long"""
+    return video.status == 'error' and video.error_message == TRANSCRIPT_TIMEOUT_MESSAGE
+
+
+def analysis_job_key(video_id: int) -> str:
+    """Dedupe key of a video's analysis job"""
+    return f"analyze_video:{video_id}"
+
+
+def caption_job_key(video_id: int) -> str:
+    """Dedupe key of a video's caption job"""
+    return f"caption_moments:{video_id}"
+
 
 class VideoProcessor:
     """Orchestrates video processing workflows"""
     
-    def __init__(self, mux_service, openai_service):
+    def __init__(self, mux_service, openai_service, transcript_retry_delay: float = 15,
+                 job_queue=None, event_bus=None, clip_concurrency: int = 4,
+                 transcript_wait_timeout: float = 3600):
         """
         Initialize with required services
         
         Args:
             mux_service: MuxService instance
             openai_service: OpenAIService instance
+            transcript_retry_delay: Seconds before an analysis job re-checks a pending transcript
+            job_queue: JobQueue that runs analysis jobs (required by request_analysis)
+            event_bus: EventBus for status changes made outside the ORM
+            clip_concurrency: Clips batch_create_clips requests at the same time
+            transcript_wait_timeout: Seconds an analysis job waits for a pending
+                transcript before failing; the waits don't use up job attempts
         """
         self.mux_service = mux_service
         self.openai_service = openai_service
+        self.transcript_retry_delay = transcript_retry_delay
+        self.job_queue = job_queue
+        self.event_bus = event_bus
+        self.clip_concurrency = clip_concurrency
+        self.transcript_wait_timeout = transcript_wait_timeout
+        self._analysis_requests = SingleFlight()
+        self._analysis_runs = SingleFlight()
     
-    def analyze_video_content(self, asset_id: str, video_duration: float = None) -> Dict:
+    def request_analysis(self, video_id: int, use_cache: bool = True) -> Tuple[int, bool]:
+        """
+        Queue analysis of a video, or join the analysis already in progress
+        
+        The status moves to analyzing with a conditional UPDATE, so only one
+        caller across processes wins and queues a job; the others get that
+        job back. Concurrent callers in this process share one attempt.
+        
+        Args:
+            video_id: Video to analyze
+            use_cache: Set False to bypass the analysis cache
+        
+        Returns:
+            Tuple of (job ID, joined) where joined is True if the job was
+            already queued by another request
+        """
+        (job_id, joined), shared = self._analysis_requests.do(
+            video_id,
+            lambda: self._start_analysis(video_id, use_cache)
+        )
+        return job_id, joined or shared
+    
+    def _start_analysis(self, video_id: int, use_cache: bool) -> Tuple[int, bool]:
+        key = analysis_job_key(video_id)
+        started = db.session.execute(
+            update(Video)
+            .where(
+                Video.id == video_id,
+                or_(Video.status.is_(None), Video.status.notin_(ANALYSIS_ACTIVE_STATUSES))
+            )
+            .values(status='analyzing', error_message=None, updated_at=datetime.utcnow())
+        ).rowcount == 1
+        
+        if not started:
+            db.session.rollback()
+            job = self.job_queue.find_active('analyze_video', key)
+            if job:
+                logger.info(f"Video {video_id} is already being analyzed by job {job.id}")
+                return job.id, True
+            # In progress according to the status, but its job is gone
+            logger.warning(f"Video {video_id} has no active analysis job, starting a new one")
+            db.session.execute(
+                update(Video)
+                .where(Video.id == video_id)
+                .values(status='analyzing', error_message=None, updated_at=datetime.utcnow())
+            )
+        
+        # Commits the status change and the job together
+        job = self.job_queue.enqueue(
+            'analyze_video',
+            {'video_id': video_id, 'use_cache': use_cache},
+            dedupe_key=key
+        )
+        self._publish_status(video_id)
+        return job.id, False
+    
+    def _publish_status(self, video_id: int):
+        # Core UPDATEs bypass the session hooks that publish status events
+        if self.event_bus is None:
+            return
+        video = db.session.get(Video, video_id)
+        if video:
+            self.event_bus.publish(video_topic(video_id), 'status', video_status_event(video))
+    
+    def handle_webhook(self, event_type: str, data: Dict) -> Optional[str]:
+        """
+        Advance the pipeline from a Mux webhook event
+        
+        video.upload.asset_created   upload -> processing
+        video.asset.ready            processing -> analyzing when the text track
+                                     is ready, else transcribing (or error);
+                                     clip assets -> ready
+        video.asset.errored          clip assets -> errored
+        video.asset.track.ready      text track: -> analyzing, also for videos
+                                     that timed out waiting for it
+        video.asset.track.errored    text track: -> error
+        
+        Analysis is queued as soon as the transcript exists, and a job
+        already waiting for it is woken, so nothing waits on a poll.
+        Redelivered and out-of-order events are no-ops.
+        
+        Args:
+            event_type: Webhook event type
+            data: Event payload (the upload, asset or track object)
+        
+        Returns:
+            The state the event moved a video or clip to, or None
+        """
+        if not data:
+            return None
+        
+        if event_type == 'video.upload.asset_created':
+            return self._on_upload_asset_created(data)
+        if event_type == 'video.asset.ready':
+            return self._on_asset_ready(data)
+        if event_type == 'video.asset.errored':
+            return self._on_asset_errored(data)
+        if event_type in ('video.asset.track.ready', 'video.asset.track.errored'):
+            if (data.get('type') or data.get('track_type')) != 'text':
+                return None
+            video = Video.query.filter_by(asset_id=data.get('asset_id')).first()
+            if not video:
+                return None
+            if video.status in PIPELINE_FINAL_STATUSES and not waiting_for_transcript(video):
+                return None
+            if event_type == 'video.asset.track.errored':
+                return self._fail_transcript(video)
+            logger.info(f"Transcript track ready for video {video.id}")
+            return self._queue_analysis(video)
+        return None
+    
+    def _on_upload_asset_created(self, data: Dict) -> Optional[str]:
+        video = Video.query.filter_by(upload_id=data.get('id')).first()
+        if not video or video.asset_id:
+            return None
+        video.asset_id = data['asset_id']
+        video.status = 'processing'
+        db.session.commit()
+        logger.info(f"Video {video.id} asset created: {video.asset_id}")
+        return 'processing'
+    
+    def _on_asset_ready(self, asset: Dict) -> Optional[str]:
+        # The event payload is the full asset object
+        video = Video.query.filter_by(asset_id=asset.get('id')).first()
+        if not video:
+            return self._on_clip_ready(asset)
+        
+        if asset.get('playback_ids'):
+            video.playback_id = asset['playback_ids'][0]['id']
+        video.duration = asset.get('duration')
+        db.session.commit()
+        
+        if video.status in PIPELINE_FINAL_STATUSES and not waiting_for_transcript(video):
+            return None
+        
+        text_tracks = [track for track in asset.get('tracks', []) if track.get('type') == 'text']
+        if any(track.get('status') == 'ready' for track in text_tracks):
+            return self._queue_analysis(video)
+        if any(track.get('status') == 'errored' for track in text_tracks):
+            return self._fail_transcript(video)
+        if waiting_for_transcript(video):
+            # Still not there; stays timed out until its track is ready
+            return None
+        
+        if not text_tracks:
+            logger.info(f"Video {video.id} has no text track, requesting generation")
+            self.mux_service.generate_transcript(video.asset_id)
+        if video.status not in ANALYSIS_ACTIVE_STATUSES:
+            video.status = 'transcribing'
+            db.session.commit()
+        logger.info(f"Video {video.id} asset is ready, waiting for its transcript")
+        return 'transcribing'
+    
+    def _on_clip_ready(self, asset: Dict) -> Optional[str]:
+        # Clips are assets too; mark them ready so viewers get pushed the URL
+        clip = Clip.query.filter_by(asset_id=asset.get('id')).first()
+        if not clip:
+            return None
+        if not clip.playback_id and asset.get('playback_ids'):
+            clip.playback_id = asset['playback_ids'][0]['id']
+        clip.status = 'ready'
+        if clip.playback_id:
+            clip.download_url = self.mux_service.get_playback_url(clip.playback_id)
+        db.session.commit()
+        logger.info(f"Clip {clip.id} is ready")
+        return 'ready'
+    
+    def _on_asset_errored(self, asset: Dict) -> Optional[str]:
+        clip = Clip.query.filter_by(asset_id=asset.get('id')).first()
+        if not clip or clip.status == 'errored':
+            return None
+        clip.status = 'errored'
+        db.session.commit()
+        logger.warning(f"Clip {clip.id} asset errored")
+        return 'errored'
+    
+    def _queue_analysis(self, video: Video) -> Optional[str]:
+        if self.job_queue is None:
+            logger.info(f"Video {video.id} is ready for analysis")
+            return None
+        job_id, joined = self.request_analysis(video.id)
+        if joined:
+            # A job waiting out its transcript retry delay can go now
+            self.job_queue.wake(job_id)
+        return 'analyzing'
+    
+    def _fail_transcript(self, video: Video) -> str:
+        video.status = 'error'
+        video.error_message = TRANSCRIPT_ERROR_MESSAGE
+        db.session.commit()
+        logger.warning(f"Transcript generation failed for video {video.id}")
+        return 'error'
+    
+    def analyze_video_content(self, asset_id: str, video_duration: float = None,
+                              use_cache: bool = True) -> Dict:
         """
         Analyze video content to detect moments
         
         Args:
             asset_id: Mux asset ID
             video_duration: Video duration in seconds
+            use_cache: Set False to bypass the analysis cache
         
         Returns:
             Dict with analysis results
@@ -37,13 +289,15 @@ class VideoProcessor:
         logger.info(f"Analyzing video content for asset {asset_id}")
         
         try:
-            # Get transcript from Mux
-            transcript = self.mux_service.get_transcript(asset_id)
+            # Get transcript cues from Mux
+            cues = self.mux_service.get_transcript_cues(asset_id)
             
-            if not transcript:
-                # Request transcript generation if not available
-                logger.info("Transcript not available, requesting generation")
-                self.mux_service.generate_transcript(asset_id)
+            if not cues:
+                # Request transcript generation only if no text track exists yet;
+                # otherwise it is still being generated and we just wait
+                if not self._has_text_track(asset_id):
+                    logger.info("Transcript not available, requesting generation")
+                    self.mux_service.generate_transcript(asset_id)
                 
                 return {
                     'success': False,
@@ -52,14 +306,21 @@ class VideoProcessor:
                 }
             
             # Analyze with OpenAI
-            moments = self.openai_service.analyze_transcript(transcript, video_duration)
+            transcript = cues.to_transcript()
+            moments = self.openai_service.analyze_transcript(
+                transcript,
+                video_duration,
+                use_cache=use_cache,
+                cues=cues
+            )
             
             logger.info(f"Analysis complete. Found {len(moments)} moments")
             
             return {
                 'success': True,
                 'moments': moments,
-                'transcript': transcript
+                'transcript': transcript,
+                'cues': cues
             }
             
         except Exception as e:
@@ -69,6 +330,269 @@ class VideoProcessor:
                 'error': str(e)
             }
     
+    def run_analysis_job(self, payload: Dict) -> Dict:
+        """
+        Job handler: analyze a video and store the detected moments
+        
+        Jobs for the same video running at the same time in this process
+        share one analysis, so its moments are only stored once.
+        
+        Args:
+            payload: Job payload with video_id and optional use_cache
+        
+        Returns:
+            Dict summarizing the outcome, stored as the job result
+        """
+        result, shared = self._analysis_runs.do(
+            payload['video_id'],
+            lambda: self._run_analysis(payload)
+        )
+        if shared:
+            logger.info(f"Joined in-progress analysis of video {payload['video_id']}")
+        return result
+    
+    def _run_analysis(self, payload: Dict) -> Dict:
+        video_id = payload['video_id']
+        video = db.session.get(Video, video_id)
+        
+        if not video or not video.asset_id:
+            logger.warning(f"Skipping analysis for video {video_id}: no video or asset")
+            return {'status': 'skipped'}
+        
+        if self._text_track_errored(video.asset_id):
+            return {'status': self._fail_transcript(video)}
+        
+        result = self.analyze_video_content(
+            video.asset_id,
+            video.duration,
+            use_cache=payload.get('use_cache', True)
+        )
+        
+        if result.get('status') == 'transcribing':
+            # Subtitles are still being generated; check again shortly
+            video.status = 'transcribing'
+            db.session.commit()
+            raise RetryJob(
+                TRANSCRIPT_WAIT_ERROR,
+                delay=self.transcript_retry_delay,
+                max_wait=self.transcript_wait_timeout
+            )
+        
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        
+        # Store transcript and moments; a re-analysis replaces the earlier
+        # moments in the same transaction as the status change
+        video.transcript = result['transcript']
+        video.cues = result['cues'].to_bytes()
+        moments = self.store_moments(video, result['moments'])
+        
+        video.status = 'ready'
+        video.error_message = None
+        if self.job_queue is not None and moments:
+            # Captions are written ahead of clipping; commits the moments too
+            self.job_queue.enqueue(
+                'caption_moments',
+                {'video_id': video_id},
+                dedupe_key=caption_job_key(video_id)
+            )
+        else:
+            db.session.commit()
+        
+        logger.info(f"Analysis complete for video {video_id}. Found {len(moments)} moments.")
+        
+        return {'status': 'ready', 'moments': len(moments)}
+    
+    def store_moments(self, video: Video, moments: List[Dict], replace: bool = True) -> List[Moment]:
+        """
+        Insert detected moments in one statement (without committing)
+        
+        Uses a bulk INSERT ... RETURNING where the database supports it, so
+        the stored rows come back from the insert itself instead of a reload.
+        
+        Args:
+            video: Video the moments belong to
+            moments: Moment dicts from the analysis
+            replace: Delete the video's earlier moments first, in the same
+                transaction, so readers see one analysis or the other. Moments
+                that have been clipped are kept, with their clips and Mux assets.
+        
+        Returns:
+            The inserted moments, in id order
+        """
+        if replace:
+            replaced = db.session.execute(
+                delete(Moment)
+                .where(Moment.video_id == video.id, ~Moment.clips.any())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.expire(video, ['moments'])
+            if replaced:
+                logger.info(f"Replacing {replaced} earlier moments of video {video.id}")
+        
+        if not moments:
+            return []
+        
+        rows = [{
+            'video_id': video.id,
+            'start_time': moment['start_time'],
+            'end_time': moment['end_time'],
+            'title': moment['title'],
+            'description': moment['description'],
+            'reason': moment['reason'],
+            'score': moment.get('score', 0.8)
+        } for moment in moments]
+        
+        if db.session.get_bind().dialect.insert_executemany_returning:
+            # Not sort_by_parameter_order: on SQLite that sends one INSERT per row
+            inserted = db.session.scalars(insert(Moment).returning(Moment), rows).all()
+            return sorted(inserted, key=lambda moment: moment.id)
+        
+        # No multi-row RETURNING: insert, then read the new moments back
+        last_id = db.session.scalar(db.select(db.func.max(Moment.id)).where(Moment.video_id == video.id)) or 0
+        db.session.execute(insert(Moment), rows)
+        return db.session.scalars(
+            db.select(Moment).where(Moment.video_id == video.id, Moment.id > last_id).order_by(Moment.id)
+        ).all()
+    
+    def run_caption_job(self, payload: Dict) -> Dict:
+        """
+        Job handler: caption all uncaptioned moments of a video in one completion
+        
+        Args:
+            payload: Job payload with video_id
+        
+        Returns:
+            Dict with the number of moments captioned
+        """
+        moments = Moment.query.filter_by(video_id=payload['video_id'], caption=None).order_by(Moment.id).all()
+        if not moments:
+            return {'captioned': 0}
+        
+        captions = self.openai_service.generate_social_captions([
+            {'title': moment.title, 'description': moment.description}
+            for moment in moments
+        ])
+        
+        captioned = 0
+        for moment, caption in zip(moments, captions):
+            if caption:
+                moment.caption = caption['caption']
+                moment.hashtags = ','.join(caption['hashtags'])
+                captioned += 1
+        db.session.commit()
+        
+        logger.info(f"Captioned {captioned}/{len(moments)} moments of video {payload['video_id']}")
+        return {'captioned': captioned}
+    
+    def caption_for(self, moment: Moment) -> Dict:
+        """
+        Caption and hashtags of a moment, generating them if the batch hasn't
+        
+        Args:
+            moment: Moment to caption
+        
+        Returns:
+            Dictionary with caption and hashtags
+        """
+        if moment.caption is not None:
+            return {
+                'caption': moment.caption,
+                'hashtags': moment.hashtags.split(',') if moment.hashtags else []
+            }
+        return self.openai_service.generate_social_caption(moment.title, moment.description)
+    
+    def fail_analysis_job(self, payload: Dict, error: str):
+        """Job failure handler: mark the video as errored"""
+        video = db.session.get(Video, payload['video_id'])
+        if video:
+            video.status = 'error'
+            if error.startswith(TRANSCRIPT_WAIT_ERROR):
+                video.error_message = TRANSCRIPT_TIMEOUT_MESSAGE
+            else:
+                video.error_message = f"Analysis failed: {error}"[:500]
+            db.session.commit()
+    
+    def _has_text_track(self, asset_id: str) -> bool:
+        asset = self.mux_service.get_asset(asset_id)
+        return any(track.get('type') == 'text' for track in asset.get('tracks', []))
+    
+    def _text_track_errored(self, asset_id: str) -> bool:
+        asset = self.mux_service.get_asset(asset_id)
+        return any(
+            track.get('type') == 'text' and track.get('status') == 'errored'
+            for track in asset.get('tracks', [])
+        )
+    
+    def create_clips_for_video(self, video: Video, moment_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Clip several moments of a video and store the clips together
+        
+        Moments that already have a clip in progress or ready are not
+        clipped again. All new Clip rows are committed in one transaction.
+        
+        Args:
+            video: Video whose moments to clip
+            moment_ids: Moments to clip (default: all of the video's moments)
+        
+        Returns:
+            One result per moment: momentId, success, created, and clip or
+            error. Requested IDs that aren't moments of this video come last,
+            with the error 'Moment not found'.
+        """
+        query = Moment.query.options(selectinload(Moment.clips)).filter_by(video_id=video.id)
+        if moment_ids is not None:
+            query = query.filter(Moment.id.in_(moment_ids))
+        moments = query.order_by(Moment.start_time).all()
+        
+        results = {}
+        pending = []
+        for moment in moments:
+            existing = next((clip for clip in moment.clips if clip.status != 'errored'), None)
+            if existing:
+                results[moment.id] = {'momentId': str(moment.id), 'success': True,
+                                      'created': False, 'clip': existing.to_dict()}
+                continue
+            data = {
+                'id': moment.id,
+                'title': moment.title,
+                'description': moment.description,
+                'start_time': moment.start_time,
+                'end_time': moment.end_time
+            }
+            if moment.caption is not None:
+                data['caption'] = moment.caption
+                data['hashtags'] = moment.hashtags.split(',') if moment.hashtags else []
+            pending.append(data)
+        
+        # Mux and OpenAI calls run in worker threads, away from the session
+        clips = []
+        for moment, outcome in zip(pending, self.batch_create_clips(video.asset_id, pending)):
+            if not outcome.get('success'):
+                results[moment['id']] = {'momentId': str(moment['id']), 'success': False,
+                                         'created': False, 'error': outcome.get('error')}
+                continue
+            clip = Clip(
+                moment_id=moment['id'],
+                asset_id=outcome['clip_asset_id'],
+                playback_id=outcome.get('playback_id'),
+                status='processing',
+                caption=outcome['caption'],
+                hashtags=','.join(outcome['hashtags'])
+            )
+            clips.append((moment['id'], clip))
+        
+        db.session.add_all([clip for _, clip in clips])
+        db.session.commit()
+        
+        for moment_id, clip in clips:
+            results[moment_id] = {'momentId': str(moment_id), 'success': True,
+                                  'created': True, 'clip': clip.to_dict()}
+        found = {moment.id for moment in moments}
+        missing = [{'momentId': str(moment_id), 'success': False, 'created': False, 'error': 'Moment not found'}
+                   for moment_id in dict.fromkeys(moment_ids or []) if moment_id not in found]
+        return [results[moment.id] for moment in moments] + missing
+    
     def create_clip_from_moment(self, asset_id: str, moment: Dict) -> Dict:
         """
         Create a clip from a detected moment
@@ -90,11 +614,14 @@ class VideoProcessor:
                 moment['end_time']
             )
             
-            # Generate social media content
-            social_content = self.openai_service.generate_social_caption(
-                moment['title'],
-                moment['description']
-            )
+            # Use the caption written after analysis, if any
+            if moment.get('caption') is not None:
+                social_content = {'caption': moment['caption'], 'hashtags': moment.get('hashtags') or []}
+            else:
+                social_content = self.openai_service.generate_social_caption(
+                    moment['title'],
+                    moment['description']
+                )
             
             logger.info(f"Clip created with asset ID {clip_asset['id']}")
             
@@ -156,32 +683,36 @@ class VideoProcessor:
         """
         Create multiple clips at once
         
+        Clips are requested concurrently, at most clip_concurrency at a
+        time, so the batch takes about as long as its slowest clip. Runs
+        outside the database session; callers persist the results.
+        
         Args:
             asset_id: Source video asset ID
-            moments: List of moment data
+            moments: List of moment data (with caption and hashtags when known)
         
         Returns:
-            List of clip results
+            List of clip results, in the order of moments
         """
-        logger.info(f"Batch creating {len(moments)} clips")
+        logger.info(f"Batch creating {len(moments)} clips (concurrency {self.clip_concurrency})")
         
-        results = []
-        for i, moment in enumerate(moments):
+        def create(indexed):
+            i, moment = indexed
             try:
                 result = self.create_clip_from_moment(asset_id, moment)
-                results.append({
-                    'moment_index': i,
-                    'moment_title': moment.get('title'),
-                    **result
-                })
             except Exception as e:
                 logger.error(f"Error creating clip {i}: {str(e)}")
-                results.append({
-                    'moment_index': i,
-                    'moment_title': moment.get('title'),
-                    'success': False,
-                    'error': str(e)
-                })
+                result = {'success': False, 'error': str(e)}
+            return {
+                'moment_index': i,
+                'moment_title': moment.get('title'),
+                **result
+            }
+        
+        if not moments:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.clip_concurrency, len(moments))) as executor:
+            results = list(executor.map(create, enumerate(moments)))
         
         success_count = sum(1 for r in results if r.get('success'))
         logger.info(f"Batch complete: {success_count}/{len(moments)} clips created successfully")
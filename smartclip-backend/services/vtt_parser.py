@@ -0,0 +1,147 @@
+"""
+WebVTT Parser
+Incremental parser that turns a subtitle stream into cue records
+"""
+
+import html
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+# "00:01:02.500" or "01:02.500"
+_TIMESTAMP = re.compile(r'^(?:(\d+):)?([0-5]\d):([0-5]\d)\.(\d{3})$')
+
+# "HH:MM:" prefixes of the first day, to seconds
+_HOUR_MINUTE_SECONDS = {
+    f"{hours:02d}:{minutes:02d}:": hours * 3600 + minutes * 60
+    for hours in range(24) for minutes in range(60)
+}
+
+# Any cue markup: <v Speaker>, </v>, <c.loud>, <i>, <00:00:01.000>, ...
+_TAG = re.compile(r'<[^>\n]*>')
+
+# Opening voice span, e.g. <v Speaker> or <v.loud Speaker Name>
+_VOICE = re.compile(r'<v(?:\.[^\s>]*)?\s+([^>]*)>')
+
+# A cue block: blank line (or start), optional identifier line, timing line
+# with optional settings, then payload lines up to the next blank line.
+# Header, NOTE, STYLE and REGION blocks have no "-->" and never match.
+_CUE = re.compile(
+    r'(?:\A|\n\n)(?:([^\n]*)\n)?'
+    r'([\d:.]+)[ \t]+-->[ \t]+([\d:.]+)([^\n]*)'
+    r'(?:\n([^\n]+(?:\n[^\n]+)*))?'
+)
+
+
+class VttCue(NamedTuple):
+    """One cue of a WebVTT file"""
+    identifier: Optional[str]
+    start: float
+    end: float
+    settings: str  # Cue settings after the end time, e.g. "align:start line:90%"
+    text: str  # Payload lines joined with spaces, markup removed
+    voice: Optional[str]  # Speaker from the first <v> span, if any
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Convert a WebVTT timestamp to seconds
+
+    Raises:
+        ValueError: If the timestamp is malformed
+    """
+    # Fast path for the usual "HH:MM:SS.mmm": look up "HH:MM:", parse "SS.mmm"
+    if len(timestamp) == 12 and timestamp[8] == '.':
+        base = _HOUR_MINUTE_SECONDS.get(timestamp[:6])
+        if base is not None and timestamp[9:].isdigit():
+            try:
+                seconds = float(timestamp[6:])
+            except ValueError:
+                seconds = -1
+            if 0 <= seconds < 60:
+                return base + seconds
+
+    match = _TIMESTAMP.match(timestamp)
+    if not match:
+        raise ValueError(f"Invalid WebVTT timestamp: {timestamp!r}")
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def iter_batches(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Regroup a stream of text chunks into runs of complete blocks
+
+    Each yielded string ends at a blank line, so no block is split between
+    two batches. Line endings are normalized to \\n, including a \\r\\n
+    pair split across two chunks. Only the current partial block is held
+    between chunks.
+    """
+    pending = ''
+    carry_cr = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if carry_cr and chunk[0] == '\n':
+            chunk = chunk[1:]
+        carry_cr = chunk.endswith('\r')
+        if '\r' in chunk:
+            chunk = chunk.replace('\r\n', '\n').replace('\r', '\n')
+        data = pending + chunk
+        cut = data.rfind('\n\n')
+        if cut < 0:
+            pending = data
+            continue
+        pending = data[cut + 2:]
+        batch = data[:cut].lstrip('\n')
+        if batch:
+            yield batch
+    pending = pending.lstrip('\n')
+    if pending:
+        yield pending
+
+
+def parse_vtt(chunks: Iterable[str]) -> Iterator[VttCue]:
+    """
+    Parse a WebVTT stream into cues
+
+    The header, NOTE, STYLE and REGION blocks are skipped, as are blocks
+    with a malformed timing line. Each batch of complete blocks is scanned
+    with one regular expression, and memory use is bounded by the chunk
+    size and the largest block, not the file.
+
+    Args:
+        chunks: Decoded text chunks, e.g. Response.iter_content(decode_unicode=True),
+            or a one-element list holding the whole file
+
+    Yields:
+        VttCue records in file order
+    """
+    for batch in iter_batches(chunks):
+        for identifier, start, end, settings, text in _CUE.findall(batch):
+            try:
+                start = parse_timestamp(start)
+                end = parse_timestamp(end)
+            except ValueError:
+                continue
+
+            voice = None
+            if '<' in text:
+                match = _VOICE.search(text) if '<v' in text else None
+                if match:
+                    voice = match.group(1).strip()
+                text = _TAG.sub('', text)
+            if '&' in text:
+                text = _unescape(text)
+            if '\n' in text:
+                text = text.replace('\n', ' ')
+            if '  ' in text or '\t' in text or text[:1] == ' ' or text[-1:] == ' ':
+                text = ' '.join(text.split())
+
+            yield VttCue(identifier or None, start, end, settings.strip(), text, voice)
+
+
+def _unescape(text: str) -> str:
+    # "&amp;" is by far the most common reference in captions
+    if text.count('&') == text.count('&amp;'):
+        return text.replace('&amp;', '&')
+    return html.unescape(text).replace('\xa0', ' ')
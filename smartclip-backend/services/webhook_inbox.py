@@ -0,0 +1,237 @@
+"""
+Webhook Inbox
+Durable queue of received Mux webhook events, applied in the background
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db, WebhookEvent
+from .job_queue import RetryJob
+
+logger = logging.getLogger(__name__)
+
+DRAIN_JOB_KIND = 'drain_webhooks'
+
+
+class WebhookInbox:
+    """
+    Append-only inbox between the webhook endpoint and the pipeline
+
+    The endpoint only inserts the event and acknowledges. A drain job then
+    applies pending events in arrival order, in batches:
+
+    - Redeliveries are dropped on insert by the unique Mux event ID
+    - Of several events of the same type about the same object in a batch
+      (e.g. repeated video.asset.ready for one asset, which carry the full
+      asset each time) only the newest is applied; the rest are superseded
+    - Batches are claimed with a lease, so drains in several processes
+      never apply the same event, and a crashed drain's batch is retried
+    - A failing event is retried after retry_delay, up to max_attempts
+    """
+
+    def __init__(self, handler: Callable[[str, Dict], Optional[str]], job_queue=None,
+                 batch_size: int = 100, max_attempts: int = 5, retry_delay: float = 30,
+                 visibility_timeout: float = 300, retention: float = 3 * 86400):
+        """
+        Initialize the inbox
+
+        Args:
+            handler: Applies one event, called with (event_type, data)
+            job_queue: JobQueue that runs the drain (without one, call drain() yourself)
+            batch_size: Events claimed and settled per transaction
+            max_attempts: Attempts before a failing event is given up on
+            retry_delay: Seconds before a failed event is tried again
+            visibility_timeout: Seconds a claimed batch stays leased to its drain
+            retention: Seconds settled events are kept to catch late redeliveries
+        """
+        self.handler = handler
+        self.job_queue = job_queue
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self.retention = retention
+
+    def append(self, event: Dict) -> bool:
+        """
+        Durably record a webhook event and make sure a drain is queued (commits)
+
+        Args:
+            event: The webhook body, with id, type and data
+
+        Returns:
+            False if the event was already received
+        """
+        data = event.get('data') or {}
+        db.session.add(WebhookEvent(
+            event_id=event.get('id'),
+            event_type=event.get('type') or 'unknown',
+            object_id=data.get('id'),
+            payload=json.dumps(data),
+            status='pending'
+        ))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            logger.info(f"Ignoring redelivered webhook {event.get('id')}")
+            return False
+
+        if self.job_queue is None:
+            db.session.commit()
+            return True
+
+        # A drain that is already running may have claimed its last batch;
+        # only a queued one is sure to see this event
+        drain = self.job_queue.find_active(DRAIN_JOB_KIND, DRAIN_JOB_KIND, statuses=('queued',))
+        if drain:
+            self.job_queue.wake(drain.id)  # commits the event too
+        else:
+            self.job_queue.enqueue(DRAIN_JOB_KIND, dedupe_key=DRAIN_JOB_KIND)
+        return True
+
+    def drain(self, payload: Optional[Dict] = None) -> Dict:
+        """
+        Job handler: apply pending events until the inbox is empty
+
+        Returns:
+            Counts of applied, superseded, retried and failed events
+
+        Raises:
+            RetryJob: If events failed and are due to be tried again
+        """
+        counts = {'applied': 0, 'superseded': 0, 'retried': 0, 'failed': 0}
+        consumer = uuid.uuid4().hex
+        started = datetime.utcnow()
+        while True:
+            # Events this drain sends back for a retry wait for the next one
+            batch = self._claim(consumer, retries_due=started)
+            if not batch:
+                break
+            for key, value in self._apply(batch, consumer).items():
+                counts[key] += value
+        self._purge()
+
+        if any(counts.values()):
+            logger.info(f"Drained webhook inbox: {counts}")
+        if counts['retried']:
+            raise RetryJob(f"{counts['retried']} webhook events to retry", delay=self.retry_delay)
+        return counts
+
+    def _claim(self, consumer: str, retries_due: Optional[datetime] = None) -> List[WebhookEvent]:
+        now = datetime.utcnow()
+        due = retries_due or now
+        eligible = or_(
+            and_(
+                WebhookEvent.status == 'pending',
+                or_(WebhookEvent.locked_until.is_(None), WebhookEvent.locked_until <= due)
+            ),
+            and_(WebhookEvent.status == 'processing', WebhookEvent.locked_until < now)
+        )
+        candidates = (
+            db.select(WebhookEvent.id)
+            .where(eligible)
+            .order_by(WebhookEvent.id)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(candidates), eligible)
+            .values(
+                status='processing',
+                attempts=WebhookEvent.attempts + 1,
+                locked_by=consumer,
+                locked_until=now + timedelta(seconds=self.visibility_timeout)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.execute(
+            db.select(WebhookEvent)
+            .where(WebhookEvent.locked_by == consumer, WebhookEvent.status == 'processing')
+            .order_by(WebhookEvent.id)
+        ).scalars().all()
+
+    def _apply(self, batch: List[WebhookEvent], consumer: str) -> Dict:
+        # Newest event per (type, object) wins
+        latest = {}
+        for event in batch:
+            key = (event.event_type, event.object_id or f"event:{event.id}")
+            latest[key] = event.id
+        winners = set(latest.values())
+        superseded = [event.id for event in batch if event.id not in winners]
+
+        # Read everything needed before handlers commit and expire the rows
+        work = [
+            (event.id, event.event_type, json.loads(event.payload or '{}'), event.attempts)
+            for event in batch if event.id in winners
+        ]
+
+        applied, retry, failed = [], {}, {}
+        for event_id, event_type, data, attempts in work:
+            try:
+                self.handler(event_type, data)
+                applied.append(event_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Webhook event {event_id} ({event_type}) failed: {str(e)}")
+                (failed if attempts >= self.max_attempts else retry)[event_id] = str(e)
+
+        # Settle the whole batch in one transaction
+        now = datetime.utcnow()
+        owned = and_(WebhookEvent.locked_by == consumer, WebhookEvent.status == 'processing')
+        for status, ids in (('applied', applied), ('superseded', superseded)):
+            if ids:
+                db.session.execute(
+                    update(WebhookEvent)
+                    .where(WebhookEvent.id.in_(ids), owned)
+                    .values(status=status, locked_by=None, locked_until=None, processed_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+        # Retries wait out retry_delay: pending events aren't claimed before locked_until
+        retry_at = now + timedelta(seconds=self.retry_delay)
+        for status, errors, locked_until in (('pending', retry, retry_at), ('failed', failed, None)):
+            for event_id, error in errors.items():
+                db.session.execute(
+                    update(WebhookEvent)
+                    .where(WebhookEvent.id == event_id, owned)
+                    .values(status=status, locked_by=None, locked_until=locked_until,
+                            last_error=error[:500], processed_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+        db.session.commit()
+
+        return {
+            'applied': len(applied),
+            'superseded': len(superseded),
+            'retried': len(retry),
+            'failed': len(failed)
+        }
+
+    def _purge(self):
+        """Delete settled events past the redelivery window"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        db.session.execute(
+            delete(WebhookEvent)
+            .where(
+                WebhookEvent.status.in_(('applied', 'superseded', 'failed')),
+                WebhookEvent.received_at < cutoff
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def stats(self) -> Dict:
+        """Event counts by status"""
+        rows = db.session.execute(
+            db.select(WebhookEvent.status, db.func.count()).group_by(WebhookEvent.status)
+        ).all()
+        return {status: count for status, count in rows}
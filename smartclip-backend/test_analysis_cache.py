@@ -0,0 +1,165 @@
+"""
+Tests for the transcript analysis cache
+"""
+
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from database import AnalysisCacheEntry
+from services.analysis_cache import AnalysisCache
+from services.openai_service import OpenAIService
+
+TRANSCRIPT = "[00:00:01.000] Hello\n\n[00:00:20.000] World"
+MOMENTS = [{'start_time': 1.0, 'end_time': 20.0, 'title': 't', 'description': 'd', 'reason': 'r', 'score': 0.9}]
+
+
+def make_service(cache, model='gpt-test'):
+    """OpenAIService whose completion call is counted instead of sent"""
+    service = OpenAIService(api_key='test', model=model, cache=cache)
+    service.calls = 0
+
+    def fake_request(transcript, video_duration=None, window=None):
+        service.calls += 1
+        return list(MOMENTS)
+
+    service._request_moments = fake_request
+    return service
+
+
+def test_identical_transcript_hits_cache(client):
+    """The second analysis of the same transcript costs no completion"""
+    cache = AnalysisCache()
+    service = make_service(cache)
+
+    first = service.analyze_transcript(TRANSCRIPT, 60.0)
+    second = service.analyze_transcript(TRANSCRIPT, 60.0)
+
+    assert service.calls == 1
+    assert first == second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert AnalysisCacheEntry.query.one().hits == 1
+
+
+def test_cache_survives_service_instances(client):
+    """Results persist in the database, e.g. across processes"""
+    make_service(AnalysisCache()).analyze_transcript(TRANSCRIPT, 60.0)
+
+    other = make_service(AnalysisCache())
+    other.analyze_transcript(TRANSCRIPT, 60.0)
+
+    assert other.calls == 0
+
+
+def test_key_covers_analysis_settings(client):
+    """Different duration or model are different cache entries"""
+    cache = AnalysisCache()
+    service = make_service(cache)
+    service.analyze_transcript(TRANSCRIPT, 60.0)
+    service.analyze_transcript(TRANSCRIPT, 61.0)
+    make_service(cache, model='other-model').analyze_transcript(TRANSCRIPT, 60.0)
+
+    assert service.calls == 2
+    assert AnalysisCacheEntry.query.count() == 3
+
+
+def test_bypass_refreshes_entry(client):
+    """use_cache=False skips the lookup but stores the fresh result"""
+    cache = AnalysisCache()
+    service = make_service(cache)
+    service.analyze_transcript(TRANSCRIPT, 60.0)
+    service.analyze_transcript(TRANSCRIPT, 60.0, use_cache=False)
+
+    assert service.calls == 2
+    assert cache.stats()['bypassed'] == 1
+    assert AnalysisCacheEntry.query.count() == 1
+
+
+def test_lru_eviction(client):
+    """Entries beyond max_entries are evicted least recently used first"""
+    cache = AnalysisCache(max_entries=2)
+    cache.put('a', MOMENTS, 'm', '1')
+    time.sleep(0.01)
+    cache.put('b', MOMENTS, 'm', '1')
+    time.sleep(0.01)
+    assert cache.get('a') == MOMENTS
+    time.sleep(0.01)
+    cache.put('c', MOMENTS, 'm', '1')
+
+    keys = {entry.key for entry in AnalysisCacheEntry.query.all()}
+    assert keys == {'a', 'c'}
+
+
+def test_empty_results_are_not_cached(client):
+    """An analysis that found nothing is asked again next time"""
+    cache = AnalysisCache()
+    service = make_service(cache)
+    service._request_moments = lambda *args, **kwargs: []
+
+    assert service.analyze_transcript(TRANSCRIPT, 60.0) == []
+    assert service.analyze_transcript(TRANSCRIPT, 60.0) == []
+    assert AnalysisCacheEntry.query.count() == 0
+    assert cache.stats()['misses'] == 2
+
+    # Entries stored before empty results were skipped read as misses
+    with db.engine.begin() as conn:
+        conn.execute(insert(AnalysisCacheEntry).values(
+            key='old', model='m', prompt_version='1', result='[]', hits=0,
+            created_at=datetime.utcnow(), last_used_at=datetime.utcnow()
+        ))
+    assert cache.get('old') is None
+
+
+LONG_TRANSCRIPT = '\n\n'.join(f"[00:{minute:02d}:00.000] Line at minute {minute}" for minute in range(40))
+
+
+def make_windowed_service(cache, failing_window_start=None, **kwargs):
+    """Windowed service whose window starting at failing_window_start errors"""
+    service = OpenAIService(api_key='test', model='gpt-test', cache=cache, chunk_threshold=600,
+                            window_seconds=600, window_overlap=60, moments_limit=2, **kwargs)
+    service.calls = 0
+
+    def fake_request(transcript, video_duration=None, window=None):
+        service.calls += 1
+        if window[0] == failing_window_start:
+            raise RuntimeError('429 Too Many Requests')
+        return [{'start_time': window[0] + i * 100 + 10, 'end_time': window[0] + i * 100 + 40, 'title': 't',
+                 'description': 'd', 'reason': 'r', 'score': 0.5} for i in range(2)]
+
+    service._request_moments = fake_request
+    return service
+
+
+def test_partial_window_results_are_not_cached(client):
+    """A transcript whose window failed is analyzed again next time, not served the partial result"""
+    cache = AnalysisCache()
+    service = make_windowed_service(cache, failing_window_start=0.0)
+
+    assert service.analyze_transcript(LONG_TRANSCRIPT, 2400.0)
+    assert AnalysisCacheEntry.query.count() == 0
+
+    windows = service.calls
+    service.analyze_transcript(LONG_TRANSCRIPT, 2400.0)
+    assert service.calls == 2 * windows
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (0, 2)
+
+
+def test_fallback_ranking_is_not_cached(client):
+    """Moments ranked by score because the ranking completion failed are not cached"""
+    cache = AnalysisCache()
+    service = make_windowed_service(cache, llm_reduce=True)
+
+    def failing_rank(candidates, video_duration=None):
+        raise RuntimeError('timed out')
+
+    service._rank_candidates = failing_rank
+
+    assert len(service.analyze_transcript(LONG_TRANSCRIPT, 2400.0)) == 2
+    assert AnalysisCacheEntry.query.count() == 0
+
+    service._rank_candidates = lambda candidates, video_duration=None: candidates[:2]
+    service.analyze_transcript(LONG_TRANSCRIPT, 2400.0)
+    assert AnalysisCacheEntry.query.count() == 1
@@ -4,8 +4,10 @@ Tests for SmartClip Backend
 
 import pytest
 import json
-from app import app, db
+from datetime import datetime, timedelta
+from app import app, db, mux_service, webhook_inbox
 from database import Video, Moment, Clip
+from services.cue_store import CueStore
 
 
 @pytest.fixture
@@ -83,6 +85,71 @@ def test_get_moments_empty(client, sample_video):
     assert data['moments'] == []
 
 
+def test_get_transcript_range(client, sample_video):
+    """Transcript cues can be fetched for a time range"""
+    video = db.session.get(Video, sample_video)
+    video.cues = CueStore.from_cues([(0, 5, 'a'), (5, 10, 'b'), (10, 15, 'c')]).to_bytes()
+    db.session.commit()
+    
+    response = client.get(f'/api/videos/{sample_video}/transcript?start=6&end=11')
+    assert response.status_code == 200
+    
+    data = json.loads(response.data)
+    assert data['cues'] == [
+        {'start': 5.0, 'end': 10.0, 'text': 'b'},
+        {'start': 10.0, 'end': 15.0, 'text': 'c'}
+    ]
+
+
+def test_list_videos_pages_with_cursor(client):
+    """The video list is served newest first in cursor-linked pages"""
+    created_at = datetime(2024, 1, 1)
+    for i in range(5):
+        # Two videos share each timestamp; the id breaks the tie
+        db.session.add(Video(asset_id=f'asset_{i}', status='ready',
+                             created_at=created_at + timedelta(minutes=i // 2)))
+    db.session.add(Video(asset_id='failed', status='error', created_at=created_at))
+    db.session.commit()
+
+    ids, cursor = [], None
+    while True:
+        url = '/api/videos?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url).data)
+        assert len(data['videos']) <= 2
+        ids.extend(int(video['id']) for video in data['videos'])
+        cursor = data['nextCursor']
+        if not cursor:
+            break
+
+    videos = Video.query.filter(Video.status == 'ready').all()
+    expected = sorted(videos, key=lambda video: (video.created_at, video.id), reverse=True)
+    assert ids == [video.id for video in expected]
+
+    response = client.get('/api/videos?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_list_videos_fields(client, sample_video):
+    """fields= selects keys; the transcript is left out by default"""
+    video = db.session.get(Video, sample_video)
+    video.transcript = '[00:00:01.000] Hello'
+    db.session.commit()
+
+    data = json.loads(client.get('/api/videos').data)
+    assert 'transcript' not in data['videos'][0]
+    assert data['videos'][0]['muxPlaybackId'] == 'test_playback_456'
+
+    data = json.loads(client.get('/api/videos?fields=id,status,transcript').data)
+    assert data['videos'] == [{
+        'id': str(sample_video),
+        'status': 'ready',
+        'transcript': '[00:00:01.000] Hello'
+    }]
+
+    response = client.get('/api/videos?fields=id,password')
+    assert response.status_code == 400
+
+
 def test_analyze_video_no_asset(client):
     """Test analyzing video without asset ID"""
     with app.app_context():
@@ -192,5 +259,24 @@ def test_moment_to_dict(client):
         assert moment_dict['score'] == 0.9
 
 
+def test_webhook_asset_ready_refreshes_cache(client, sample_video):
+    """Asset ready webhooks update the video from the payload and prime the cache"""
+    asset = {
+        'id': 'test_asset_123',
+        'status': 'ready',
+        'duration': 42.0,
+        'playback_ids': [{'id': 'webhook_playback'}]
+    }
+    response = client.post('/api/webhooks/mux', json={'type': 'video.asset.ready', 'data': asset})
+    assert response.status_code == 200
+    webhook_inbox.drain()
+
+    assert mux_service.asset_cache.peek('test_asset_123')['duration'] == 42.0
+    with app.app_context():
+        video = db.session.get(Video, sample_video)
+        assert video.playback_id == 'webhook_playback'
+        assert video.duration == 42.0
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,116 @@
+"""
+Tests for the Mux asset cache
+"""
+
+import threading
+import time
+
+from services.asset_cache import AssetCache
+from services.mux_service import MuxService
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_depends_on_status():
+    """Settling assets expire quickly, settled ones are kept"""
+    clock = FakeClock()
+    cache = AssetCache(settling_ttl=2, ready_ttl=60, clock=clock)
+    cache.put('preparing', {'id': 'preparing', 'status': 'preparing'})
+    cache.put('ready', {'id': 'ready', 'status': 'ready', 'tracks': [{'type': 'video', 'status': 'ready'}]})
+    cache.put('tracks', {'id': 'tracks', 'status': 'ready', 'tracks': [{'type': 'text', 'status': 'preparing'}]})
+
+    clock.now = 5
+    assert cache.peek('preparing') is None
+    assert cache.peek('tracks') is None
+    assert cache.peek('ready')['id'] == 'ready'
+
+    clock.now = 61
+    assert cache.peek('ready') is None
+
+
+def test_read_through_loads_once():
+    """Repeated reads within the TTL don't call the loader again"""
+    calls = []
+    cache = AssetCache()
+
+    def loader():
+        calls.append(1)
+        return {'id': 'a1', 'status': 'ready'}
+
+    for _ in range(5):
+        assert cache.get('a1', loader)['id'] == 'a1'
+
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 4
+    assert cache.stats()['misses'] == 1
+
+
+def test_concurrent_misses_are_coalesced():
+    """Simultaneous misses for one asset share a single upstream call"""
+    calls = []
+    release = threading.Event()
+    cache = AssetCache()
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return {'id': 'a1', 'status': 'ready'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('a1', loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8
+
+
+def test_lru_eviction():
+    """Least recently used entries are dropped beyond max_entries"""
+    cache = AssetCache(max_entries=2)
+    cache.put('a', {'status': 'ready'})
+    cache.put('b', {'status': 'ready'})
+    cache.peek('a')
+    cache.put('c', {'status': 'ready'})
+
+    assert cache.peek('b') is None
+    assert cache.peek('a') is not None
+    assert cache.peek('c') is not None
+
+
+def test_apply_webhook():
+    """Asset events refresh entries, track events invalidate the parent"""
+    cache = AssetCache()
+    cache.apply_webhook('video.asset.ready', {'id': 'a1', 'status': 'ready', 'duration': 12.5})
+    assert cache.peek('a1')['duration'] == 12.5
+
+    cache.apply_webhook('video.asset.track.ready', {'id': 'track1', 'asset_id': 'a1', 'type': 'text'})
+    assert cache.peek('a1') is None
+
+    cache.apply_webhook('video.upload.asset_created', {'id': 'u1', 'asset_id': 'a2'})
+    assert cache.peek('u1') is None
+
+
+def test_mux_service_uses_cache():
+    """get_asset goes through the cache and use_cache=False bypasses it"""
+    service = MuxService('token', 'secret', asset_cache=AssetCache())
+    fetches = []
+    service._fetch_asset = lambda asset_id: fetches.append(asset_id) or {'id': asset_id, 'status': 'ready'}
+
+    service.get_asset('a1')
+    service.get_asset('a1')
+    service.get_asset('a1', use_cache=False)
+
+    assert fetches == ['a1', 'a1']
@@ -0,0 +1,83 @@
+"""
+Tests for the video bundle endpoint
+"""
+
+import pytest
+
+from app import db
+from database import Video, Moment, Clip
+
+
+def add_video(moments, clips_per_moment):
+    video = Video(asset_id='asset_1', playback_id='play_1', status='ready', duration=600.0)
+    video.transcript = 'not part of the bundle'
+    db.session.add(video)
+    db.session.commit()
+    for i in range(moments):
+        # Inserted out of order; the bundle lists moments by start time
+        moment = Moment(video_id=video.id, start_time=(moments - i) * 10, end_time=(moments - i) * 10 + 5,
+                        title=f'm{i}', description='d', score=0.9)
+        moment.clips = [Clip(asset_id=f'clip_{i}_{j}', playback_id=f'cp_{i}_{j}', status='ready')
+                        for j in range(clips_per_moment)]
+        db.session.add(moment)
+    db.session.commit()
+    video_id = video.id
+    db.session.expire_all()
+    return video_id
+
+
+def test_bundle_contents(client):
+    """Video, moments in start order, and each moment's clips"""
+    video_id = add_video(moments=3, clips_per_moment=2)
+
+    response = client.get(f'/api/videos/{video_id}/bundle')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['video']['id'] == str(video_id)
+    assert data['video']['muxPlaybackId'] == 'play_1'
+    assert 'transcript' not in data['video']
+    assert [m['startTime'] for m in data['moments']] == [10, 20, 30]
+    assert all(len(m['clips']) == 2 for m in data['moments'])
+    assert all(c['momentId'] == m['id'] for m in data['moments'] for c in m['clips'])
+
+
+@pytest.mark.parametrize('moments,clips_per_moment', [(1, 1), (20, 3)])
+def test_bundle_query_count_is_fixed(client, statements, moments, clips_per_moment):
+    """Three version queries, then one query each for the video, the moments and the clips"""
+    video_id = add_video(moments, clips_per_moment)
+    statements.clear()
+
+    response = client.get(f'/api/videos/{video_id}/bundle')
+    assert response.status_code == 200
+    assert len(statements) == 6
+
+    statements.clear()
+    cached = client.get(f'/api/videos/{video_id}/bundle', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert len(statements) == 3
+
+
+def test_bundle_conditional_get(client):
+    """An unchanged bundle answers If-None-Match with 304"""
+    video_id = add_video(moments=2, clips_per_moment=1)
+
+    first = client.get(f'/api/videos/{video_id}/bundle')
+    etag = first.headers['ETag']
+
+    cached = client.get(f'/api/videos/{video_id}/bundle', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    clip = db.session.execute(db.select(Clip)).scalars().first()
+    clip.status = 'errored'
+    db.session.commit()
+
+    changed = client.get(f'/api/videos/{video_id}/bundle', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_bundle_missing_video(client):
+    """Unknown videos are a 404"""
+    assert client.get('/api/videos/999/bundle').status_code == 404
@@ -0,0 +1,108 @@
+"""
+Tests for batched moment captions
+"""
+
+import json
+from types import SimpleNamespace
+
+import openai
+
+from app import db, job_queue
+from database import Job, Video, Moment
+from services.openai_service import OpenAIService
+from services.video_processor import VideoProcessor
+
+
+def completion(content):
+    """Chat completion response carrying content"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def add_moments(video, titles):
+    for i, title in enumerate(titles):
+        db.session.add(Moment(video_id=video.id, start_time=i * 10, end_time=i * 10 + 5,
+                              title=title, description='d'))
+    db.session.commit()
+
+
+def test_one_completion_captions_all_moments(monkeypatch):
+    """generate_social_captions makes one request and maps entries by index"""
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return completion(json.dumps([
+            {'index': 1, 'caption': 'Second', 'hashtags': ['#two']},
+            {'index': 0, 'caption': 'First', 'hashtags': ['one']},
+            {'index': 9, 'caption': 'Out of range', 'hashtags': []}
+        ]))
+
+    monkeypatch.setattr(openai.chat.completions, 'create', create)
+    service = OpenAIService(api_key='test')
+
+    captions = service.generate_social_captions([
+        {'title': 'a', 'description': 'x'},
+        {'title': 'b', 'description': 'y'},
+        {'title': 'c', 'description': 'z'}
+    ])
+
+    assert len(requests) == 1
+    assert captions == [
+        {'caption': 'First', 'hashtags': ['one']},
+        {'caption': 'Second', 'hashtags': ['two']},
+        None
+    ]
+
+
+def test_analysis_queues_caption_job(client, fake_mux, fake_openai):
+    """Storing moments queues their captions in the same transaction"""
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+
+    processor = VideoProcessor(fake_mux, fake_openai, job_queue=job_queue)
+    processor.run_analysis_job({'video_id': video.id})
+
+    job = Job.query.filter_by(kind='caption_moments').one()
+    assert json.loads(job.payload) == {'video_id': video.id}
+
+
+def test_caption_job_stores_captions(client, fake_mux, fake_openai):
+    """The job captions uncaptioned moments in one batch"""
+    video = Video(asset_id='asset_1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    add_moments(video, ['one', 'two', 'three'])
+
+    fake_openai.uncaptioned = {'three'}  # the model skipped one
+    processor = VideoProcessor(fake_mux, fake_openai)
+
+    assert processor.run_caption_job({'video_id': video.id}) == {'captioned': 2}
+    assert fake_openai.caption_batches == [['one', 'two', 'three']]
+
+    moments = Moment.query.order_by(Moment.id).all()
+    assert moments[0].to_dict()['caption'] == 'About one'
+    assert moments[0].to_dict()['hashtags'] == ['a', 'b']
+    assert moments[2].caption is None
+
+    # A rerun only asks about the moment still missing a caption
+    processor.run_caption_job({'video_id': video.id})
+    assert fake_openai.caption_batches[-1] == ['three']
+
+
+def test_clip_caption_uses_stored_caption(client, fake_mux, fake_openai):
+    """Clipping a captioned moment makes no completion"""
+    video = Video(asset_id='asset_1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    add_moments(video, ['one', 'two'])
+    first, second = Moment.query.order_by(Moment.id).all()
+    first.caption, first.hashtags = 'Stored', 'x,y'
+    db.session.commit()
+
+    processor = VideoProcessor(fake_mux, fake_openai)
+
+    assert processor.caption_for(first) == {'caption': 'Stored', 'hashtags': ['x', 'y']}
+    assert fake_openai.caption_calls == 0
+    assert processor.caption_for(second)['caption'] == 'Single two'
+    assert fake_openai.caption_calls == 1
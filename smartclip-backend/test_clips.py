@@ -0,0 +1,186 @@
+"""
+Tests for clip creation
+"""
+
+import threading
+import time
+
+from app import app, db, video_processor, mux_service
+from database import Video, Moment, Clip
+from services.reconciler import ClipReconciler
+from services.video_processor import VideoProcessor
+
+
+def add_video_with_moments(count):
+    video = Video(asset_id='asset_1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    for i in range(count):
+        db.session.add(Moment(video_id=video.id, start_time=i * 10, end_time=i * 10 + 5,
+                              title=f'm{i}', description='d', caption=f'Stored {i}', hashtags='a,b'))
+    db.session.commit()
+    return video
+
+
+def test_bulk_clips_run_concurrently(client, fake_mux, fake_openai):
+    """N clips take about one Mux round trip, not N"""
+    video = add_video_with_moments(4)
+    fake_mux.latency = 0.2
+    processor = VideoProcessor(fake_mux, fake_openai, clip_concurrency=4)
+
+    started = time.perf_counter()
+    results = processor.create_clips_for_video(video)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.6
+    assert fake_mux.peak == 4
+    assert [r['success'] for r in results] == [True] * 4
+    assert db.session.get(Clip, int(results[1]['clip']['id'])).caption == 'Stored 1'
+    assert fake_openai.caption_calls == 0
+    assert Clip.query.count() == 4
+
+
+def test_bulk_clips_concurrency_is_bounded(client, fake_mux, fake_openai):
+    """No more than clip_concurrency Mux requests are in flight"""
+    video = add_video_with_moments(5)
+    fake_mux.latency = 0.05
+
+    VideoProcessor(fake_mux, fake_openai, clip_concurrency=2).create_clips_for_video(video)
+
+    assert fake_mux.peak == 2
+
+
+def test_bulk_clips_endpoint(client, monkeypatch, fake_mux, fake_openai):
+    """Per-moment results: failures reported, existing clips reused"""
+    video = add_video_with_moments(3)
+    first = Moment.query.filter_by(start_time=0).one()
+    db.session.add(Clip(moment_id=first.id, asset_id='old_clip', status='ready'))
+    db.session.commit()
+
+    fake_mux.fail_at = 20
+    monkeypatch.setattr(video_processor, 'mux_service', fake_mux)
+    monkeypatch.setattr(video_processor, 'openai_service', fake_openai)
+
+    response = client.post(f'/api/videos/{video.id}/clips')
+    assert response.status_code == 201
+
+    results = response.get_json()['results']
+    assert [(r['success'], r['created']) for r in results] == [(True, False), (True, True), (False, False)]
+    assert results[0]['clip']['id'] == str(Clip.query.filter_by(asset_id='old_clip').one().id)
+    assert results[2]['error'] == 'Mux said no'
+    assert Clip.query.count() == 2
+
+    response = client.post(f'/api/videos/{video.id}/clips', json={'momentIds': [first.id]})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 1
+
+    other = Video(asset_id='asset_2', status='ready')
+    db.session.add(other)
+    db.session.commit()
+    foreign = Moment(video_id=other.id, start_time=0, end_time=5, title='other')
+    db.session.add(foreign)
+    db.session.commit()
+    response = client.post(f'/api/videos/{video.id}/clips', json={'momentIds': [first.id, 999, foreign.id]})
+    assert response.status_code == 200
+    assert [(r['momentId'], r['success'], r.get('error')) for r in response.get_json()['results']] == [
+        (str(first.id), True, None), ('999', False, 'Moment not found'), (str(foreign.id), False, 'Moment not found')
+    ]
+
+    for bad in ('123', 5, {'id': 1}, ['x']):
+        assert client.post(f'/api/videos/{video.id}/clips', json={'momentIds': bad}).status_code == 400
+    assert Clip.query.count() == 2
+
+    assert client.post('/api/videos/999/clips').status_code == 404
+
+
+def add_clips(statuses):
+    video = add_video_with_moments(len(statuses))
+    for moment, status in zip(Moment.query.order_by(Moment.id), statuses):
+        db.session.add(Clip(moment_id=moment.id, asset_id=f'clip_{moment.id}', status=status))
+    db.session.commit()
+    return Clip.query.order_by(Clip.id).all()
+
+
+def test_clip_reconciler_updates_processing_clips(client, fake_mux):
+    """Ready clips get their URL from the playback ID; settled clips aren't polled"""
+    clips = add_clips(['processing', 'processing', 'ready'])
+    fake_mux.assets = {
+        clips[0].asset_id: {'status': 'ready', 'playback_ids': [{'id': 'p0'}]},
+        clips[1].asset_id: {'status': 'errored'}
+    }
+
+    result = ClipReconciler(app, fake_mux).run_once()
+
+    assert result == {'checked': 2, 'updated': 2, 'remaining': False}
+    assert sorted(fake_mux.asset_calls) == [clips[0].asset_id, clips[1].asset_id]
+    db.session.expire_all()  # written from the reconciler's own app context
+    first, second = db.session.get(Clip, clips[0].id), db.session.get(Clip, clips[1].id)
+    assert (first.status, first.download_url) == ('ready', 'https://stream.example/p0.m3u8')
+    assert second.status == 'errored'
+
+
+def test_clip_reconciler_batches_and_backs_off(client, fake_mux):
+    """Batches rotate through processing clips; unchanged passes slow down"""
+    clips = add_clips(['processing'] * 3)
+    reconciler = ClipReconciler(app, fake_mux, batch_size=2, min_interval=1, max_interval=4)
+
+    reconciler.run_once()
+    assert sorted(fake_mux.asset_calls) == [clip.asset_id for clip in clips[:2]]
+    result = reconciler.run_once()
+    assert fake_mux.asset_calls[2:] == [clips[2].asset_id]
+    assert result == {'checked': 1, 'updated': 0, 'remaining': True}
+
+    intervals = []
+    for _ in range(3):
+        reconciler.interval = reconciler._next_interval(result)
+        intervals.append(reconciler.interval)
+    assert intervals == [2, 4, 4]
+
+    reconciler.wake()
+    assert reconciler.interval == 1
+    assert reconciler._next_interval({'updated': 0, 'remaining': False}) == 4
+
+
+def test_clip_reconciler_concurrency_is_bounded(client, fake_mux):
+    """A pass asks Mux about its clips at most concurrency at a time"""
+    clips = add_clips(['processing'] * 5)
+    fake_mux.hold = threading.Event()
+    threading.Timer(0.2, fake_mux.hold.set).start()
+
+    result = ClipReconciler(app, fake_mux, concurrency=2).run_once()
+
+    assert result['checked'] == 5
+    assert fake_mux.peak == 2
+    assert sorted(fake_mux.asset_calls) == sorted(clip.asset_id for clip in clips)
+
+
+def test_clip_reconciler_notices_clips_from_other_processes(client, fake_mux):
+    """A clip inserted without wake() ends the reconciler's wait"""
+    reconciler = ClipReconciler(app, fake_mux, min_interval=0.05, max_interval=60)
+    assert not reconciler._has_new_clips()
+
+    clips = add_clips(['processing'])  # as if requested by another process
+    started = time.monotonic()
+    reconciler._wait(60)
+
+    assert time.monotonic() - started < 5
+    assert reconciler.interval == 0.05
+    assert reconciler._newest_id == clips[0].id
+    assert not reconciler._has_new_clips()
+
+
+def test_get_clip_does_not_call_mux(client, monkeypatch):
+    """Clip polls are served from the database"""
+    clips = add_clips(['processing', 'ready'])
+    clips[1].playback_id = 'p1'
+    db.session.commit()
+
+    def fail(*args):
+        raise AssertionError('Mux was called')
+
+    monkeypatch.setattr(mux_service, 'get_asset', fail)
+    monkeypatch.setattr(mux_service, 'get_download_url', fail)
+
+    assert client.get(f'/api/clips/{clips[0].id}').get_json()['clip']['status'] == 'processing'
+    clip = client.get(f'/api/clips/{clips[1].id}').get_json()['clip']
+    assert clip['downloadUrl'].endswith('/p1.m3u8')
@@ -0,0 +1,169 @@
+"""
+Tests for the JSON provider and response compression
+"""
+
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app import db, video_processor
+from database import Video, Moment
+from services import json_provider
+from services.compression import ResponseCompressor, brotli
+from services.json_provider import FastJSONProvider, orjson
+
+needs_orjson = pytest.mark.skipif(orjson is None, reason='orjson not installed')
+needs_brotli = pytest.mark.skipif(brotli is None, reason='brotli not installed')
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+PAYLOAD = {
+    'b': [1, 2.5, None, True],
+    'a': {'nested': 'ünïcode', 'count': 3},
+    'when': datetime(2024, 5, 1, 12, 30),
+}
+
+
+@needs_orjson
+def test_fast_provider_matches_default_output():
+    """Same JSON as Flask's encoder, key order and dates included"""
+    flask_app = Flask(__name__)
+    fast, default = FastJSONProvider(flask_app), DefaultJSONProvider(flask_app)
+
+    assert fast.fast
+    assert json.loads(fast.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+    assert list(json.loads(fast.dumps(PAYLOAD))) == ['a', 'b', 'when']
+    assert fast.loads(fast.dumps(PAYLOAD))['when'] == 'Wed, 01 May 2024 12:30:00 GMT'
+    assert fast.dumps({2: 'b', 1: 'a'}) == '{"1":"a","2":"b"}'
+
+    with flask_app.app_context():
+        body = fast.response(PAYLOAD).get_data()
+    assert body.endswith(b'\n')
+    assert json.loads(body) == json.loads(default.dumps(PAYLOAD))
+
+
+@needs_orjson
+def test_fast_provider_falls_back_to_stdlib(monkeypatch):
+    """Values orjson rejects, stdlib-only options and a missing orjson all still encode"""
+    flask_app = Flask(__name__)
+    provider = FastJSONProvider(flask_app)
+
+    assert provider.dumps({'big': 2 ** 70}) == '{"big": 1180591620717411303424}'
+    assert provider.dumps([1], indent=2) == '[\n  1\n]'
+    assert provider.loads('[NaN]')[0] != provider.loads('[NaN]')[0]
+
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    plain = FastJSONProvider(flask_app)
+    assert not plain.fast
+    with flask_app.app_context():
+        assert json.loads(plain.response(a=1).get_data()) == {'a': 1}
+
+
+@needs_brotli
+def test_negotiation():
+    """Brotli preferred, q=0 respected, identity when nothing matches"""
+    compressor = ResponseCompressor()
+
+    assert compressor.negotiate(accept('gzip, deflate, br')) == 'br'
+    assert compressor.negotiate(accept('gzip, br;q=0')) == 'gzip'
+    assert compressor.negotiate(accept('*')) == 'br'
+    assert compressor.negotiate(accept('deflate')) is None
+    assert compressor.negotiate(accept('')) is None
+
+
+def test_compress_thresholds_and_exclusions():
+    """Small, non-JSON, streamed and error responses are left alone"""
+    compressor = ResponseCompressor(min_size=100)
+    body = json.dumps({'words': ['same words again'] * 50})
+
+    small = compressor.compress(Response('{}', mimetype='application/json'), accept('gzip'))
+    assert 'Content-Encoding' not in small.headers and 'Vary' not in small.headers
+
+    binary = compressor.compress(Response(body, mimetype='video/mp4'), accept('gzip'))
+    assert 'Content-Encoding' not in binary.headers
+
+    streamed = compressor.compress(Response(iter([body]), mimetype='application/json'), accept('gzip'))
+    assert 'Content-Encoding' not in streamed.headers
+
+    failed = compressor.compress(Response(body, status=500, mimetype='application/json'), accept('gzip'))
+    assert 'Content-Encoding' not in failed.headers
+
+    partial = compressor.compress(Response(body, status=206, mimetype='application/json'), accept('gzip'))
+    assert 'Content-Encoding' not in partial.headers
+
+    created = compressor.compress(Response(body, status=201, mimetype='application/json'), accept('gzip'))
+    assert created.headers['Content-Encoding'] == 'gzip'
+
+    identity = compressor.compress(Response(body, mimetype='application/json'), accept(''))
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+
+    encoded = compressor.compress(Response(body, mimetype='application/json'), accept('gzip'))
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert int(encoded.headers['Content-Length']) == len(encoded.get_data()) < len(body)
+    assert gzip.decompress(encoded.get_data()).decode() == body
+
+
+def add_videos(count):
+    for i in range(count):
+        db.session.add(Video(asset_id=f'asset_{i}', playback_id=f'play_{i}', status='ready', duration=60.0,
+                             source_url=f'https://example.com/videos/{i}.mp4'))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('encoding', ['gzip', pytest.param('br', marks=needs_brotli)])
+def test_api_responses_are_compressed(client, encoding):
+    """The video list comes back encoded when the client asks for it"""
+    add_videos(30)
+
+    plain = client.get('/api/videos')
+    encoded = client.get('/api/videos', headers={'Accept-Encoding': encoding})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert encoded.headers['Content-Encoding'] == encoding
+    assert len(encoded.data) < len(plain.data) / 3
+    decode = brotli.decompress if encoding == 'br' else gzip.decompress
+    assert json.loads(decode(encoded.data)) == plain.get_json()
+
+
+def test_created_responses_are_compressed(client, monkeypatch, fake_mux, fake_openai):
+    """The 201 of a bulk clip request is encoded like any other large JSON response"""
+    video = Video(asset_id='asset_1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    for i in range(20):
+        db.session.add(Moment(video_id=video.id, start_time=i * 10, end_time=i * 10 + 5,
+                              title=f'Moment {i}', description='d', caption=f'Caption {i}', hashtags='a,b'))
+    db.session.commit()
+    monkeypatch.setattr(video_processor, 'mux_service', fake_mux)
+    monkeypatch.setattr(video_processor, 'openai_service', fake_openai)
+
+    response = client.post(f'/api/videos/{video.id}/clips', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 201
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.data))['results']) == 20
+
+
+def test_conditional_responses_stay_uncompressed(client):
+    """304s have no body to encode and keep their ETag"""
+    add_videos(1)
+    video_id = Video.query.first().id
+
+    first = client.get(f'/api/videos/{video_id}', headers={'Accept-Encoding': 'gzip'})
+    cached = client.get(f'/api/videos/{video_id}', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']
+    })
+
+    assert cached.status_code == 304
+    assert 'Content-Encoding' not in cached.headers
+    assert cached.headers['ETag'] == first.headers['ETag']
@@ -0,0 +1,60 @@
+"""
+Tests for the cue store
+"""
+
+import pytest
+
+from services.cue_store import CueStore
+
+
+@pytest.fixture
+def cues():
+    """Three cues with a gap between the second and third"""
+    return CueStore.from_cues([
+        (4.0, 8.0, 'second'),
+        (0.5, 4.0, 'first'),
+        (12.0, 15.5, 'third ünïcode'),
+    ])
+
+
+def test_cues_are_sorted_by_start(cues):
+    """Cues are stored in time order regardless of input order"""
+    assert [text for _, _, text in cues] == ['first', 'second', 'third ünïcode']
+    assert cues.end_time == 15.5
+
+
+def test_index_at(cues):
+    """Time lookups find the cue being spoken, or None in a gap"""
+    assert cues.index_at(0.0) is None
+    assert cues.index_at(0.5) == 0
+    assert cues.index_at(4.0) == 1
+    assert cues.index_at(10.0) is None
+    assert cues.index_at(15.0) == 2
+    assert cues.index_at(20.0) is None
+
+
+def test_range_queries(cues):
+    """Range queries return the cues overlapping the interval"""
+    assert cues.range(0, 100) == (0, 3)
+    assert cues.range(5, 13) == (1, 3)
+    assert cues.range(8, 12) == (2, 2)
+    assert cues.text_between(3, 5) == 'first second'
+
+
+def test_bytes_round_trip(cues):
+    """Serialized stores load back identically"""
+    loaded = CueStore.from_bytes(cues.to_bytes())
+
+    assert list(loaded) == list(cues)
+    assert loaded.to_transcript() == cues.to_transcript()
+
+
+def test_transcript_format(cues):
+    """The formatted transcript matches the Video.transcript format"""
+    assert cues.to_transcript(stop=2) == '[00:00:00.500] first\n\n[00:00:04.000] second'
+
+
+def test_from_segments_uses_next_start_as_end():
+    """Segments without end times end at the next cue, the last at duration"""
+    cues = CueStore.from_segments([(0.0, 'a'), (5.0, 'b')], duration=9.0)
+    assert list(cues) == [(0.0, 5.0, 'a'), (5.0, 9.0, 'b')]
@@ -0,0 +1,124 @@
+"""
+Tests for version-based ETags on polled read endpoints
+"""
+
+import pytest
+
+from app import db, mux_service, video_reconciler
+from database import Video, Moment, Clip
+
+
+def add_video():
+    video = Video(asset_id='asset_1', playback_id='play_1', status='ready', duration=60.0)
+    video.transcript = 'hello world'
+    db.session.add(video)
+    db.session.commit()
+    moment = Moment(video_id=video.id, start_time=0, end_time=5, title='m', description='d')
+    db.session.add(moment)
+    db.session.commit()
+    clip = Clip(moment_id=moment.id, asset_id='clip_1', status='processing')
+    db.session.add(clip)
+    db.session.commit()
+    return video.id, moment.id, clip.id
+
+
+def poll(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+@pytest.mark.parametrize('path', ['/api/videos/{video}', '/api/videos/{video}/moments', '/api/clips/{clip}'])
+def test_unchanged_resource_is_not_modified(client, statements, path):
+    """A repeated poll gets a bodiless 304 from a single version query"""
+    video_id, _, clip_id = add_video()
+    url = path.format(video=video_id, clip=clip_id)
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+
+    statements.clear()
+    cached = poll(client, url, first.headers['ETag'])
+
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == first.headers['ETag']
+    assert len(statements) <= 2  # existence/version checks only
+
+
+def test_video_etag_changes_with_video_and_transcript(client):
+    """Status and transcript updates both produce a new tag"""
+    video_id, _, _ = add_video()
+    etag = client.get(f'/api/videos/{video_id}').headers['ETag']
+
+    video = db.session.get(Video, video_id)
+    video.transcript = 'hello again'
+    db.session.commit()
+    changed = poll(client, f'/api/videos/{video_id}', etag)
+    assert changed.status_code == 200
+    assert changed.get_json()['video']['transcript'] == 'hello again'
+
+    etag = changed.headers['ETag']
+    video.status = 'error'
+    db.session.commit()
+    assert poll(client, f'/api/videos/{video_id}', etag).status_code == 200
+
+
+def test_moments_etag_changes_on_edit_and_replacement(client):
+    """Caption edits and re-analysis replacing the moments produce a new tag"""
+    video_id, moment_id, _ = add_video()
+    url = f'/api/videos/{video_id}/moments'
+    etag = client.get(url).headers['ETag']
+
+    db.session.get(Moment, moment_id).caption = 'Fresh caption'
+    db.session.commit()
+    changed = poll(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.get_json()['moments'][0]['caption'] == 'Fresh caption'
+
+    etag = changed.headers['ETag']
+    Moment.query.filter_by(video_id=video_id).delete()
+    db.session.add(Moment(video_id=video_id, start_time=0, end_time=5, title='m', description='d'))
+    db.session.commit()
+    assert poll(client, url, etag).status_code == 200
+
+
+def test_clip_etag_changes_when_ready(client):
+    """A clip becoming ready is a new version"""
+    _, _, clip_id = add_video()
+    url = f'/api/clips/{clip_id}'
+    etag = client.get(url).headers['ETag']
+
+    clip = db.session.get(Clip, clip_id)
+    clip.status = 'ready'
+    clip.playback_id = 'clip_play'
+    db.session.commit()
+
+    changed = poll(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.get_json()['clip']['downloadUrl'] == mux_service.get_playback_url('clip_play')
+
+
+def test_video_still_waiting_on_mux_is_reconciled_first(client, monkeypatch):
+    """A 304 is never served from a version Mux might be about to change"""
+    video = Video(upload_id='upload_1', status='waiting_for_upload')
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+
+    calls = []
+
+    def reconcile(video):
+        calls.append(video.id)
+        return False
+
+    monkeypatch.setattr(video_reconciler, 'reconcile', reconcile)
+    etag = client.get(f'/api/videos/{video_id}').headers['ETag']
+    assert poll(client, f'/api/videos/{video_id}', etag).status_code == 304
+    assert calls == [video_id, video_id]
+
+
+def test_missing_resources(client):
+    """Unknown ids are still 404s"""
+    assert client.get('/api/videos/999').status_code == 404
+    assert client.get('/api/videos/999/moments').status_code == 404
+    assert client.get('/api/clips/999').status_code == 404
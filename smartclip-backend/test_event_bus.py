@@ -0,0 +1,179 @@
+"""
+Tests for the event bus and the video events stream
+"""
+
+import json
+
+from sqlalchemy import insert, update
+
+from app import app, db, event_bus, webhook_inbox
+from database import Video, Moment, Clip
+from services.event_bus import EventBus, video_topic
+
+
+def parse_sse(chunk):
+    """Parse one SSE message into (event name, data)"""
+    fields = {}
+    for line in chunk.decode().strip().splitlines():
+        key, _, value = line.partition(': ')
+        fields[key] = value
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+
+def test_publish_fans_out_to_all_subscribers():
+    """Every subscriber of a topic receives each event once"""
+    bus = EventBus()
+    subscribers = [bus.subscribe('video:1') for _ in range(3)]
+    other = bus.subscribe('video:2')
+
+    bus.publish('video:1', 'status', {'status': 'ready'})
+
+    for subscription in subscribers:
+        assert subscription.get(timeout=0).data == {'status': 'ready'}
+    assert other.get(timeout=0) is None
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """A full mailbox keeps the newest events without blocking the publisher"""
+    bus = EventBus(max_pending=2)
+    subscription = bus.subscribe('t')
+
+    for i in range(5):
+        bus.publish('t', 'n', {'i': i})
+
+    assert subscription.get(timeout=0).data == {'i': 3}
+    assert subscription.get(timeout=0).data == {'i': 4}
+
+
+def test_unsubscribe_removes_topic():
+    """Topics with no subscribers are dropped"""
+    bus = EventBus()
+    subscription = bus.subscribe('t')
+    assert bus.subscriber_count('t') == 1
+
+    bus.unsubscribe(subscription)
+    assert bus.subscriber_count() == 0
+
+
+def test_committed_status_change_is_published(client):
+    """Video and clip status changes are published after commit only"""
+    video = Video(asset_id='a1', status='processing')
+    db.session.add(video)
+    db.session.commit()
+    subscription = event_bus.subscribe(video_topic(video.id))
+
+    video.status = 'analyzing'
+    db.session.flush()
+    db.session.rollback()
+    assert subscription.get(timeout=0) is None
+
+    video = db.session.get(Video, video.id)
+    video.status = 'ready'
+    video.duration = 10.0
+    db.session.commit()
+    evt = subscription.get(timeout=0)
+    assert evt.name == 'status'
+    assert evt.data['status'] == 'ready'
+
+    # Changes to other columns don't produce events
+    video.duration = 20.0
+    db.session.commit()
+    assert subscription.get(timeout=0) is None
+
+    moment = Moment(video_id=video.id, start_time=0, end_time=10, title='m')
+    db.session.add(moment)
+    db.session.commit()
+    clip = Clip(moment_id=moment.id, asset_id='clip1', status='processing')
+    db.session.add(clip)
+    db.session.commit()
+
+    evt = subscription.get(timeout=0)
+    assert evt.name == 'clip'
+    assert evt.data['status'] == 'processing'
+    event_bus.unsubscribe(subscription)
+
+
+def test_events_endpoint_streams_transitions(client):
+    """The SSE endpoint sends a snapshot and then pushed transitions"""
+    video = Video(asset_id='a1', status='processing')
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+
+    response = client.get(f'/api/videos/{video_id}/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    chunks = response.response
+    name, data = parse_sse(next(chunks))
+    assert name == 'status'
+    assert data['status'] == 'processing'
+
+    event_bus.publish(video_topic(video_id), 'status', {'videoId': str(video_id), 'status': 'ready'})
+    name, data = parse_sse(next(chunks))
+    assert name == 'status'
+    assert data['status'] == 'ready'
+
+    response.close()
+    assert event_bus.subscriber_count(video_topic(video_id)) == 0
+
+
+def test_clip_ready_webhook_publishes_clip_event(client):
+    """A clip asset becoming ready is pushed to the parent video's stream"""
+    video = Video(asset_id='a1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    moment = Moment(video_id=video.id, start_time=0, end_time=10, title='m')
+    db.session.add(moment)
+    db.session.commit()
+    db.session.add(Clip(moment_id=moment.id, asset_id='clip_asset', status='processing'))
+    db.session.commit()
+    subscription = event_bus.subscribe(video_topic(video.id))
+
+    response = client.post('/api/webhooks/mux', json={
+        'type': 'video.asset.ready',
+        'data': {'id': 'clip_asset', 'status': 'ready', 'playback_ids': [{'id': 'clip_playback'}]}
+    })
+    assert response.status_code == 200
+    webhook_inbox.drain()
+
+    evt = subscription.get(timeout=0)
+    assert evt.name == 'clip'
+    assert evt.data['status'] == 'ready'
+    assert evt.data['downloadUrl'].endswith('/clip_playback.m3u8')
+    event_bus.unsubscribe(subscription)
+
+
+def test_heartbeat_catches_changes_from_other_processes(client, monkeypatch):
+    """Clip changes that never reach this process's bus are found on the heartbeat"""
+    monkeypatch.setitem(app.config, 'SSE_HEARTBEAT_INTERVAL', 0.01)
+    video = Video(asset_id='a1', status='ready')
+    db.session.add(video)
+    db.session.commit()
+    moment = Moment(video_id=video.id, start_time=0, end_time=10, title='m')
+    db.session.add(moment)
+    db.session.commit()
+    db.session.add(Clip(moment_id=moment.id, asset_id='clip_asset', status='processing'))
+    db.session.commit()
+    video_id, moment_id = video.id, moment.id
+
+    response = client.get(f'/api/videos/{video_id}/events', buffered=False)
+    chunks = response.response
+    assert parse_sse(next(chunks))[0] == 'status'
+    assert next(chunks) == b': keepalive\n\n'
+
+    # Written the way another process would: no session events, nothing published
+    with db.engine.begin() as conn:
+        conn.execute(update(Clip).where(Clip.asset_id == 'clip_asset').values(status='ready'))
+        conn.execute(insert(Clip).values(moment_id=moment_id, asset_id='clip_2', status='processing'))
+
+    events = [parse_sse(message) for message in next(chunks).strip().split(b'\n\n')]
+    assert [(name, data['status']) for name, data in events] == [('clip', 'ready'), ('clip', 'processing')]
+    assert next(chunks) == b': keepalive\n\n'
+    response.close()
+
+
+def test_events_endpoint_not_found(client):
+    """Unknown videos return 404"""
+    response = client.get('/api/videos/999/events')
+    assert response.status_code == 404
@@ -0,0 +1,111 @@
+"""
+Tests for the fake Mux and OpenAI servers used by load tests
+"""
+
+import time
+
+import openai
+import pytest
+import requests
+
+from benchmarks.fake_upstreams import FakeUpstreams, Profile
+from services.http_transport import HttpTransport
+from services.mux_service import MuxService
+from services.openai_service import OpenAIService
+
+
+@pytest.fixture
+def upstreams():
+    server = FakeUpstreams(ready_delay=0.2, transcript_delay=0.2, asset_duration=300).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def mux(upstreams):
+    config = upstreams.config()
+    return MuxService('id', 'secret', base_url=config['MUX_BASE_URL'], stream_url=config['MUX_STREAM_URL'])
+
+
+@pytest.fixture
+def openai_service(upstreams, monkeypatch):
+    # OpenAIService configures the module-level client; restore it afterwards
+    monkeypatch.setattr(openai, 'api_key', openai.api_key)
+    monkeypatch.setattr(openai, 'base_url', openai.base_url)
+    return OpenAIService(api_key='test', base_url=upstreams.config()['OPENAI_BASE_URL'], chunk_threshold=120,
+                         window_seconds=60, window_overlap=10)
+
+
+def test_upload_becomes_a_ready_asset_with_transcript(upstreams, mux):
+    """Upload -> asset -> ready -> subtitles, as the pipeline sees it"""
+    upload = mux.create_direct_upload()
+    asset_id = mux.get_upload(upload['id'])['asset_id']
+
+    assert mux.get_asset(asset_id)['status'] == 'preparing'
+    assert mux.get_transcript_cues(asset_id) is None
+
+    time.sleep(0.45)
+    asset = mux.get_asset(asset_id)
+    assert asset['status'] == 'ready'
+    assert asset['duration'] == 300
+    assert len(mux.get_transcript_cues(asset_id)) == 100
+
+
+def test_clip_asset(upstreams, mux):
+    """Clips are new assets that become ready after the delay"""
+    source = upstreams.add_asset()
+    clip = mux.create_clip(source['id'], 10, 40)
+
+    assert clip['status'] == 'preparing'
+    assert clip['duration'] == 30
+    time.sleep(0.25)
+    assert mux.get_asset(clip['id'])['status'] == 'ready'
+
+
+def test_openai_analysis_and_captions(upstreams, mux, openai_service):
+    """Windowed analysis and batch captions parse as real completions would"""
+    asset = upstreams.add_asset(duration=300)
+    cues = mux.get_transcript_cues(asset['id'])
+
+    moments = openai_service.analyze_transcript(cues.to_transcript(), video_duration=300, use_cache=False)
+
+    assert 3 <= len(moments) <= 5
+    assert all(0 <= m['start_time'] < m['end_time'] <= 300 for m in moments)
+    assert upstreams.requests['openai'] > 1  # one completion per window
+    assert upstreams.tokens['prompt'] > 0
+
+    captions = openai_service.generate_social_captions(moments[:2])
+    assert [c['caption'] for c in captions] == [f"Watch: {m['title']}" for m in moments[:2]]
+
+
+def test_injected_failures_are_seeded():
+    """Latency and failure draws repeat for the same seed"""
+    def draws(seed):
+        server = FakeUpstreams(mux=Profile(latency_ms=10, sigma=0.5, error_rate=0.2, rate_limit_rate=0.2), seed=seed)
+        try:
+            return [server.draw('mux') for _ in range(50)]
+        finally:
+            server.server_close()
+
+    first = draws(1)
+    assert first == draws(1)
+    assert first != draws(2)
+    statuses = [status for _, status in first]
+    assert 429 in statuses and 500 in statuses and None in statuses
+
+
+def test_rate_limits_are_retried_by_the_transport():
+    """429s carry Retry-After and the Mux transport retries them"""
+    server = FakeUpstreams(mux=Profile(rate_limit_rate=0.5, retry_after=0), seed=3).start()
+    try:
+        mux = MuxService('id', 'secret', base_url=server.url,
+                         transport=HttpTransport(max_retries=10, backoff_base=0))
+        asset = server.add_asset()
+        for _ in range(5):
+            assert mux.get_asset(asset['id'], use_cache=False)['id'] == asset['id']
+        assert mux.transport.stats()['GET /video/v1/assets/{id}']['retries'] > 0
+
+        response = requests.get(f"{server.url}/video/v1/assets/missing")
+        assert response.status_code in (404, 429)
+    finally:
+        server.stop()
@@ -0,0 +1,488 @@
+"""
+Tests for the background job queue and the analysis job
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import app, db, event_bus, job_queue, video_processor, webhook_inbox
+from database import Job, Video, Moment, Clip
+from services.job_queue import JobQueue, WorkerPool, RetryJob
+from services.cue_store import CueStore
+from services.event_bus import video_topic
+from services.video_processor import TRANSCRIPT_ERROR_MESSAGE, TRANSCRIPT_TIMEOUT_MESSAGE, VideoProcessor
+
+
+@pytest.fixture
+def queue(client):
+    """Fresh queue with its own handlers and no backoff"""
+    q = JobQueue(app, max_attempts=3, backoff_base=0)
+    return q
+
+
+def reload(model, id):
+    """Re-read a row after work done in another session"""
+    db.session.expire_all()
+    return db.session.get(model, id)
+
+
+def test_job_runs_and_stores_result(queue):
+    """A claimed job runs its handler and records the result"""
+    queue.register('echo', lambda payload: {'echo': payload['value']})
+    job = queue.enqueue('echo', {'value': 42})
+
+    assert WorkerPool(queue).run_once('w1') == 1
+
+    job = reload(Job, job.id)
+    assert job.status == 'succeeded'
+    assert job.attempts == 1
+    assert job.to_dict()['result'] == {'echo': 42}
+
+
+def test_future_jobs_are_not_claimed(queue):
+    """Delayed jobs wait until run_at"""
+    queue.register('noop', lambda payload: None)
+    queue.enqueue('noop', delay=60)
+
+    assert queue.claim('w1') == []
+
+
+def test_failed_job_is_retried_then_failed(queue):
+    """Errors reschedule the job until max_attempts, then call on_failure"""
+    failures = []
+
+    def boom(payload):
+        raise RuntimeError('boom')
+
+    queue.register('boom', boom, on_failure=lambda payload, error: failures.append(error))
+    job = queue.enqueue('boom', {'n': 1})
+    pool = WorkerPool(queue)
+
+    for _ in range(3):
+        assert pool.run_once('w1') == 1
+    assert pool.run_once('w1') == 0
+
+    job = reload(Job, job.id)
+    assert job.status == 'failed'
+    assert job.attempts == 3
+    assert job.last_error == 'boom'
+    assert failures == ['boom']
+
+
+def test_retry_job_uses_requested_delay(queue):
+    """RetryJob reschedules with the handler's delay"""
+    def not_yet(payload):
+        raise RetryJob('not yet', delay=120)
+
+    queue.register('later', not_yet)
+    job = queue.enqueue('later')
+    WorkerPool(queue).run_once('w1')
+
+    job = reload(Job, job.id)
+    assert job.status == 'queued'
+    assert job.last_error == 'not yet'
+    assert job.run_at > datetime.utcnow() + timedelta(seconds=100)
+
+
+def test_expired_lease_is_reclaimed(queue):
+    """A job whose worker died becomes claimable after the visibility timeout"""
+    queue.register('noop', lambda payload: None)
+    job = queue.enqueue('noop')
+
+    assert [j.id for j in queue.claim('dead-worker')] == [job.id]
+    assert queue.claim('w2') == []
+
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    reclaimed = queue.claim('w2')
+    assert [j.id for j in reclaimed] == [job.id]
+    assert reclaimed[0].attempts == 2
+    assert reclaimed[0].locked_by == 'w2'
+
+
+def test_analyze_endpoint_returns_job(client):
+    """POST /analyze queues a job instead of running the analysis inline"""
+    video = Video(asset_id='asset_1', status='processing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+
+    response = client.post(f'/api/videos/{video.id}/analyze')
+    assert response.status_code == 202
+
+    data = response.get_json()
+    assert data['status'] == 'analyzing'
+
+    job = job_queue.get(int(data['jobId']))
+    assert job.kind == 'analyze_video'
+    assert job.status == 'queued'
+
+    response = client.get(f"/api/jobs/{data['jobId']}")
+    assert response.status_code == 200
+    assert response.get_json()['job']['status'] == 'queued'
+
+
+def test_analysis_job_stores_moments(client, fake_mux, fake_openai):
+    """The analysis job persists transcript and moments"""
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+
+    processor = VideoProcessor(fake_mux, fake_openai)
+    result = processor.run_analysis_job({'video_id': video.id})
+
+    assert result == {'status': 'ready', 'moments': 1}
+    video = db.session.get(Video, video.id)
+    assert video.status == 'ready'
+    assert video.transcript == '[00:00:01.000] Hello'
+    assert CueStore.from_bytes(video.cues).cue(0) == (1.0, 4.0, 'Hello')
+    assert Moment.query.filter_by(video_id=video.id).count() == 1
+
+
+def test_analysis_job_waits_for_transcript(client, fake_mux, fake_openai):
+    """A pending transcript reschedules the job and marks the video transcribing"""
+    video = Video(asset_id='asset_1', status='analyzing')
+    db.session.add(video)
+    db.session.commit()
+
+    fake_mux.cues = None
+    fake_mux.asset = {'status': 'ready', 'tracks': [{'type': 'text', 'status': 'preparing'}]}
+    processor = VideoProcessor(fake_mux, fake_openai, transcript_retry_delay=30)
+    with pytest.raises(RetryJob) as excinfo:
+        processor.run_analysis_job({'video_id': video.id})
+
+    assert excinfo.value.delay == 30
+    assert db.session.get(Video, video.id).status == 'transcribing'
+
+
+def waiting_analysis(queue, fake_mux, fake_openai, **options):
+    """A queued analysis job for a video whose transcript Mux is still generating"""
+    processor = VideoProcessor(fake_mux, fake_openai, transcript_retry_delay=0, job_queue=queue, **options)
+    queue.register('analyze_video', processor.run_analysis_job, on_failure=processor.fail_analysis_job)
+    queue.register('caption_moments', processor.run_caption_job)
+
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+    fake_mux.cues = None
+    fake_mux.asset = {'status': 'ready', 'tracks': [{'type': 'text', 'status': 'preparing'}]}
+    return video.id, queue.enqueue('analyze_video', {'video_id': video.id}).id
+
+
+def test_transcript_wait_does_not_use_up_attempts(queue, fake_mux, fake_openai):
+    """A transcript slower than max_attempts polls still gets analyzed"""
+    video_id, job_id = waiting_analysis(queue, fake_mux, fake_openai)
+    pool = WorkerPool(queue)
+
+    for _ in range(queue.max_attempts * 2):
+        assert pool.run_once('w1') == 1
+    job = reload(Job, job_id)
+    assert (job.status, job.attempts) == ('queued', 0)
+    assert reload(Video, video_id).status == 'transcribing'
+
+    fake_mux.cues = CueStore.from_cues([(1.0, 4.0, 'Hello')])
+    assert pool.run_once('w1') == 1
+
+    assert reload(Job, job_id).status == 'succeeded'
+    assert reload(Video, video_id).status == 'ready'
+
+
+def test_transcript_wait_times_out(queue, fake_mux, fake_openai):
+    """The wait is bounded by wall-clock time instead of attempts"""
+    video_id, job_id = waiting_analysis(queue, fake_mux, fake_openai, transcript_wait_timeout=600)
+    pool = WorkerPool(queue)
+
+    pool.run_once('w1')
+    assert reload(Job, job_id).status == 'queued'
+
+    job = db.session.get(Job, job_id)
+    job.created_at = datetime.utcnow() - timedelta(seconds=601)
+    db.session.commit()
+    pool.run_once('w1')
+
+    assert reload(Job, job_id).status == 'failed'
+    video = reload(Video, video_id)
+    assert (video.status, video.error_message) == ('error', TRANSCRIPT_TIMEOUT_MESSAGE)
+
+
+def test_transcript_after_timeout_resumes_analysis(queue, fake_mux, fake_openai):
+    """A track.ready for a video that gave up waiting analyzes it after all"""
+    video_id, job_id = waiting_analysis(queue, fake_mux, fake_openai, transcript_wait_timeout=0)
+    processor = VideoProcessor(fake_mux, fake_openai, job_queue=queue)
+    pool = WorkerPool(queue)
+    pool.run_once('w1')
+    assert reload(Video, video_id).status == 'error'
+
+    fake_mux.cues = CueStore.from_cues([(1.0, 4.0, 'Hello')])
+    track = {'type': 'text', 'status': 'ready', 'asset_id': 'asset_1'}
+    assert processor.handle_webhook('video.asset.track.ready', track) == 'analyzing'
+    assert reload(Video, video_id).error_message is None
+    assert pool.run_once('w1') == 1
+
+    assert reload(Video, video_id).status == 'ready'
+    assert Job.query.filter_by(kind='analyze_video', status='succeeded').count() == 1
+
+
+def test_webhooks_leave_transcript_failures_alone(client):
+    """Only a timed-out wait is resumed; a failed transcript stays failed"""
+    video = Video(asset_id='asset_1', status='error', error_message=TRANSCRIPT_ERROR_MESSAGE)
+    db.session.add(video)
+    db.session.commit()
+
+    track = {'type': 'text', 'status': 'ready', 'asset_id': 'asset_1'}
+    assert video_processor.handle_webhook('video.asset.track.ready', track) is None
+    assert video_processor.handle_webhook('video.asset.ready', {'id': 'asset_1', 'tracks': [track]}) is None
+    assert reload(Video, video.id).status == 'error'
+
+
+def test_concurrent_analyze_requests_share_one_job(client):
+    """A double-click or retry joins the queued analysis instead of adding one"""
+    video = Video(asset_id='asset_1', status='ready', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+    subscription = event_bus.subscribe(video_topic(video_id))
+
+    first = client.post(f'/api/videos/{video_id}/analyze').get_json()
+    second = client.post(f'/api/videos/{video_id}/analyze').get_json()
+
+    # The conditional UPDATE still reaches open event streams
+    assert subscription.get(timeout=0).data['status'] == 'analyzing'
+    assert subscription.get(timeout=0) is None
+    event_bus.unsubscribe(subscription)
+
+    assert first['joined'] is False
+    assert second['joined'] is True
+    assert second['jobId'] == first['jobId']
+
+    results = []
+
+    def request_analysis():
+        with app.app_context():
+            results.append(video_processor.request_analysis(video_id))
+
+    threads = [threading.Thread(target=request_analysis) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {job_id for job_id, _ in results} == {int(first['jobId'])}
+    assert Job.query.filter_by(kind='analyze_video').count() == 1
+
+
+def test_stale_analyzing_status_starts_new_job(client):
+    """A video left analyzing without a live job can be analyzed again"""
+    video = Video(asset_id='asset_1', status='analyzing')
+    db.session.add(video)
+    db.session.commit()
+
+    response = client.post(f'/api/videos/{video.id}/analyze')
+
+    assert response.status_code == 202
+    assert response.get_json()['joined'] is False
+    assert Job.query.filter_by(kind='analyze_video').count() == 1
+
+
+def test_concurrent_analysis_jobs_store_moments_once(client, fake_mux, fake_openai):
+    """Two jobs for one video running together share a single analysis"""
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+
+    release = threading.Event()
+    fake_openai.hold = release
+    processor = VideoProcessor(fake_mux, fake_openai)
+    results = []
+
+    def run():
+        with app.app_context():
+            results.append(processor.run_analysis_job({'video_id': video_id}))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    threads[0].start()
+    while not processor._analysis_runs.in_flight(video_id):
+        time.sleep(0.01)
+    threads[1].start()
+    time.sleep(0.2)  # let the second job reach the in-flight analysis
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fake_openai.analyze_calls == 1
+    assert results == [{'status': 'ready', 'moments': 1}] * 2
+    assert Moment.query.filter_by(video_id=video_id).count() == 1
+
+
+def found_moments(count, tag='new'):
+    """count analysis results, titled with a tag"""
+    return [{
+        'start_time': i * 10.0,
+        'end_time': i * 10.0 + 5,
+        'title': f'{tag} {i}',
+        'description': 'Description',
+        'reason': 'Reason',
+        'score': 0.5
+    } for i in range(count)]
+
+
+def test_analysis_inserts_moments_in_one_statement(client, fake_mux, fake_openai):
+    """One bulk INSERT; the result comes from the inserted rows, not a reload"""
+    video = Video(asset_id='asset_1', status='analyzing', duration=7200.0)
+    db.session.add(video)
+    db.session.commit()
+
+    fake_openai.moments = found_moments(200)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if 'moments' in statement:
+            statements.append(' '.join(statement.split()))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = VideoProcessor(fake_mux, fake_openai).run_analysis_job({'video_id': video.id})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert result == {'status': 'ready', 'moments': 200}
+    assert len([s for s in statements if s.startswith('INSERT INTO moments')]) == 1
+    assert not [s for s in statements if s.startswith('SELECT') and 'FROM moments' in s]
+    stored = Moment.query.filter_by(video_id=video.id).order_by(Moment.id).all()
+    assert [m.title for m in stored] == [f'new {i}' for i in range(200)]
+    assert stored[0].created_at is not None and stored[0].score == 0.5
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_reanalysis_replaces_earlier_moments(client, fake_mux, fake_openai, monkeypatch, returning):
+    """Earlier moments are removed with the new moments stored; clipped ones stay"""
+    monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', returning)
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+
+    processor = VideoProcessor(fake_mux, fake_openai)
+    fake_openai.moments = found_moments(3, 'old')
+    processor.run_analysis_job({'video_id': video_id})
+    old = Moment.query.filter_by(video_id=video_id).order_by(Moment.id).first()
+    db.session.add(Clip(moment_id=old.id, asset_id='clip_1', playback_id='cp_1', status='ready'))
+    db.session.commit()
+
+    fake_openai.moments = found_moments(2)
+    result = processor.run_analysis_job({'video_id': video_id})
+
+    assert result == {'status': 'ready', 'moments': 2}
+    db.session.expire_all()
+    titles = [m.title for m in Moment.query.filter_by(video_id=video_id).order_by(Moment.id)]
+    assert titles == ['old 0', 'new 0', 'new 1']
+    clip = Clip.query.one()
+    assert (clip.moment_id, clip.status, clip.playback_id) == (old.id, 'ready', 'cp_1')
+
+
+def test_failed_reanalysis_keeps_earlier_moments(client, fake_mux, fake_openai):
+    """Replacement is atomic: a failure before commit leaves the old analysis"""
+    video = Video(asset_id='asset_1', status='analyzing', duration=120.0)
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+    fake_openai.moments = found_moments(3, 'old')
+    VideoProcessor(fake_mux, fake_openai).run_analysis_job({'video_id': video_id})
+
+    class BrokenQueue:
+        def enqueue(self, *args, **kwargs):
+            raise RuntimeError('queue unavailable')
+
+    fake_openai.moments = found_moments(2)
+    processor = VideoProcessor(fake_mux, fake_openai, job_queue=BrokenQueue())
+    with pytest.raises(RuntimeError):
+        processor.run_analysis_job({'video_id': video_id})
+    db.session.rollback()
+
+    titles = [m.title for m in Moment.query.filter_by(video_id=video_id).order_by(Moment.id)]
+    assert titles == ['old 0', 'old 1', 'old 2']
+
+
+def test_webhooks_drive_upload_to_analysis(client):
+    """Upload, asset and track webhooks queue analysis without a client call"""
+    video = Video(upload_id='upload_1', status='waiting_for_upload')
+    db.session.add(video)
+    db.session.commit()
+    video_id = video.id
+
+    def post(event_type, data):
+        response = client.post('/api/webhooks/mux', json={'type': event_type, 'data': data})
+        assert response.status_code == 200
+        webhook_inbox.drain()
+        return reload(Video, video_id)
+
+    video = post('video.upload.asset_created', {'id': 'upload_1', 'asset_id': 'asset_1'})
+    assert (video.asset_id, video.status) == ('asset_1', 'processing')
+
+    video = post('video.asset.ready', {
+        'id': 'asset_1', 'status': 'ready', 'duration': 95.0,
+        'playback_ids': [{'id': 'play_1'}],
+        'tracks': [{'type': 'video'}, {'type': 'text', 'status': 'preparing'}]
+    })
+    assert (video.status, video.duration, video.playback_id) == ('transcribing', 95.0, 'play_1')
+    assert Job.query.filter_by(kind='analyze_video').count() == 0
+
+    track = {'id': 'track_1', 'type': 'text', 'status': 'ready', 'asset_id': 'asset_1'}
+    video = post('video.asset.track.ready', track)
+    assert video.status == 'analyzing'
+    job = Job.query.filter_by(kind='analyze_video').one()
+
+    # A repeated event joins the queued job
+    post('video.asset.track.ready', track)
+    assert Job.query.filter_by(kind='analyze_video').count() == 1
+
+
+def test_track_ready_wakes_waiting_job(client):
+    """A job sleeping until the transcript is ready is moved up"""
+    video = Video(asset_id='asset_1', status='processing')
+    db.session.add(video)
+    db.session.commit()
+    job_id, _ = video_processor.request_analysis(video.id)
+
+    job = db.session.get(Job, job_id)
+    job.run_at = datetime.utcnow() + timedelta(seconds=60)
+    video = db.session.get(Video, video.id)
+    video.status = 'transcribing'
+    db.session.commit()
+
+    client.post('/api/webhooks/mux', json={
+        'type': 'video.asset.track.ready',
+        'data': {'type': 'text', 'status': 'ready', 'asset_id': 'asset_1'}
+    })
+    webhook_inbox.drain()
+
+    assert reload(Job, job_id).run_at <= datetime.utcnow()
+    assert Job.query.filter_by(kind='analyze_video').count() == 1
+
+
+def test_webhooks_leave_finished_videos_alone(client):
+    """Analyzed videos aren't re-analyzed; a failed text track fails the video"""
+    ready = Video(asset_id='asset_1', status='ready')
+    waiting = Video(asset_id='asset_2', status='transcribing')
+    db.session.add_all([ready, waiting])
+    db.session.commit()
+
+    for asset_id in ('asset_1', 'asset_2'):
+        client.post('/api/webhooks/mux', json={
+            'type': 'video.asset.track.errored',
+            'data': {'type': 'text', 'status': 'errored', 'asset_id': asset_id}
+        })
+    client.post('/api/webhooks/mux', json={
+        'type': 'video.asset.track.ready',
+        'data': {'type': 'text', 'status': 'ready', 'asset_id': 'asset_1'}
+    })
+    webhook_inbox.drain()
+
+    assert reload(Video, ready.id).status == 'ready'
+    assert reload(Video, waiting.id).status == 'error'
+    assert Job.query.filter_by(kind='analyze_video').count() == 0
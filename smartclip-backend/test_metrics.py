@@ -0,0 +1,106 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import json
+from types import SimpleNamespace
+
+import openai
+
+from app import db, mux_service, openai_service, video_reconciler, webhook_inbox
+from benchmarks.fake_upstreams import FakeUpstreams
+from database import Video
+from services.http_transport import HttpTransport
+from services.metrics import Registry
+from services.mux_service import MuxService
+from services.openai_service import OpenAIService
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in the exposition text, or None"""
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f"{name}{{{wanted}}} " if labels else f"{name} "
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+def test_histogram_exposition():
+    """Buckets are cumulative and end with +Inf, _count and _sum"""
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, route='/a')
+
+    text = registry.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'latency_seconds_bucket', route='/a', le='0.1') == 1
+    assert sample(text, 'latency_seconds_bucket', route='/a', le='1') == 2
+    assert sample(text, 'latency_seconds_bucket', route='/a', le='+Inf') == 3
+    assert sample(text, 'latency_seconds_count', route='/a') == 3
+    assert sample(text, 'latency_seconds_sum', route='/a') == 5.55
+
+
+def test_metrics_endpoint(client):
+    """Routes, database queries and videos per status are exported"""
+    db.session.add_all([Video(status='ready'), Video(status='ready'), Video(status='error')])
+    db.session.commit()
+    client.get('/api/videos/999')
+
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert sample(text, 'smartclip_http_request_seconds_count',
+                  method='GET', route='/api/videos/<int:video_id>', status='404') >= 1
+    assert sample(text, 'smartclip_db_query_seconds_count', operation='SELECT') >= 1
+    assert sample(text, 'smartclip_videos', status='ready') == 2
+    assert sample(text, 'smartclip_videos', status='error') == 1
+
+
+def test_service_stats_are_exported(client, monkeypatch):
+    """Cache, refresh and webhook inbox counters are read from the services when scraped"""
+    monkeypatch.setattr(mux_service.asset_cache, 'hits', 3)
+    monkeypatch.setattr(video_reconciler, 'writes', 2)
+    webhook_inbox.append({'id': 'evt_1', 'type': 'video.asset.ready', 'data': {'id': 'asset_1'}})
+
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE smartclip_asset_cache_lookups_total counter' in text
+    assert sample(text, 'smartclip_asset_cache_lookups_total', result='hit') == 3
+    assert sample(text, 'smartclip_asset_cache_entries') is not None
+    assert sample(text, 'smartclip_video_refreshes_total', outcome='written') == 2
+    assert sample(text, 'smartclip_webhook_events', status='pending') == 1
+    if openai_service.cache is not None:
+        assert sample(text, 'smartclip_analysis_cache_lookups_total', result='miss') is not None
+
+
+def test_upstream_calls_are_timed(client, monkeypatch):
+    """Mux calls are labelled by endpoint template, OpenAI calls by method with token counts"""
+    server = FakeUpstreams().start()
+    try:
+        mux = MuxService('id', 'secret', base_url=server.url, transport=HttpTransport(upstream='mux'))
+        asset = server.add_asset()
+        mux.get_asset(asset['id'], use_cache=False)
+    finally:
+        server.stop()
+
+    def create(**kwargs):
+        content = json.dumps({'caption': 'Hi', 'hashtags': ['a']})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+        )
+
+    monkeypatch.setattr(openai.chat.completions, 'create', create)
+    OpenAIService(api_key='test').generate_social_caption('t', 'd')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'smartclip_upstream_request_seconds_count',
+                  upstream='mux', endpoint='GET /video/v1/assets/{id}', outcome='ok') >= 1
+    assert sample(text, 'smartclip_upstream_request_seconds_count',
+                  upstream='openai', endpoint='caption', outcome='ok') >= 1
+    assert sample(text, 'smartclip_openai_tokens_total', method='caption', type='prompt') >= 120
@@ -0,0 +1,164 @@
+"""
+Tests for MuxService and its HTTP transport against a local fake Mux server
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.http_transport import HttpTransport
+from services.mux_service import MuxService
+
+
+class FakeMuxHandler(BaseHTTPRequestHandler):
+    """Serves scripted responses and records every request"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        server.requests.append((self.command, self.path, self.client_address[1]))
+
+        scripted = server.scripts.get((self.command, self.path), [])
+        if scripted:
+            status, headers, body = scripted.pop(0)
+        else:
+            status, headers, body = 200, {}, {'data': {'id': self.path.rsplit('/', 1)[-1]}}
+
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _respond
+    do_POST = _respond
+    do_DELETE = _respond
+
+
+@pytest.fixture
+def fake_mux():
+    """Run a fake Mux API on a random local port"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMuxHandler)
+    server.requests = []
+    server.scripts = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mux(fake_mux):
+    """MuxService pointed at the fake server, with instant backoff"""
+    transport = HttpTransport(pool_size=2, max_retries=3, sleep=lambda delay: None)
+    service = MuxService('token', 'secret', transport=transport,
+                         base_url=fake_mux.url, stream_url=fake_mux.url)
+    yield service
+    transport.close()
+
+
+def test_get_asset_reuses_connection(fake_mux, mux):
+    """Sequential calls share one keep-alive connection"""
+    mux.get_asset('asset_1')
+    mux.get_asset('asset_2')
+    mux.get_upload('upload_1')
+
+    client_ports = {port for _, _, port in fake_mux.requests}
+    assert len(fake_mux.requests) == 3
+    assert len(client_ports) == 1
+
+
+def test_retries_server_errors_on_get(fake_mux, mux):
+    """GET requests are retried on 5xx until they succeed"""
+    fake_mux.scripts[('GET', '/video/v1/assets/abc')] = [
+        (503, {}, {'error': 'unavailable'}),
+        (502, {}, {'error': 'bad gateway'}),
+    ]
+
+    asset = mux.get_asset('abc')
+
+    assert asset['id'] == 'abc'
+    assert len(fake_mux.requests) == 3
+    stats = mux.transport.stats()['GET /video/v1/assets/{id}']
+    assert stats['calls'] == 1
+    assert stats['retries'] == 2
+    assert stats['errors'] == 0
+
+
+def test_honours_retry_after_on_429(fake_mux):
+    """Retry-After overrides the computed backoff"""
+    delays = []
+    transport = HttpTransport(max_retries=2, sleep=delays.append)
+    service = MuxService('token', 'secret', transport=transport, base_url=fake_mux.url)
+    fake_mux.scripts[('POST', '/video/v1/assets')] = [
+        (429, {'Retry-After': '7'}, {'error': 'rate limited'}),
+    ]
+
+    clip = service.create_clip('source', 1.0, 11.0)
+
+    assert clip['id'] == 'assets'
+    assert delays == [7.0]
+
+
+def test_does_not_retry_post_on_server_error(fake_mux, mux):
+    """Non-idempotent requests are not resent after a 5xx"""
+    fake_mux.scripts[('POST', '/video/v1/assets')] = [
+        (500, {}, {'error': 'boom'}),
+    ]
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        mux.create_clip('source', 1.0, 11.0)
+
+    assert len(fake_mux.requests) == 1
+    assert mux.transport.stats()['POST /video/v1/assets']['errors'] == 1
+
+
+def test_gives_up_after_max_retries(fake_mux, mux):
+    """Persistent failures surface after the retry budget is spent"""
+    fake_mux.scripts[('GET', '/video/v1/uploads/u1')] = [(503, {}, {})] * 10
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        mux.get_upload('u1')
+
+    assert len(fake_mux.requests) == 4
+
+
+def test_get_transcript_uses_stream_host(fake_mux, mux):
+    """The VTT download goes through the pooled transport"""
+    fake_mux.scripts[('GET', '/video/v1/assets/a1')] = [(200, {}, {'data': {
+        'id': 'a1',
+        'playback_ids': [{'id': 'p1'}],
+        'tracks': [{'id': 't1', 'type': 'text', 'text_type': 'subtitles', 'status': 'ready'}]
+    }})]
+    fake_mux.scripts[('GET', '/p1/text/t1.vtt')] = [(200, {}, (
+        b"WEBVTT\n\n00:00:01.000 --> 00:00:04.000\nHello there\n"
+    ))]
+
+    transcript = mux.get_transcript('a1')
+
+    assert transcript == '[00:00:01.000] Hello there'
+    assert 'GET /{playback_id}/text/{track_id}.vtt' in mux.transport.stats()
+
+
+def test_parse_vtt_keeps_cue_end_times(mux):
+    """VTT cues keep their end times and drop cue settings and voice tags"""
+    cues = mux._parse_vtt_cues(
+        "WEBVTT\n\n1\n00:00:01.000 --> 00:00:04.500 align:start\n<v Speaker>Hello\nthere</v>\n\n"
+        "2\n01:02.000 --> 01:05.250\nWorld\n"
+    )
+
+    assert list(cues) == [(1.0, 4.5, 'Hello there'), (62.0, 65.25, 'World')]
@@ -5,8 +5,10 @@ Tests the analyze_transcript method with sample text or real video
 
 import os
 import sys
+import threading
+import time
 from dotenv import load_dotenv
-from services.openai_service import OpenAIService
+from services.openai_service import OpenAIService, parse_transcript_segments, split_windows, merge_moments
 from services.mux_service import MuxService
 from database import db, Video, Moment
 from flask import Flask
@@ -228,6 +230,85 @@ def test_video_moments(video_id):
             print("- Ensure you have internet connectivity")
 
 
+def make_transcript(duration, step=10):
+    """Formatted transcript with a cue every step seconds"""
+    parts = []
+    for start in range(0, duration, step):
+        hours, rem = divmod(start, 3600)
+        minutes, seconds = divmod(rem, 60)
+        parts.append(f"[{hours:02d}:{minutes:02d}:{seconds:02d}.000] Line at {start}")
+    return '\n\n'.join(parts)
+
+
+def test_parse_transcript_segments():
+    """Formatted transcripts parse into (seconds, text) cues"""
+    segments = parse_transcript_segments("[00:00:01.500] Hello\n\n[01:02:03.000] World")
+    assert segments == [(1.5, 'Hello'), (3723.0, 'World')]
+
+
+def test_split_windows_overlap_on_cue_boundaries():
+    """Windows cover every cue, start on cues and share the overlap"""
+    segments = parse_transcript_segments(make_transcript(1800))
+    windows = split_windows(segments, window_seconds=600, overlap_seconds=60)
+
+    starts = [w[0] for w in windows]
+    assert starts[0] == 0
+    assert all(start in {s for s, _ in segments} for start in starts)
+    for (prev_start, prev_end, _), (start, _, _) in zip(windows, windows[1:]):
+        assert start < prev_end
+        assert prev_end - start >= 60
+    assert 'Line at 1790' in windows[-1][2]
+
+
+def test_merge_moments_drops_duplicates():
+    """Moments reported by two overlapping windows are merged"""
+    candidates = [
+        {'start_time': 100, 'end_time': 140, 'score': 0.7},
+        {'start_time': 105, 'end_time': 140, 'score': 0.9},
+        {'start_time': 500, 'end_time': 530, 'score': 0.8},
+    ]
+    merged = merge_moments(candidates, limit=5)
+    assert [m['score'] for m in merged] == [0.9, 0.8]
+
+
+def test_long_transcript_is_analyzed_in_parallel_windows():
+    """Long transcripts fan out over windows under the concurrency limit"""
+    service = OpenAIService(api_key='test', chunk_threshold=1200, window_seconds=600,
+                            window_overlap=60, max_concurrency=2, moments_limit=3)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_request(text, video_duration=None, window=None):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+        start = window[0]
+        return [{'start_time': start + 10, 'end_time': start + 40, 'title': 't',
+                 'description': 'd', 'reason': 'r', 'score': start / 10000}]
+
+    service._request_moments = fake_request
+    moments = service.analyze_transcript(make_transcript(3600), video_duration=3600)
+
+    assert len(moments) == 3
+    assert max(peak) <= 2
+    assert moments[0]['score'] >= moments[1]['score'] >= moments[2]['score']
+
+
+def test_short_transcript_uses_single_prompt():
+    """Short transcripts keep the single-prompt path"""
+    service = OpenAIService(api_key='test', chunk_threshold=1200)
+    calls = []
+    service._request_moments = lambda text, video_duration=None, window=None: calls.append(window) or []
+
+    service.analyze_transcript(make_transcript(300), video_duration=300)
+
+    assert calls == [None]
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         # Test with video ID from command line
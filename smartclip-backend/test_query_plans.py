@@ -0,0 +1,158 @@
+"""
+Query-plan regression tests for the hot read and webhook paths
+
+Each path runs for real with its statements recorded, then every recorded
+SELECT/UPDATE/DELETE is EXPLAINed. A plan that reads a whole table fails:
+on SQLite a bare "SCAN <table>", on Postgres any "Seq Scan" once sequential
+scans are disabled (so tiny test tables still show which indexes are
+usable). Runs on SQLite by default; set DATABASE_URL to a Postgres database
+to check its plans. Other databases are skipped.
+"""
+
+import json
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db, video_processor, job_queue, clip_reconciler, count_videos_by_status
+from database import upgrade_schema, Video, Moment, Clip
+from services.cue_store import CueStore
+from services.pagination import encode_cursor
+
+
+@pytest.fixture
+def seeded(client):
+    """A ready video with a transcript, moments and clips (one still processing)"""
+    video = Video(upload_id='upload_1', asset_id='asset_1', playback_id='play_1', status='ready', duration=600.0)
+    video.transcript = 'hello'
+    video.cues = CueStore.from_cues([(0, 5, 'hello')]).to_bytes()
+    db.session.add(video)
+    db.session.commit()
+    for i in range(3):
+        moment = Moment(video_id=video.id, start_time=i * 60, end_time=i * 60 + 30, title=f'm{i}')
+        moment.clips = [Clip(asset_id=f'clip_{i}', status='processing' if i == 0 else 'ready')]
+        db.session.add(moment)
+    db.session.commit()
+    clip = Clip.query.first()
+    return {'video': video.id, 'clip': clip.id, 'created_at': video.created_at}
+
+
+HOT_PATHS = {
+    'list_videos': lambda c, ids: c.get('/api/videos'),
+    'list_videos_next_page': lambda c, ids: c.get(
+        f"/api/videos?cursor={encode_cursor(ids['created_at'], ids['video'] + 1)}"
+    ),
+    'list_videos_with_transcripts': lambda c, ids: c.get('/api/videos?fields=id,transcript'),
+    'get_video': lambda c, ids: c.get(f"/api/videos/{ids['video']}"),
+    'video_status': lambda c, ids: c.get(f"/api/videos/{ids['video']}/status"),
+    'get_moments': lambda c, ids: c.get(f"/api/videos/{ids['video']}/moments"),
+    'video_bundle': lambda c, ids: c.get(f"/api/videos/{ids['video']}/bundle"),
+    'transcript': lambda c, ids: c.get(f"/api/videos/{ids['video']}/transcript"),
+    'get_clip': lambda c, ids: c.get(f"/api/clips/{ids['clip']}"),
+    'webhook_upload_asset_created': lambda c, ids: video_processor.handle_webhook(
+        'video.upload.asset_created', {'id': 'upload_1', 'asset_id': 'asset_1'}
+    ),
+    'webhook_clip_ready': lambda c, ids: video_processor.handle_webhook(
+        'video.asset.ready', {'id': 'clip_missing'}
+    ),
+    'webhook_clip_errored': lambda c, ids: video_processor.handle_webhook(
+        'video.asset.errored', {'id': 'clip_missing'}
+    ),
+    'clip_reconciler': lambda c, ids: clip_reconciler.run_once(),
+    'clip_reconciler_new_clips': lambda c, ids: clip_reconciler.newest_processing_id(),
+    'videos_gauge': lambda c, ids: count_videos_by_status(),
+    'job_dedupe': lambda c, ids: job_queue.find_active('analyze_video', f"video:{ids['video']}"),
+}
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def record(run):
+    """Statements (with parameters) sent while run() executes"""
+    sent = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip()[:6].upper() in EXPLAINED:
+            sent.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before)
+    return sent
+
+
+def sqlite_plan(conn, statement, parameters):
+    return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+
+
+def postgres_plan(conn, statement, parameters):
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes, stack = [], [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get('Plans', []))
+    return nodes
+
+
+def full_scans(statement, parameters):
+    """Tables the statement's plan reads in full"""
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        if dialect == 'sqlite':
+            details = sqlite_plan(conn, statement, parameters)
+            return {match.group(1) for match in (re.match(r'SCAN (?:TABLE )?(\w+)$', d) for d in details) if match}
+        if dialect == 'postgresql':
+            nodes = postgres_plan(conn, statement, parameters)
+            return {node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'}
+    pytest.skip(f'No plan checks for {dialect}')
+
+
+@pytest.mark.parametrize('path', sorted(HOT_PATHS))
+def test_hot_path_uses_indexes(client, seeded, path, monkeypatch, fake_mux):
+    """No hot query reads a whole table"""
+    monkeypatch.setattr(clip_reconciler, 'mux_service', fake_mux)  # clip assets still preparing
+    statements = record(lambda: HOT_PATHS[path](client, seeded))
+    assert statements
+
+    problems = []
+    for statement, parameters in statements:
+        scans = full_scans(statement, parameters)
+        if scans:
+            problems.append(f"full scan of {', '.join(sorted(scans))}: {' '.join(statement.split())[:200]}")
+    assert not problems, '\n'.join(problems)
+
+
+@pytest.mark.parametrize('path', ['list_videos', 'list_videos_next_page'])
+def test_video_list_pages_in_index_order(client, seeded, path):
+    """List pages are read in index order, not sorted after filtering"""
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('SQLite plan text')
+
+    statements = record(lambda: HOT_PATHS[path](client, seeded))
+    page_query = next(s for s in statements if 'ORDER BY videos.created_at DESC' in s[0])
+    with db.engine.connect() as conn:
+        details = sqlite_plan(conn, *page_query)
+
+    assert any('ix_videos_created_at_id_status' in d for d in details), details
+    assert not any('TEMP B-TREE' in d for d in details), details
+
+
+def test_upgrade_schema_adds_missing_indexes(client):
+    """Existing databases get the new indexes from upgrade_schema"""
+    for name in ('ix_moments_video_id_start_time', 'ix_clips_moment_id', 'ix_clips_status_id'):
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP INDEX {name}')
+
+    upgrade_schema()
+
+    inspector = db.inspect(db.engine)
+    assert 'ix_moments_video_id_start_time' in {i['name'] for i in inspector.get_indexes('moments')}
+    assert {'ix_clips_moment_id', 'ix_clips_status_id'} <= {i['name'] for i in inspector.get_indexes('clips')}
@@ -0,0 +1,126 @@
+"""
+Tests for the video reconciler
+"""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app import app, db
+from database import Video
+from services.reconciler import VideoReconciler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def updates():
+    """UPDATE statements sent to the database"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith('UPDATE videos'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def add_video(**fields):
+    video = Video(**fields)
+    db.session.add(video)
+    db.session.commit()
+    return video
+
+
+def test_refresh_updates_changed_fields(client, fake_mux):
+    """Upload, then asset details are pulled in once the asset exists"""
+    fake_mux.upload = {'status': 'asset_created', 'asset_id': 'asset_1'}
+    fake_mux.asset = {'status': 'preparing', 'duration': 12.0, 'playback_ids': [{'id': 'play_1'}]}
+    video = add_video(upload_id='upload_1', status='waiting_for_upload')
+
+    assert VideoReconciler(fake_mux).reconcile(video) is True
+
+    video = db.session.get(Video, video.id)
+    assert (video.asset_id, video.status) == ('asset_1', 'processing')
+    assert (video.duration, video.playback_id) == (12.0, 'play_1')
+
+
+def test_unchanged_refresh_does_not_write(client, updates, fake_mux):
+    """A refresh that learns nothing new skips the commit"""
+    fake_mux.asset = {'status': 'preparing'}
+    video = add_video(asset_id='asset_1', status='preparing')
+    clock = Clock()
+    reconciler = VideoReconciler(fake_mux, min_interval=5, clock=clock)
+
+    assert reconciler.reconcile(video) is False
+    clock.now = 10
+    assert reconciler.reconcile(video) is False
+
+    assert len(fake_mux.asset_calls) == 2
+    assert updates == []
+    assert reconciler.stats() == {'refreshes': 2, 'writes': 0}
+
+
+def test_min_interval_between_refreshes(client, fake_mux):
+    """Reads within the interval are served from the database"""
+    video = add_video(asset_id='asset_1', status='preparing')
+    clock = Clock()
+    reconciler = VideoReconciler(fake_mux, min_interval=5, clock=clock)
+
+    reconciler.reconcile(video)
+    clock.now = 4.9
+    reconciler.reconcile(video)
+    assert len(fake_mux.asset_calls) == 1
+
+    clock.now = 5
+    reconciler.reconcile(video)
+    assert len(fake_mux.asset_calls) == 2
+
+
+def test_settled_videos_are_not_refreshed(client, fake_mux):
+    """Pipeline-owned videos with playback ID and duration need no Mux call"""
+    video = add_video(asset_id='asset_1', status='ready', playback_id='p', duration=10.0)
+
+    VideoReconciler(fake_mux).reconcile(video)
+
+    assert fake_mux.asset_calls == []
+
+
+def test_concurrent_readers_share_one_refresh(client, fake_mux):
+    """N simultaneous polls of one video make one upstream call"""
+    release = threading.Event()
+    fake_mux.asset = {'status': 'ready', 'duration': 30.0}
+    fake_mux.hold = release
+    video_id = add_video(asset_id='asset_1', status='preparing').id
+    reconciler = VideoReconciler(fake_mux)
+    results = []
+
+    def read():
+        with app.app_context():
+            video = db.session.get(Video, video_id)
+            reconciler.reconcile(video)
+            results.append((video.status, video.duration))
+
+    threads = [threading.Thread(target=read) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not fake_mux.asset_calls:
+        time.sleep(0.01)
+    time.sleep(0.2)  # let the other readers join the refresh
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(fake_mux.asset_calls) == 1
+    assert results == [('ready', 30.0)] * 5
+    assert reconciler.stats()['writes'] == 1
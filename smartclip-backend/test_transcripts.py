@@ -0,0 +1,109 @@
+"""
+Tests for compressed transcript storage
+"""
+
+import threading
+import time
+
+import pytest
+
+from app import app, db
+from database import schema_lock, upgrade_schema, Video, VideoTranscript
+from services.cue_store import CueStore
+
+
+TRANSCRIPT = '\n\n'.join(f"[00:00:{i % 60:02d}.000] the same few words again {i}" for i in range(500))
+
+
+def add_video():
+    video = Video(asset_id='a1', playback_id='p1', status='ready', duration=60.0)
+    video.transcript = TRANSCRIPT
+    video.cues = CueStore.from_cues([(0, 5, 'a'), (5, 10, 'b')]).to_bytes()
+    db.session.add(video)
+    db.session.commit()
+    return video.id
+
+
+def test_transcript_is_compressed_and_round_trips(client):
+    """The accessors hide zlib compression"""
+    video_id = add_video()
+    db.session.expire_all()
+
+    record = db.session.get(VideoTranscript, video_id)
+    assert len(record.text_data) < len(TRANSCRIPT) / 5
+
+    video = db.session.get(Video, video_id)
+    assert video.transcript == TRANSCRIPT
+    assert CueStore.from_bytes(video.cues).cue(1) == (5.0, 10.0, 'b')
+
+
+def test_video_reads_do_not_load_transcripts(client, statements):
+    """Status reads touch only the narrow videos row"""
+    video_id = add_video()
+    db.session.expire_all()
+    statements.clear()
+
+    response = client.get(f'/api/videos/{video_id}/status')
+    assert response.status_code == 200
+    assert not any('video_transcripts' in statement for statement in statements)
+
+    statements.clear()
+    response = client.get('/api/videos?fields=id,transcript')
+    assert response.get_json()['videos'][0]['transcript'] == TRANSCRIPT
+    assert sum('video_transcripts' in statement for statement in statements) == 1
+
+
+def test_transcript_endpoint_reads_cues(client):
+    video_id = add_video()
+
+    cues = client.get(f'/api/videos/{video_id}/transcript').get_json()['cues']
+
+    assert [cue['text'] for cue in cues] == ['a', 'b']
+
+
+def test_legacy_columns_are_migrated(client):
+    """Transcripts stored on videos rows are copied to video_transcripts; columns go only when asked"""
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('ALTER TABLE videos ADD COLUMN transcript TEXT')
+        conn.exec_driver_sql('ALTER TABLE videos ADD COLUMN cues BLOB')
+        conn.exec_driver_sql(
+            "INSERT INTO videos (id, status, transcript, cues) VALUES (7, 'ready', 'old text', X'0102')"
+        )
+
+    upgrade_schema()
+    upgrade_schema()
+
+    video = db.session.get(Video, 7)
+    assert (video.transcript, video.cues) == ('old text', b'\x01\x02')
+    assert VideoTranscript.query.count() == 1
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('videos')}
+    assert {'transcript', 'cues'} <= columns
+
+    upgrade_schema(drop_legacy_columns=True)
+
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('videos')}
+    assert not columns & {'transcript', 'cues'}
+    db.session.expire_all()
+    assert db.session.get(Video, 7).transcript == 'old text'
+
+
+def test_schema_upgrades_take_turns(client):
+    """A second process's upgrade waits for the one in progress"""
+    if db.engine.url.database in (None, '', ':memory:'):
+        pytest.skip('In-memory databases are not locked')
+    started, finished = threading.Event(), []
+
+    def upgrade():
+        with app.app_context():
+            started.set()
+            upgrade_schema()
+            finished.append(True)
+
+    with schema_lock():
+        thread = threading.Thread(target=upgrade)
+        thread.start()
+        started.wait(5)
+        time.sleep(0.1)
+        assert not finished
+    thread.join(5)
+    assert finished
@@ -0,0 +1,67 @@
+"""
+Tests for the streaming WebVTT parser
+"""
+
+import pytest
+
+from services.vtt_parser import VttCue, iter_batches, parse_timestamp, parse_vtt
+
+SAMPLE = (
+    "\ufeffWEBVTT Kind: captions\n"
+    "Language: en\n"
+    "\n"
+    "STYLE\n"
+    "::cue { color: yellow }\n"
+    "\n"
+    "NOTE generated by\n"
+    "the speech recognizer\n"
+    "\n"
+    "intro-1\n"
+    "00:00:01.000 --> 00:00:04.500 align:start position:10%\n"
+    "<v.host Jane Doe>Welcome &amp; hello</v>\n"
+    "<i>second line</i> where 5 > 3\n"
+    "\n"
+    "01:02.250 --> 01:05.000\n"
+    "<c.yellow>Next</c> <00:01:03.000>cue\n"
+    "\n"
+    "bad\n"
+    "00:00:xx --> 00:00:10.000\n"
+    "dropped\n"
+)
+
+
+def test_parse_cues_with_full_fidelity():
+    """Identifiers, end times, settings and voices are kept, markup removed"""
+    cues = list(parse_vtt([SAMPLE]))
+
+    assert cues == [
+        VttCue('intro-1', 1.0, 4.5, 'align:start position:10%',
+               'Welcome & hello second line where 5 > 3', 'Jane Doe'),
+        VttCue(None, 62.25, 65.0, '', 'Next cue', None),
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64])
+def test_chunk_boundaries_do_not_matter(chunk_size):
+    """Streaming in any chunk size gives the same cues, CRLF included"""
+    text = SAMPLE.replace('\n', '\r\n')
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    assert list(parse_vtt(chunks)) == list(parse_vtt([SAMPLE]))
+
+
+def test_iter_batches_keeps_blocks_whole():
+    """Batches end on blank lines; all line terminators are normalized"""
+    chunks = ['a\r', '\nb\r', '\r', '\n\r\nc\n', 'd\n\n\ne']
+    assert list(iter_batches(chunks)) == ['a\nb', 'c\nd\n', 'e']
+
+
+def test_parse_timestamp():
+    """Hours are optional; malformed timestamps are rejected"""
+    assert parse_timestamp('01:02:03.004') == 3723.004
+    assert parse_timestamp('02:03.500') == 123.5
+    assert parse_timestamp('100:00:00.000') == 360000.0
+    with pytest.raises(ValueError):
+        parse_timestamp('1:2.5')
+    with pytest.raises(ValueError):
+        parse_timestamp('00:61:00.000')
@@ -0,0 +1,116 @@
+"""
+Tests for the webhook inbox
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, job_queue
+from database import Job, WebhookEvent
+from services.job_queue import RetryJob
+from services.webhook_inbox import WebhookInbox, DRAIN_JOB_KIND
+
+
+def recording_inbox(**kwargs):
+    """Inbox whose handler records the events it is given"""
+    applied = []
+
+    def handler(event_type, data):
+        applied.append((event_type, data.get('id')))
+
+    return WebhookInbox(handler, **kwargs), applied
+
+
+def event(event_id, event_type, object_id, **data):
+    return {'id': event_id, 'type': event_type, 'data': {'id': object_id, **data}}
+
+
+def test_webhook_is_stored_and_drain_queued(client):
+    """The endpoint acknowledges after storing the event and queueing one drain"""
+    for event_id in ('e1', 'e2'):
+        response = client.post('/api/webhooks/mux', json=event(event_id, 'video.asset.created', 'a1'))
+        assert response.status_code == 200
+
+    assert WebhookEvent.query.filter_by(status='pending').count() == 2
+    assert Job.query.filter_by(kind=DRAIN_JOB_KIND, status='queued').count() == 1
+
+
+def test_redelivered_event_is_dropped(client):
+    """The Mux event ID dedupes redeliveries"""
+    inbox, applied = recording_inbox()
+
+    assert inbox.append(event('e1', 'video.asset.ready', 'a1')) is True
+    assert inbox.append(event('e1', 'video.asset.ready', 'a1')) is False
+    inbox.drain()
+
+    assert applied == [('video.asset.ready', 'a1')]
+    assert inbox.append(event('e1', 'video.asset.ready', 'a1')) is False
+
+
+def test_superseded_events_are_collapsed(client):
+    """Only the newest event of a type per object is applied, in arrival order"""
+    inbox, applied = recording_inbox()
+    inbox.append(event('e1', 'video.asset.ready', 'a1', duration=1))
+    inbox.append(event('e2', 'video.asset.track.ready', 't1', asset_id='a1'))
+    inbox.append(event('e3', 'video.asset.ready', 'a2'))
+    inbox.append(event('e4', 'video.asset.ready', 'a1', duration=2))
+
+    counts = inbox.drain()
+
+    assert counts == {'applied': 3, 'superseded': 1, 'retried': 0, 'failed': 0}
+    assert applied == [
+        ('video.asset.track.ready', 't1'),
+        ('video.asset.ready', 'a2'),
+        ('video.asset.ready', 'a1')
+    ]
+    assert WebhookEvent.query.filter_by(event_id='e1').one().status == 'superseded'
+
+
+def test_batches_are_leased(client):
+    """A batch claimed by one drain isn't applied by another until its lease lapses"""
+    inbox, applied = recording_inbox(batch_size=1)
+    inbox.append(event('e1', 'video.asset.ready', 'a1'))
+
+    assert len(inbox._claim('crashed-drain')) == 1
+    assert inbox.drain()['applied'] == 0
+
+    WebhookEvent.query.filter_by(event_id='e1').update(
+        {'locked_until': datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.session.commit()
+
+    assert inbox.drain()['applied'] == 1
+    assert WebhookEvent.query.one().attempts == 2
+
+
+def test_failing_event_is_retried_then_failed(client):
+    """Handler errors are retried after the delay, up to max_attempts"""
+    calls = []
+
+    def handler(event_type, data):
+        calls.append(data['id'])
+        raise RuntimeError('boom')
+
+    inbox = WebhookInbox(handler, max_attempts=2, retry_delay=0)
+    inbox.append(event('e1', 'video.asset.ready', 'a1'))
+
+    with pytest.raises(RetryJob):
+        inbox.drain()
+    assert inbox.drain()['failed'] == 1
+
+    stored = WebhookEvent.query.one()
+    assert (stored.status, stored.attempts, stored.last_error) == ('failed', 2, 'boom')
+    assert calls == ['a1', 'a1']
+
+
+def test_retry_waits_for_delay(client):
+    """A failed event isn't claimed again before retry_delay"""
+    inbox = WebhookInbox(lambda event_type, data: 1 / 0, retry_delay=60)
+    inbox.append(event('e1', 'video.asset.ready', 'a1'))
+
+    with pytest.raises(RetryJob) as excinfo:
+        inbox.drain()
+
+    assert excinfo.value.delay == 60
+    assert inbox._claim('other') == []
@@ -0,0 +1,37 @@
+"""
+Run SmartClip background job workers in a dedicated process
+
+Use with JOB_WORKERS_ENABLED=false on the web processes so analysis never
+competes with request handling for CPU or database connections.
+"""
+
+import os
+import signal
+import threading
+
+# The web app must not start its own pool in this process
+os.environ['JOB_WORKERS_ENABLED'] = 'false'
+
+from app import app, worker_pool, clip_reconciler, logger
+
+
+def main():
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        logger.info("Stopping job workers...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    worker_pool.start()
+    clip_reconciler.start()
+    logger.info(f"Job workers running (concurrency={app.config['JOB_WORKER_CONCURRENCY']})")
+    stop.wait()
+    clip_reconciler.stop(timeout=5)
+    worker_pool.stop(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
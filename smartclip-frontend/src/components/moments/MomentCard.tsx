@@ -1,52 +1,93 @@
-import { useState } from 'react';
+import { useCallback, useEffect, useState } from 'react';
 import { Play, Loader2, Download, Sparkles } from 'lucide-react';
-import type { Moment } from '../../types';
+import type { Moment, Clip } from '../../types';
 import { formatTime, getClipDuration, getEngagementColor } from '../../utils/helpers';
 import { apiService } from '../../services/api';
+import { APP_CONFIG, CLIP_FAILED_STATUSES } from '../../utils/config';
 
 interface MomentCardProps {
   moment: Moment;
   onPreview: (moment: Moment) => void;
+  liveUpdates?: boolean; // clip updates arrive via clipUpdate; polling is only a fallback
+  clipUpdate?: Clip;
 }
 
-export const MomentCard = ({ moment, onPreview }: MomentCardProps) => {
+export const MomentCard = ({ moment, onPreview, liveUpdates = false, clipUpdate }: MomentCardProps) => {
   const [isCreatingClip, setIsCreatingClip] = useState(false);
-  const [clipUrl, setClipUrl] = useState<string | null>(null);
+  // The clip being created, until it is ready or has failed
+  const [pendingClipId, setPendingClipId] = useState<string | null>(null);
+  // A clip made on an earlier visit comes with the moment
+  const [clipUrl, setClipUrl] = useState<string | null>(
+    moment.clips?.find((clip) => clip.status === 'ready' && clip.downloadUrl)?.downloadUrl ?? null
+  );
   const [error, setError] = useState<string | null>(null);
 
   const duration = getClipDuration(moment.startTime, moment.endTime);
 
+  // Apply a clip's status; true once it is settled
+  const settleClip = useCallback((clip: Clip) => {
+    if (clip.status === 'ready' && clip.downloadUrl) {
+      setClipUrl(clip.downloadUrl);
+    } else if (CLIP_FAILED_STATUSES.includes(clip.status)) {
+      setError('Failed to create clip');
+    } else {
+      return false;
+    }
+    setPendingClipId(null);
+    setIsCreatingClip(false);
+    return true;
+  }, []);
+
+  // Clip status pushed over the video's event stream
+  useEffect(() => {
+    if (clipUpdate && clipUpdate.id === pendingClipId) {
+      settleClip(clipUpdate);
+    }
+  }, [clipUpdate, pendingClipId, settleClip]);
+
+  // Poll for clip status: right away without live updates, otherwise as a
+  // fallback once the pushed update is late or the stream has dropped
+  useEffect(() => {
+    if (!pendingClipId) return;
+
+    let cancelled = false;
+    let attempts = 0;
+    let timer: ReturnType<typeof setTimeout>;
+
+    const pollClip = async () => {
+      if (attempts >= APP_CONFIG.maxClipPollAttempts) {
+        setError('Clip creation is taking longer than expected');
+        setPendingClipId(null);
+        setIsCreatingClip(false);
+        return;
+      }
+
+      try {
+        const { clip } = await apiService.getClip(pendingClipId);
+        if (cancelled || settleClip(clip)) return;
+      } catch (err) {
+        if (cancelled) return;
+      }
+      attempts++;
+      timer = setTimeout(pollClip, APP_CONFIG.clipPollInterval);
+    };
+
+    timer = setTimeout(pollClip, liveUpdates ? APP_CONFIG.clipEventTimeout : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [pendingClipId, liveUpdates, settleClip]);
+
   const handleCreateClip = async () => {
     setIsCreatingClip(true);
     setError(null);
 
     try {
       const { clip } = await apiService.createClip(moment.id);
-      
-      // Poll for clip status
-      let attempts = 0;
-      const pollClip = async () => {
-        if (attempts >= 30) {
-          setError('Clip creation is taking longer than expected');
-          setIsCreatingClip(false);
-          return;
-        }
-
-        const { clip: updatedClip } = await apiService.getClip(clip.id);
-        
-        if (updatedClip.status === 'ready') {
-          setClipUrl(updatedClip.downloadUrl);
-          setIsCreatingClip(false);
-        } else if (updatedClip.status === 'failed') {
-          setError('Failed to create clip');
-          setIsCreatingClip(false);
-        } else {
-          attempts++;
-          setTimeout(pollClip, 2000);
-        }
-      };
-
-      pollClip();
+      if (!settleClip(clip)) {
+        setPendingClipId(clip.id);
+      }
     } catch (err) {
       setError('Failed to create clip. Please try again.');
       setIsCreatingClip(false);
@@ -3,8 +3,8 @@ import { useParams, Link } from 'react-router-dom';
 import { Loader2, AlertCircle, CheckCircle, Sparkles, ArrowLeft, Clock, Video as VideoIcon, Play } from 'lucide-react';
 import MuxPlayer from '@mux/mux-player-react';
 import { apiService } from '../services/api';
-import type { Video, Moment } from '../types';
-import { APP_CONFIG } from '../utils/config';
+import type { Video, Moment, Clip } from '../types';
+import { APP_CONFIG, VIDEO_FAILED_STATUSES } from '../utils/config';
 import { MomentCard } from '../components/moments/MomentCard';
 
 export const VideoPage = () => {
@@ -16,22 +16,84 @@ export const VideoPage = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [pollCount, setPollCount] = useState(0);
+  const [liveUpdates, setLiveUpdates] = useState(typeof EventSource !== 'undefined');
+  const [clipsByMoment, setClipsByMoment] = useState<Record<string, Clip>>({});
+  // False while the event stream is reconnecting; clip cards poll meanwhile
+  const [streamConnected, setStreamConnected] = useState(true);
 
-  // Poll for video status
+  // Live status updates pushed by the server
   useEffect(() => {
-    if (!videoId) return;
+    if (!videoId || !liveUpdates) return;
+
+    let connected = false;
+    let lastStatus: string | null = null;
+
+    const loadVideo = async () => {
+      try {
+        const { video: videoData, moments: momentsData } = await apiService.getVideoBundle(videoId);
+        lastStatus = videoData.status;
+        setVideo(videoData);
+
+        if (videoData.status === 'ready') {
+          setMoments(momentsData);
+          setLoading(false);
+        } else if (VIDEO_FAILED_STATUSES.includes(videoData.status)) {
+          setError(videoData.errorMessage || 'Video processing failed. Please try uploading again.');
+          setLoading(false);
+        }
+      } catch (err) {
+        setError('Failed to load video. Please try again.');
+        setLoading(false);
+      }
+    };
+
+    loadVideo();
+
+    const unsubscribe = apiService.subscribeToVideoEvents(videoId, {
+      onOpen: () => {
+        connected = true;
+        setStreamConnected(true);
+      },
+      onStatus: (event) => {
+        setVideo((current) =>
+          current ? { ...current, status: event.status, errorMessage: event.errorMessage } : current
+        );
+        if (event.status !== lastStatus && ['ready', ...VIDEO_FAILED_STATUSES].includes(event.status)) {
+          loadVideo();
+        }
+        lastStatus = event.status;
+      },
+      onClip: (clip) => {
+        setClipsByMoment((current) => ({ ...current, [clip.momentId]: clip }));
+      },
+      onError: () => {
+        // The browser reconnects on its own once a stream has been open;
+        // if it never opened, fall back to polling
+        setStreamConnected(false);
+        if (!connected) {
+          unsubscribe();
+          setLiveUpdates(false);
+        }
+      },
+    });
+
+    return unsubscribe;
+  }, [videoId, liveUpdates]);
+
+  // Poll for video status when live updates are unavailable
+  useEffect(() => {
+    if (!videoId || liveUpdates) return;
 
     const pollVideoStatus = async () => {
       try {
-        const { video: videoData } = await apiService.getVideo(videoId);
+        const { video: videoData, moments: momentsData } = await apiService.getVideoBundle(videoId);
         setVideo(videoData);
 
         if (videoData.status === 'ready') {
-          const { moments: momentsData } = await apiService.getMoments(videoId);
           setMoments(momentsData);
           setLoading(false);
-        } else if (videoData.status === 'failed') {
-          setError('Video processing failed. Please try uploading again.');
+        } else if (VIDEO_FAILED_STATUSES.includes(videoData.status)) {
+          setError(videoData.errorMessage || 'Video processing failed. Please try uploading again.');
           setLoading(false);
         } else if (pollCount < APP_CONFIG.maxPollAttempts) {
           setTimeout(() => setPollCount(pollCount + 1), APP_CONFIG.pollInterval);
@@ -46,7 +108,7 @@ export const VideoPage = () => {
     };
 
     pollVideoStatus();
-  }, [videoId, pollCount]);
+  }, [videoId, pollCount, liveUpdates]);
 
   const handlePreview = (moment: Moment) => {
     if (playerRef.current) {
@@ -313,6 +375,8 @@ export const VideoPage = () => {
                       <MomentCard
                         moment={moment}
                         onPreview={handlePreview}
+                        liveUpdates={liveUpdates && streamConnected}
+                        clipUpdate={clipsByMoment[moment.id]}
                       />
                     </div>
                   ))
@@ -7,21 +7,27 @@ import { formatTime } from '../utils/helpers';
 interface Video {
   id: number;
   status: string;
-  playbackId: string | null;
+  muxPlaybackId: string | null;
   duration: number | null;
   createdAt: string;
 }
 
+// Only what the cards show
+const LIST_FIELDS = ['id', 'status', 'muxPlaybackId', 'duration', 'createdAt'];
+
 export const VideosListPage = () => {
   const [videos, setVideos] = useState<Video[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchVideos = async () => {
       try {
-        const response = await apiService.listVideos();
+        const response = await apiService.listVideos({ fields: LIST_FIELDS });
         setVideos(response.videos);
+        setNextCursor(response.nextCursor);
         setLoading(false);
       } catch (err) {
         setError('Failed to load videos. Please try again.');
@@ -32,6 +38,20 @@ export const VideosListPage = () => {
     fetchVideos();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await apiService.listVideos({ cursor: nextCursor, fields: LIST_FIELDS });
+      setVideos((current) => [...current, ...response.videos]);
+      setNextCursor(response.nextCursor);
+    } catch (err) {
+      setError('Failed to load videos. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusBadge = (status: string) => {
     const statusConfig = {
       ready: {
@@ -160,10 +180,10 @@ export const VideosListPage = () => {
                 <div className="bg-white rounded-2xl shadow-lg hover:shadow-xl transition-all duration-300 group-hover:-translate-y-1 overflow-hidden border border-gray-200">
                   {/* Video Thumbnail */}
                   <div className="relative aspect-video bg-gradient-to-br from-gray-100 to-gray-200 overflow-hidden">
-                    {video.playbackId ? (
+                    {video.muxPlaybackId ? (
                       <>
                         <img
-                          src={`https://image.mux.com/${video.playbackId}/thumbnail.jpg?width=640&height=360&time=1`}
+                          src={`https://image.mux.com/${video.muxPlaybackId}/thumbnail.jpg?width=640&height=360&time=1`}
                           alt={`Video ${video.id}`}
                           className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
                         />
@@ -252,6 +272,19 @@ export const VideosListPage = () => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-10 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="inline-flex items-center bg-white text-indigo-600 font-semibold py-3 px-6 rounded-lg border border-indigo-200 shadow hover:bg-indigo-50 disabled:opacity-60 transition-all"
+            >
+              {loadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+              Load more
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -5,7 +5,10 @@ import type {
   UploadResponse,
   VideoResponse,
   MomentsResponse,
+  VideoBundleResponse,
   ClipResponse,
+  BulkClipResponse,
+  VideoEventHandlers,
 } from '../types';
 
 class ApiService {
@@ -22,8 +25,19 @@ class ApiService {
   }
 
   // Video endpoints
-  async listVideos(): Promise<{ success: boolean; videos: any[] }> {
-    const response = await this.client.get('/api/videos');
+  // One page of the video list, newest first; pass nextCursor to get the next
+  async listVideos(params: {
+    cursor?: string | null;
+    limit?: number;
+    fields?: string[];
+  } = {}): Promise<{ success: boolean; videos: any[]; nextCursor: string | null }> {
+    const response = await this.client.get('/api/videos', {
+      params: {
+        cursor: params.cursor || undefined,
+        limit: params.limit,
+        fields: params.fields?.join(','),
+      },
+    });
     return response.data;
   }
 
@@ -41,6 +55,14 @@ class ApiService {
     return response.data;
   }
 
+  // The video with its moments and their clips, in one request
+  async getVideoBundle(videoId: string): Promise<VideoBundleResponse> {
+    const response = await this.client.get<VideoBundleResponse>(
+      API_ENDPOINTS.getVideoBundle(videoId)
+    );
+    return response.data;
+  }
+
   async getVideoStatus(videoId: string): Promise<{ status: string }> {
     const response = await this.client.get<{ status: string }>(
       API_ENDPOINTS.getVideoStatus(videoId)
@@ -55,6 +77,24 @@ class ApiService {
     return response.data;
   }
 
+  // Live status updates; returns a function that closes the stream
+  subscribeToVideoEvents(videoId: string, handlers: VideoEventHandlers): () => void {
+    const source = new EventSource(
+      `${API_BASE_URL}${API_ENDPOINTS.videoEvents(videoId)}`
+    );
+
+    source.onopen = () => handlers.onOpen?.();
+    source.onerror = () => handlers.onError?.();
+    source.addEventListener('status', (event) => {
+      handlers.onStatus?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('clip', (event) => {
+      handlers.onClip?.(JSON.parse((event as MessageEvent).data));
+    });
+
+    return () => source.close();
+  }
+
   async getMoments(videoId: string): Promise<MomentsResponse> {
     const response = await this.client.get<MomentsResponse>(
       API_ENDPOINTS.getMoments(videoId)
@@ -70,6 +110,15 @@ class ApiService {
     return response.data;
   }
 
+  // Clip several moments at once (all of the video's moments by default)
+  async createClips(videoId: string, momentIds?: string[]): Promise<BulkClipResponse> {
+    const response = await this.client.post<BulkClipResponse>(
+      API_ENDPOINTS.createClips(videoId),
+      momentIds ? { momentIds } : {}
+    );
+    return response.data;
+  }
+
   async getClip(clipId: string): Promise<ClipResponse> {
     const response = await this.client.get<ClipResponse>(
       API_ENDPOINTS.getClip(clipId)
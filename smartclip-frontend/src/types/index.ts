@@ -1,7 +1,7 @@
 // Video status types
 export type VideoStatus = 'waiting_for_upload' | 'uploading' | 'processing' | 'transcribing' | 'analyzing' | 'ready' | 'error' | 'failed';
 
-export type ClipStatus = 'creating' | 'ready' | 'failed';
+export type ClipStatus = 'processing' | 'creating' | 'ready' | 'errored' | 'failed';
 
 export type EngagementPotential = 'high' | 'medium' | 'low';
 
@@ -30,7 +30,10 @@ export interface Moment {
   confidenceScore: number; // 0-1
   keywords: string[];
   engagementPotential: EngagementPotential;
+  caption: string | null; // Generated after analysis; null until then
+  hashtags: string[];
   createdAt: string;
+  clips?: Clip[]; // Included by the video bundle endpoint
 }
 
 // Clip interface
@@ -63,10 +66,43 @@ export interface MomentsResponse {
   moments: Moment[];
 }
 
+// Video, moments and their clips in one response
+export interface VideoBundleResponse {
+  video: Video;
+  moments: Moment[];
+}
+
 export interface ClipResponse {
   clip: Clip;
 }
 
+export interface BulkClipResult {
+  momentId: string;
+  success: boolean;
+  created: boolean; // false when the moment already had a clip
+  clip?: Clip;
+  error?: string;
+}
+
+export interface BulkClipResponse {
+  success: boolean;
+  results: BulkClipResult[];
+}
+
+// Server-Sent Events from /api/videos/:id/events
+export interface VideoStatusEvent {
+  videoId: string;
+  status: VideoStatus;
+  errorMessage?: string | null;
+}
+
+export interface VideoEventHandlers {
+  onOpen?: () => void;
+  onStatus?: (event: VideoStatusEvent) => void;
+  onClip?: (clip: Clip) => void;
+  onError?: () => void;
+}
+
 export interface ErrorResponse {
   error: string;
   message: string;
@@ -9,9 +9,12 @@ export const API_ENDPOINTS = {
   getVideoStatus: (id: string) => `/api/videos/${id}/status`,
   analyzeVideo: (id: string) => `/api/videos/${id}/analyze`,
   getMoments: (id: string) => `/api/videos/${id}/moments`,
+  getVideoBundle: (id: string) => `/api/videos/${id}/bundle`,
+  videoEvents: (id: string) => `/api/videos/${id}/events`,
 
   // Clip endpoints
   createClip: (momentId: string) => `/api/moments/${momentId}/create-clip`,
+  createClips: (videoId: string) => `/api/videos/${videoId}/clips`,
   getClip: (id: string) => `/api/clips/${id}`,
 };
 
@@ -25,10 +28,17 @@ export const APP_CONFIG = {
     'video/x-matroska',
     'video/webm',
   ],
-  pollInterval: 3000, // 3 seconds
+  pollInterval: 3000, // 3 seconds (fallback when live updates are unavailable)
   maxPollAttempts: 100, // 5 minutes max
+  clipPollInterval: 2000, // 2 seconds
+  maxClipPollAttempts: 30, // 1 minute max
+  clipEventTimeout: 10000, // poll a clip once its live update is this late (10 seconds)
 };
 
+// Statuses the backend uses for videos and clips that won't finish
+export const VIDEO_FAILED_STATUSES = ['error', 'failed'];
+export const CLIP_FAILED_STATUSES = ['errored', 'failed'];
+
 // UI Configuration
 export const UI_CONFIG = {
   defaultVideoTitle: 'Untitled Video',